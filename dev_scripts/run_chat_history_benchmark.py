@@ -0,0 +1,103 @@
+"""
+Measures chat history insert throughput (rows/sec) per backend, comparing row-by-row inserts with the bulk
+add_messages and add_steps calls.
+
+Usage: python dev_scripts/run_chat_history_benchmark.py [rows] [backend ...]
+
+sqlite and duckdb run against a temporary database file. cosmos uses the connection string and database name from
+the active profile and is skipped when no connection string is configured.
+"""
+import asyncio
+from datetime import datetime, timezone
+import importlib
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import ingenious.config.config as config
+from ingenious.models.message import Message
+
+_config = config.get_config()
+
+
+def get_repository(db_type: str, database_path: str):
+    chat_history = _config.chat_history.model_copy(update={"database_type": db_type, "database_path": database_path})
+    module = importlib.import_module(f"ingenious.db.{db_type}")
+    repository_class = getattr(module, f"{db_type}_ChatHistoryRepository")
+    return repository_class(config=_config.model_copy(update={"chat_history": chat_history}))
+
+
+def make_messages(rows: int, thread_id: str):
+    return [
+        Message(user_id="benchmark", thread_id=thread_id, role="agent_chat", content=f"benchmark message {i}")
+        for i in range(rows)
+    ]
+
+
+def make_steps(rows: int, thread_id: str):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": "benchmark",
+            "type": "run",
+            "threadId": thread_id,
+            "streaming": False,
+            "input": f"benchmark step {i}",
+            "output": "",
+            "createdAt": datetime.now(timezone.utc).isoformat()
+        }
+        for i in range(rows)
+    ]
+
+
+async def measure(label: str, rows: int, fn):
+    start = time.perf_counter()
+    await fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {rows / elapsed:>12,.0f} rows/sec  ({elapsed:.3f}s)")
+
+
+async def benchmark(db_type: str, rows: int, database_path: str):
+    repository = get_repository(db_type, database_path)
+    print(f"{db_type} ({rows} rows)")
+    try:
+        thread_id = str(uuid.uuid4())
+
+        async def add_message_loop():
+            for message in make_messages(rows, thread_id):
+                await repository.add_message(message)
+
+        await measure("add_message (per row)", rows, add_message_loop)
+        await measure("add_messages (bulk)", rows, lambda: repository.add_messages(make_messages(rows, thread_id)))
+
+        if hasattr(repository, "add_step"):
+            async def add_step_loop():
+                for step in make_steps(rows, thread_id):
+                    await repository.add_step(step)
+
+            await measure("add_step (per row)", rows, add_step_loop)
+            await measure("add_steps (bulk)", rows, lambda: repository.add_steps(make_steps(rows, thread_id)))
+
+        await repository.delete_thread(thread_id)
+    finally:
+        await repository.close()
+
+
+async def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    backends = sys.argv[2:] or ["sqlite", "duckdb", "cosmos"]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for db_type in backends:
+            if db_type == "cosmos" and not _config.chat_history.database_connection_string:
+                print("cosmos skipped: no database_connection_string configured")
+                continue
+            try:
+                await benchmark(db_type, rows, str(Path(temp_dir) / f"benchmark_{db_type}.db"))
+            except Exception as e:
+                print(f"{db_type} failed: {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
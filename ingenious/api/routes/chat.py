@@ -1,6 +1,8 @@
+import asyncio
 import secrets
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from typing_extensions import Annotated
 from ingenious.dependencies import get_chat_service
@@ -10,7 +12,7 @@ from ingenious.models.chat import ChatRequest, ChatResponse
 from ingenious.models.http_error import HTTPError
 from ingenious.services.chat_service import ChatService
 import ingenious.dependencies as igen_deps
-import ingenious.utils.namespace_utils as ns_utils
+from ingenious.utils.chat_stream import ChatStream, reset_chat_stream, set_chat_stream
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -39,9 +41,6 @@ async def chat(
     ],
 ) -> ChatResponse:
     try:
-        ns_utils.print_namespace_modules(
-            "ingenious.services.chat_services.multi_agent.conversation_flows"
-        )
         if not chat_request.conversation_flow:
             raise ValueError(f"conversation_flow not set {chat_request}")
         return await chat_service.get_chat_response(chat_request)
@@ -59,3 +58,64 @@ async def chat(
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/chat/stream",
+    responses={
+        400: {"model": HTTPError, "description": "Bad Request"},
+    },
+)
+async def chat_stream(
+    chat_request: ChatRequest,
+    chat_service: Annotated[ChatService, Depends(get_chat_service)],
+    credentials: Annotated[
+        HTTPBasicCredentials, Depends(igen_deps.get_security_service)
+    ],
+) -> StreamingResponse:
+    """
+    Runs the conversation flow and streams its progress as server-sent events:
+    `token` for each model token delta, `agent_response` as each agent completes,
+    then either `response` with the final ChatResponse or `error` with a status_code and detail.
+    """
+    if not chat_request.conversation_flow:
+        raise HTTPException(status_code=400, detail=f"conversation_flow not set {chat_request}")
+
+    stream = ChatStream()
+
+    async def run_chat():
+        token = set_chat_stream(stream)
+        try:
+            chat_response = await chat_service.get_chat_response(chat_request)
+            stream.publish("response", chat_response.model_dump())
+        except ValueError as e:
+            logger.exception(e)
+            stream.publish("error", {"status_code": 400, "detail": str(e)})
+        except ContentFilterError as cfe:
+            logger.exception(cfe)
+            stream.publish("error", {"status_code": 406, "detail": ContentFilterError.DEFAULT_MESSAGE})
+        except TokenLimitExceededError as tle:
+            logger.exception(tle)
+            stream.publish("error", {"status_code": 413, "detail": TokenLimitExceededError.DEFAULT_MESSAGE})
+        except Exception as e:
+            logger.exception(e)
+            stream.publish("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            reset_chat_stream(token)
+            stream.close()
+
+    async def event_source():
+        task = asyncio.create_task(run_chat())
+        try:
+            async for event in stream.events():
+                yield event
+        finally:
+            # The client disconnected before the flow finished.
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
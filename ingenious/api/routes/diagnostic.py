@@ -1,4 +1,5 @@
 import logging
+import os
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
@@ -9,6 +10,7 @@ from ingenious.errors.token_limit_exceeded_error import TokenLimitExceededError
 from ingenious.models.chat import ChatRequest, ChatResponse
 from ingenious.models.http_error import HTTPError
 from ingenious.services.chat_service import ChatService
+import ingenious.config.config as ingen_config
 import ingenious.dependencies as igen_deps
 import ingenious.utils.namespace_utils as ns_utils
 
@@ -66,9 +68,31 @@ async def diagnostic(
         diagnostic["Data Directory"] = data_dir
         diagnostic["Output Directory"] = output_dir
         diagnostic["Events Directory"] = events_dir
+        diagnostic["Config Version"] = ingen_config.get_config_version(os.getenv("INGENIOUS_PROJECT_PATH", ""))
         
         return diagnostic
 
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/config/reload",
+    responses={
+        200: {"model": dict, "description": "Version of the reloaded configuration"},
+    },
+)
+async def reload_config(
+    credentials: Annotated[
+        HTTPBasicCredentials, Depends(igen_deps.get_security_service)
+    ]
+):
+    try:
+        config_path = os.getenv("INGENIOUS_PROJECT_PATH", "")
+        ingen_config.reload_config(config_path)
+        return {"version": ingen_config.get_config_version(config_path)}
+
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,36 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPBasicCredentials
+from typing_extensions import Annotated
+from ingenious.models.http_error import HTTPError
+from ingenious.services.chat_services.multi_agent.service import get_conversation_flows
+import ingenious.dependencies as igen_deps
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/flows", responses={500: {"model": HTTPError, "description": "Internal Server Error"}})
+async def list_flows(
+    credentials: Annotated[
+        HTTPBasicCredentials, Depends(igen_deps.get_security_service)
+    ],
+) -> list[str]:
+    try:
+        return get_conversation_flows()
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/flows/refresh", responses={500: {"model": HTTPError, "description": "Internal Server Error"}})
+async def refresh_flows(
+    credentials: Annotated[
+        HTTPBasicCredentials, Depends(igen_deps.get_security_service)
+    ],
+) -> list[str]:
+    try:
+        return get_conversation_flows(refresh=True)
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -10,6 +10,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 import ingenious.dependencies as igen_deps
 from ingenious.files.files_repository import FileStorage
+from ingenious.utils.prompt_template_cache import prompt_template_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -72,6 +73,7 @@ async def update(
             file_name=filename,
             file_path=prompt_template_folder
         )
+        prompt_template_cache.invalidate(revision_id=revision_id, file_name=filename)
         return {"message": "File updated successfully"}
     except Exception as e:
         logger.exception(e)
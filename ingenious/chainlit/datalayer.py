@@ -61,22 +61,17 @@ class DataLayer(cl_data.BaseDataLayer):
 
     async def get_thread_author(self, thread_id: str) -> str:
         print("Getting thread author for thread: ", thread_id)
-
-        print("User ID: ", self.user.identifier)
-        print("Thread ID: ", thread_id)
-        threads = await deps.get_chat_history_repository().get_threads_for_user(
-            identifier=self.user.identifier, 
-            thread_id=thread_id
-        )
-        # Get first user in the thread
-        if threads:
-            return threads[0]['userIdentifier']
-        else:
-            return ""
+        user = getattr(self, "user", None)
+        identifier = user.identifier if user else None
+        author = await deps.get_chat_history_repository().get_thread_author(thread_id, identifier)
+        return author or ""
 
     async def get_threads_for_user(self, user_id: str):
         threads = []
-        tfu = await deps.get_chat_history_repository().get_threads_for_user(identifier=user_id, thread_id=None)
+        # Sidebar listing only: the steps and elements are loaded when a thread is opened
+        tfu = await deps.get_chat_history_repository().get_threads_for_user(
+            identifier=user_id, thread_id=None, projection="metadata"
+        )
         if tfu:
             for t in tfu:
                 thread = {
@@ -95,11 +90,24 @@ class DataLayer(cl_data.BaseDataLayer):
     
     async def list_threads(
         self, pagination: Pagination, filters: ThreadFilter
-    ) -> PaginatedResponse[ThreadDict]:       
-        thread_history = await self.get_threads_for_user(self.user.identifier)
-        return PaginatedResponse(            
-                data=[t for t in thread_history if t["id"] not in deleted_thread_ids],
-                pageInfo=PageInfo(hasNextPage=False, startCursor=None, endCursor=None),
+    ) -> PaginatedResponse[ThreadDict]:
+        # One keyset page of thread metadata. Steps and elements are only loaded when a thread is opened (get_thread)
+        threads, has_next_page = await deps.get_chat_history_repository().get_threads_page(
+            identifier=self.user.identifier,
+            first=pagination.first,
+            cursor=pagination.cursor,
+            search=filters.search
+        )
+        # The cursor is the last thread of the page, even if it is hidden because it was deleted
+        end_cursor = threads[-1]["id"] if threads else None
+        threads = [t for t in threads if t["id"] not in deleted_thread_ids]
+        return PaginatedResponse(
+                data=threads,
+                pageInfo=PageInfo(
+                    hasNextPage=has_next_page,
+                    startCursor=threads[0]["id"] if threads else None,
+                    endCursor=end_cursor
+                ),
         )
 
     async def get_thread(self, thread_id: str) -> Optional[ThreadDict]: 
@@ -1,8 +1,9 @@
 import shutil
+import subprocess
 import sys
 from sysconfig import get_paths
 import time
-from typing import Optional
+from typing import List, Optional
 import typer
 import asyncio
 from typing_extensions import Annotated
@@ -10,9 +11,9 @@ from rich.console import Console
 from rich.theme import Theme
 from rich import panel
 from rich import print
+from rich.table import Table
 from pathlib import Path
 import os
-import uvicorn
 import importlib
 import pkgutil
 
@@ -115,6 +116,7 @@ def run_rest_api_server(
     app = fast_agent_api.app
     
     # change directory to project dir    
+    import uvicorn
     uvicorn.run(app, host=config.web_configuration.ip_address, port=config.web_configuration.port)
     #import subprocess
     #subprocess.run(["fastapi", "dev", "./ingenious/main.py"])
@@ -255,6 +257,66 @@ def initialize_new_project():
     console.print("[info]To execute use ingen_cli[/info]")
 
 
+# Modules timed by startup-profile when none are given: the CLI, the API and the subsystems they can load
+STARTUP_PROFILE_MODULES = [
+    "ingenious.cli",
+    "ingenious.config.config",
+    "ingenious.dependencies",
+    "ingenious.main",
+    "ingenious.services.chat_services.multi_agent.service",
+    "ingenious.services.chat_services.multi_agent.tool_functions_standard",
+    "ingenious_prompt_tuner",
+    "chainlit",
+    "autogen_agentchat",
+]
+
+
+@app.command()
+def startup_profile(
+    modules: Annotated[
+        Optional[List[str]],
+        typer.Argument(
+            help="Modules to time. Defaults to the CLI, the API and the optional subsystems."
+        ),
+    ] = None,
+    top: Annotated[
+        int,
+        typer.Option(
+            help="Number of slowest packages to list for each module."
+        ),
+    ] = 5,
+    init: Annotated[
+        bool,
+        typer.Option(
+            help="Also time loading the config and building and starting the FastAPI app."
+        ),
+    ] = True
+):
+    """
+    Reports how long each module takes to import in a fresh interpreter, the packages that dominate it, and how long the API takes to initialise.
+    """
+    import_table = Table(title="Import time (fresh interpreter)")
+    import_table.add_column("Module")
+    import_table.add_column("ms", justify="right")
+    import_table.add_column("Slowest packages (ms, self time)")
+    for module in modules or STARTUP_PROFILE_MODULES:
+        total, packages, error = CliFunctions.profile_import(module)
+        if error:
+            import_table.add_row(module, "-", f"[error]{error}[/error]")
+            continue
+        slowest = ", ".join(f"{name} {ms:.0f}" for name, ms in packages[:top])
+        import_table.add_row(module, f"{total:.0f}", slowest)
+    console.print(import_table)
+
+    if init:
+        init_table = Table(title="Init time (this process)")
+        init_table.add_column("Step")
+        init_table.add_column("ms", justify="right")
+        for step, ms, error in CliFunctions.profile_init():
+            init_table.add_row(step, f"[error]{error}[/error]" if error else f"{ms:.0f}")
+        console.print(init_table)
+
+
 @app.command()
 def run_prompt_tuner():
     """Run the prompt tuner web application."""
@@ -281,6 +343,74 @@ class CliFunctions:
             except (ImportError, AttributeError) as e:
                 raise ValueError(f"Batch Run Failed: {module_name}") from e
     
+    @staticmethod
+    def profile_import(module: str):
+        """
+        Imports a module in a new interpreter with -X importtime.
+
+        :return: The cumulative import time in ms, the top level packages ordered by the self time spent in them,
+            and the last line of the error if the import failed.
+        """
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=os.getcwd(), env=os.environ.copy()
+        )
+        total = 0.0
+        packages = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            parts = line[len("import time:"):].split("|")
+            try:
+                self_us, cumulative_us = int(parts[0]), int(parts[1])
+            except ValueError:
+                # The header line
+                continue
+            name = parts[2].strip()
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0.0) + self_us / 1000
+            if name == module:
+                total = cumulative_us / 1000
+        if result.returncode != 0:
+            lines = [line for line in result.stderr.splitlines() if line and not line.startswith("import time:")]
+            return total, [], lines[-1] if lines else f"exit code {result.returncode}"
+        return total, sorted(packages.items(), key=lambda item: item[1], reverse=True), None
+
+    @staticmethod
+    def profile_init():
+        """Times the API start up steps in this process. Returns (step, ms, error) for each step."""
+        steps = []
+
+        def timed(step, fn):
+            start = time.perf_counter()
+            try:
+                value = fn()
+                steps.append((step, (time.perf_counter() - start) * 1000, None))
+                return value
+            except BaseException as e:
+                steps.append((step, (time.perf_counter() - start) * 1000, str(e) or type(e).__name__))
+                return None
+
+        import ingenious.config.config as ingen_config
+        config = timed("get_config (first load)", ingen_config.get_config)
+        timed("get_config (cached)", ingen_config.get_config)
+        if config is None:
+            return steps
+
+        os.environ.setdefault("INGENIOUS_WORKING_DIR", os.getcwd())
+        main = timed("import ingenious.main", lambda: importlib.import_module("ingenious.main"))
+        if main is None:
+            return steps
+        fast_agent_api = timed("FastAgentAPI()", lambda: main.FastAgentAPI(config))
+        os.chdir(os.environ["INGENIOUS_WORKING_DIR"])
+        if fast_agent_api is not None:
+            registry = main.igen_deps.get_service_registry()
+            timed("service registry startup", lambda: asyncio.run(registry.startup()))
+            if config.prompt_tuner.enable:
+                timed("prompt tuner (first request)", lambda: fast_agent_api.flask_app)
+            timed("service registry shutdown", lambda: asyncio.run(registry.shutdown()))
+        return steps
+
     @staticmethod
     def PureLibIncludeDirExists():
         ChkPath = Path(get_paths()['purelib']) / Path(f'ingenious/')
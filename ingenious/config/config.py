@@ -1,14 +1,15 @@
 import json
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 import yaml
 from pathlib import Path
-from ingenious.config.profile import Profiles
+from ingenious.config.profile import Profiles, get_secret_client
 import logging
 from ingenious.models import config_ns as config_ns_models
 from ingenious.models import config as config_models
 from ingenious.models import profile as profile_models
 import os
-from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential
 
 
 logger = logging.getLogger(__name__)
@@ -27,7 +28,10 @@ class Config(config_models.Config):
     @staticmethod
     def from_yaml_str(config_yml):
         yaml_data = yaml.safe_load(config_yml)
-        json_data = json.dumps(yaml_data)
+        return Config.from_json_str(json.dumps(yaml_data))
+
+    @staticmethod
+    def from_json_str(json_data):
         config_ns: config_ns_models.Config
         try:
             config_ns = config_ns_models.Config.model_validate_json(
@@ -68,28 +72,15 @@ def get_kv_secret(secretName):
     # check if the key vault name is set in the environment variables
     if "KEY_VAULT_NAME" in os.environ:
         keyVaultName = os.environ["KEY_VAULT_NAME"]
-        KVUri = f"https://{keyVaultName}.vault.azure.net"
-        credential = DefaultAzureCredential()
-        client = SecretClient(vault_url=KVUri, credential=credential)
+        client = get_secret_client(keyVaultName)
         secret = client.get_secret(secretName)
         return secret.value
     else:
         raise ValueError("KEY_VAULT_NAME environment variable not set")
 
 
-@staticmethod
-def get_config(config_path=None) -> config_models.Config:
-
-    # Check if os.getenv('INGENIOUS_CONFIG') is set
-    if os.getenv('APPSETTING_INGENIOUS_CONFIG'):
-        config_string = os.getenv('APPSETTING_INGENIOUS_CONFIG', "")
-        config_object = json.loads(config_string)
-        # Convert the json string to a yaml string
-        config_yml = yaml.dump(config_object)
-        config = Config.from_yaml_str(config_yml)
-        return config
-
-    if config_path is None: 
+def _resolve_config_path(config_path=None) -> Path:
+    if config_path is None:
         env_config_path = os.getenv('INGENIOUS_PROJECT_PATH')
         if env_config_path:
             config_path = env_config_path
@@ -97,24 +88,180 @@ def get_config(config_path=None) -> config_models.Config:
             # Use the default config file
             current_path = Path.cwd()
             config_path = current_path / 'config.yml'
-    
-    path = Path(config_path)
-    
+    return Path(config_path).absolute()
+
+
+def _load_config(config_path=None) -> config_models.Config:
+    # Check if os.getenv('INGENIOUS_CONFIG') is set
+    if os.getenv('APPSETTING_INGENIOUS_CONFIG'):
+        config_string = os.getenv('APPSETTING_INGENIOUS_CONFIG', "")
+        return Config.from_json_str(config_string)
+
+    path = _resolve_config_path(config_path)
+
     if path.exists:
-        if Path(config_path).is_file():
+        if path.is_file():
             logger.debug("Config loaded from file")
-            config = Config.from_yaml(config_path)
+            config = Config.from_yaml(path)
             return config
 
         else:
-            logger.debug(f"Config file at {config_path} is not a file. Falling back to key vault")
+            logger.debug(f"Config file at {path} is not a file. Falling back to key vault")
             try:
                 config_str = get_kv_secret("config")
                 config = Config.from_yaml_str(config_str)
                 return config
             except Exception as e:
-                raise ValueError(f"Config file at {config_path} is not a file. Tried falling back to key vault but KEY_VAULT_NAME environment variable not set")
+                raise ValueError(f"Config file at {path} is not a file. Tried falling back to key vault but KEY_VAULT_NAME environment variable not set")
 
     else:
-        logger.debug(f"No config file found at {config_path}")
+        logger.debug(f"No config file found at {path}")
         exit(1)
+
+
+@dataclass
+class _ConfigEntry:
+    config: config_models.Config
+    version: int
+    files: Dict[Path, Optional[float]]
+
+
+class ConfigService:
+    """
+    Process-wide cache of the parsed configuration.
+
+    The configuration is read from config.yml, profiles.yml, the APPSETTING_ environment variables or Key Vault the
+    first time it is requested for a source, and every later call returns the same object. It is only read again when
+    reload() is called, or when check_for_changes() or the background watcher sees that config.yml or profiles.yml
+    was modified. Each load publishes a new version number. Shared clients created from an earlier version, such as
+    the chat history repository, keep their settings until the process restarts.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._entries: Dict[tuple, _ConfigEntry] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[config_models.Config, int], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    @staticmethod
+    def _source(config_path=None) -> tuple:
+        return (
+            os.getenv('APPSETTING_INGENIOUS_CONFIG', ''),
+            os.getenv('APPSETTING_INGENIOUS_PROFILE', ''),
+            os.getenv('INGENIOUS_PROFILE_PATH', ''),
+            _resolve_config_path(config_path)
+        )
+
+    @staticmethod
+    def _mtime(path: Path) -> Optional[float]:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return None
+
+    def _load(self, source: tuple, config_path=None) -> _ConfigEntry:
+        config = _load_config(config_path)
+        files: Dict[Path, Optional[float]] = {}
+        if not source[0]:
+            files[source[3]] = self._mtime(source[3])
+        if not source[1]:
+            profiles_path = Profiles.get_profiles_path(source[2]).absolute()
+            files[profiles_path] = self._mtime(profiles_path)
+        self.version += 1
+        entry = _ConfigEntry(config, self.version, files)
+        self._entries[source] = entry
+        logger.debug(f"Config version {entry.version} loaded")
+        for listener in list(self._listeners):
+            try:
+                listener(config, entry.version)
+            except Exception as e:
+                logger.warning(f"Config listener failed: {e}")
+        return entry
+
+    def get(self, config_path=None) -> config_models.Config:
+        source = self._source(config_path)
+        entry = self._entries.get(source)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(source)
+                if entry is None:
+                    entry = self._load(source, config_path)
+        return entry.config
+
+    def get_version(self, config_path=None) -> int:
+        """Returns the version of the configuration loaded for a source, loading it if needed."""
+        self.get(config_path)
+        return self._entries[self._source(config_path)].version
+
+    def reload(self, config_path=None) -> config_models.Config:
+        """Reads the configuration of a source again and publishes it with a new version number."""
+        source = self._source(config_path)
+        with self._lock:
+            return self._load(source, config_path).config
+
+    def check_for_changes(self) -> bool:
+        """Reloads every cached source whose config.yml or profiles.yml changed. Returns whether any was reloaded."""
+        reloaded = False
+        with self._lock:
+            for source, entry in list(self._entries.items()):
+                if any(self._mtime(path) != mtime for path, mtime in entry.files.items()):
+                    try:
+                        self._load(source, source[3])
+                        reloaded = True
+                    except Exception as e:
+                        # Keep serving the last good configuration while the file is being edited
+                        logger.warning(f"Config at {source[3]} changed but could not be loaded: {e}")
+                        entry.files = {path: self._mtime(path) for path in entry.files}
+        return reloaded
+
+    def add_listener(self, listener: Callable[[config_models.Config, int], None]) -> None:
+        """Registers a callback run with the configuration and its version after every load."""
+        self._listeners.append(listener)
+
+    def start_watching(self, interval: float = 5.0) -> None:
+        """Starts a daemon thread that calls check_for_changes every interval seconds."""
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(
+                target=self._watch, args=(interval,), name="ingenious-config-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop_watching.wait(interval):
+            self.check_for_changes()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_config_service = ConfigService()
+
+
+def get_config_service() -> ConfigService:
+    return _config_service
+
+
+@staticmethod
+def get_config(config_path=None) -> config_models.Config:
+    # Served from the config service. The files are only read again after reload_config or a detected change
+    return _config_service.get(config_path)
+
+
+def reload_config(config_path=None) -> config_models.Config:
+    return _config_service.reload(config_path)
+
+
+def get_config_version(config_path=None) -> int:
+    return _config_service.get_version(config_path)
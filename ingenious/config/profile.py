@@ -3,6 +3,7 @@ from pydantic import ValidationError
 import json
 import yaml
 import os
+from functools import lru_cache
 from pathlib import Path
 from ingenious.models import profile as profile_models
 from azure.keyvault.secrets import SecretClient
@@ -40,18 +41,42 @@ class Profiles():
             profiles = Profiles.from_yaml_str(file_str)
             return profiles
 
+    @staticmethod
+    def from_json_str(profile_json):
+        try:
+            profiles = \
+                profile_models.Profiles.model_validate_json(profile_json).root
+        except profile_models.ValidationError as e:
+            for error in e.errors():
+                print(
+                    f"Validation error in \
+                    field '{error['loc']}': {error['msg']}"
+                )
+            raise e
+        return profiles
+
     @staticmethod
     def _get_profiles(profiles_path=None):
         # Check if os.getenv('INGENIOUS_PROFILE') is set
         if os.getenv('APPSETTING_INGENIOUS_PROFILE', '') != '':
             #print("Profile JSON loaded from environment variable")
             profile_string = os.getenv('APPSETTING_INGENIOUS_PROFILE', "{}")
-            profile_object = json.loads(profile_string)
-            # Convert the json string to a yaml string
-            profile_yml = yaml.dump(profile_object)
-            profile = Profiles.from_yaml_str(profile_yml)
-            return profile
+            return Profiles.from_json_str(profile_string)
+
+        profiles_path_object = Profiles.get_profiles_path(profiles_path)
+        if profiles_path_object.is_file():
+            print("Profile loaded from file")
+            profiles = Profiles.from_yaml(file_path=str(profiles_path_object))
+        else:
+            print(f"Profile not found at {profiles_path}")
+            print("Trying to load profile from key vault")
+            profiles_yml = get_kv_secret(secretName="profile")
+            profiles = Profiles.from_yaml_str(profiles_yml)
 
+        return profiles
+
+    @staticmethod
+    def get_profiles_path(profiles_path=None) -> Path:
         # Load the configuration from the YAML file
         if profiles_path is None or profiles_path == '':
             if os.getenv('INGENIOUS_PROFILE_PATH', '') != '':
@@ -70,17 +95,7 @@ class Profiles():
                                 )
         else:
             profiles_path_object = Path(profiles_path)
-
-        if profiles_path_object.is_file():
-            print("Profile loaded from file")
-            profiles = Profiles.from_yaml(file_path=str(profiles_path_object))
-        else:
-            print(f"Profile not found at {profiles_path}")
-            print("Trying to load profile from key vault")
-            profiles_yml = get_kv_secret(secretName="profile")
-            profiles = Profiles.from_yaml_str(profiles_yml)
-
-        return profiles
+        return profiles_path_object
 
     def get_profile_by_name(self, name):
         for profile in self.profiles:
@@ -89,15 +104,21 @@ class Profiles():
         return None
 
 
+@lru_cache(maxsize=None)
+def get_secret_client(keyVaultName) -> SecretClient:
+    # One credential and client per vault, so token acquisition is not repeated for every secret
+    KVUri = f"https://{keyVaultName}.vault.azure.net"
+    credential = DefaultAzureCredential()
+    return SecretClient(vault_url=KVUri, credential=credential)
+
+
 @staticmethod
 def get_kv_secret(secretName):
     try:
         keyVaultName = os.environ["KEY_VAULT_NAME"]
     except KeyError:
         raise ValueError("KEY_VAULT_NAME environment variable not set")
-    
-    KVUri = f"https://{keyVaultName}.vault.azure.net"
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=KVUri, credential=credential)
+
+    client = get_secret_client(keyVaultName)
     secret = client.get_secret(secretName)
     return secret.value
@@ -0,0 +1,92 @@
+import logging
+import threading
+from typing import Optional
+
+import ingenious.models.config as config_models
+from ingenious.db.chat_history_repository import ChatHistoryRepository, DatabaseClientType
+from ingenious.external_services.openai_service import OpenAIService, close_openai_clients
+from ingenious.files.files_repository import FileStorage, close_file_storages, get_file_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """
+    Holds the repositories, file storage and LLM services that are shared by every request in the process.
+
+    Instances are created lazily on first use and are reused until shutdown() is called. The FastAPI app calls
+    startup() and shutdown() from its lifecycle events so that connection setup and schema creation happen once
+    per process rather than once per request.
+    """
+
+    def __init__(self, config: config_models.Config):
+        self.config = config
+        self._lock = threading.RLock()
+        self._chat_history_repository: Optional[ChatHistoryRepository] = None
+        self._openai_service: Optional[OpenAIService] = None
+
+    def get_chat_history_repository(self) -> ChatHistoryRepository:
+        if self._chat_history_repository is None:
+            with self._lock:
+                if self._chat_history_repository is None:
+                    db_type_val = self.config.chat_history.database_type.lower()
+                    try:
+                        db_type = DatabaseClientType(db_type_val)
+                    except ValueError:
+                        raise ValueError(f"Unknown database type: {db_type_val}")
+                    self._chat_history_repository = ChatHistoryRepository(db_type=db_type, config=self.config)
+        return self._chat_history_repository
+
+    def get_file_storage(self, category: str = "revisions") -> FileStorage:
+        return get_file_storage(self.config, Category=category)
+
+    def get_openai_service(self) -> OpenAIService:
+        if self._openai_service is None:
+            with self._lock:
+                if self._openai_service is None:
+                    model = self.config.models[0]
+                    self._openai_service = OpenAIService(
+                        azure_endpoint=str(model.base_url),
+                        api_key=str(model.api_key),
+                        api_version=str(model.api_version),
+                        open_ai_model=str(model.model),
+                        client_config=self.config.openai_client
+                    )
+        return self._openai_service
+
+    async def startup(self) -> None:
+        """Creates the shared chat history repository so that connections and tables are ready before the first request."""
+        self.get_chat_history_repository()
+
+    async def shutdown(self) -> None:
+        """Closes all shared resources. Subsequent calls to the getters create fresh instances."""
+        with self._lock:
+            chat_history_repository = self._chat_history_repository
+            self._chat_history_repository = None
+            self._openai_service = None
+
+        if chat_history_repository is not None:
+            try:
+                await chat_history_repository.close()
+            except Exception as e:
+                logger.warning(f"Failed to close chat history repository: {e}")
+
+        await close_file_storages()
+
+        await close_openai_clients()
+
+
+_registry: Optional[ServiceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_service_registry(config: Optional[config_models.Config] = None) -> ServiceRegistry:
+    """Returns the process wide registry, creating it with the given config on first call."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if config is None:
+                    raise ValueError("The service registry has not been initialised with a config")
+                _registry = ServiceRegistry(config)
+    return _registry
@@ -7,6 +7,7 @@ from typing import (
     List,
     Literal,
     Optional,
+    Tuple,
     TypedDict,
     Union,
 )
@@ -24,6 +25,9 @@ class IChatHistoryRepository(ABC):
 
     StepType = Union[TrueStepType, MessageStepType]
 
+    # How much of each thread get_threads_for_user loads: thread fields only, with steps, or with steps and elements
+    ThreadProjection = Literal["metadata", "steps", "full"]
+
     mime_types = {
         "text": "text/plain",
         "tasklist": "application/json",
@@ -197,6 +201,23 @@ class IChatHistoryRepository(ABC):
         """ adds a message to the chat history """
         pass
 
+    async def add_messages(self, messages: List[Message], assign_ids: bool = True) -> List[str]:
+        """
+        adds several messages to the chat history. Backends override this to insert them in one round trip and,
+        when assign_ids is False, to store the message_id and timestamp already set on each message. add_message
+        always assigns new ones, so this default cannot keep them
+        """
+        if not assign_ids:
+            raise NotImplementedError(
+                f"{type(self).__name__} cannot store messages with the ids they already have (assign_ids=False)"
+            )
+        return [await self.add_message(message) for message in messages]
+
+    async def add_steps(self, step_dicts: List['IChatHistoryRepository.StepDict']) -> None:
+        """ adds several chainlit steps. Backends override this to insert them in one round trip """
+        for step_dict in step_dicts:
+            await self.add_step(step_dict)
+
     @abstractmethod
     async def add_user(self, identifier: str) -> User:
         """ adds a user to the chat history database """
@@ -216,11 +237,70 @@ class IChatHistoryRepository(ABC):
     async def get_thread_messages(self, thread_id: str) -> list[Message]:
         pass
 
+    async def get_thread_messages_before(
+            self, thread_id: str, before: Optional[datetime] = None, limit: int = 20
+    ) -> list[Message]:
+        """
+        Returns up to limit of the thread's messages, newest first, that are older than before. Pass the timestamp of
+        the last message returned as before to read the next page. The default filters get_thread_messages; backends
+        override it with a keyset query so each page is one indexed read.
+        """
+        messages = [
+            message for message in reversed(await self.get_thread_messages(thread_id))
+            if before is None or message.timestamp < before
+        ]
+        return messages[:limit]
+
     @abstractmethod
-    async def get_threads_for_user(self, identifier: str, thread_id: Optional[str]) -> Optional[
-        List['IChatHistoryRepository.ThreadDict']]:
+    async def get_threads_for_user(
+            self,
+            identifier: str,
+            thread_id: Optional[str],
+            projection: 'IChatHistoryRepository.ThreadProjection' = "full"
+    ) -> Optional[List['IChatHistoryRepository.ThreadDict']]:
+        """
+        gets the user's threads, or one thread by id. projection limits what is loaded: "metadata" returns the
+        threads with empty steps and elements, "steps" adds the steps and "full" also adds the elements
+        """
         pass
 
+    async def get_thread_author(self, thread_id: str, identifier: Optional[str] = None) -> Optional[str]:
+        """
+        gets the identifier of the user who owns the thread. Backends override this to read it without loading the
+        thread; this default looks the thread up among the threads of identifier, the user asking for it
+        """
+        if identifier is None:
+            return None
+        threads = await self.get_threads_for_user(identifier, thread_id, projection="metadata")
+        return threads[0]["userIdentifier"] if threads else None
+
+    async def get_threads_page(
+            self,
+            identifier: str,
+            first: int = 20,
+            cursor: Optional[str] = None,
+            search: Optional[str] = None
+    ) -> Tuple[List['IChatHistoryRepository.ThreadDict'], bool]:
+        """
+        Returns one page of the user's threads, newest first, without their steps or elements, and whether another
+        page follows. Backends override this to page inside the database; this default pages over
+        get_threads_for_user.
+
+        :param identifier: Identifier of the user owning the threads.
+        :param first: Maximum number of threads in the page.
+        :param cursor: Id of the last thread of the previous page. None for the first page.
+        :param search: Only return threads whose name contains this text, ignoring case.
+        """
+        threads = await self.get_threads_for_user(identifier, None, projection="metadata") or []
+        threads = sorted(threads, key=lambda thread: (str(thread["createdAt"] or ""), thread["id"]), reverse=True)
+        if cursor:
+            ids = [thread["id"] for thread in threads]
+            threads = threads[ids.index(cursor) + 1:] if cursor in ids else []
+        if search:
+            threads = [thread for thread in threads if search.lower() in (thread["name"] or "").lower()]
+        page = [dict(thread, steps=[], elements=[]) for thread in threads[:first]]
+        return page, len(threads) > first
+
     @abstractmethod
     async def update_message_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
         pass
@@ -234,6 +314,10 @@ class IChatHistoryRepository(ABC):
     async def delete_thread(self, thread_id: str) -> None:
         pass
 
+    async def close(self) -> None:
+        """ releases any connections held by the repository """
+        pass
+
 
 class ChatHistoryRepository:
 
@@ -249,6 +333,33 @@ class ChatHistoryRepository:
 
         self.repository = repository_class(config=config)
 
+        # Optional write-behind mode: message and step inserts are queued and written in batches in the background
+        self.write_behind = None
+        if config.chat_history.write_behind:
+            if type(self.repository).add_messages is IChatHistoryRepository.add_messages:
+                raise ValueError(
+                    f"write_behind needs a backend that stores messages with their own ids; {class_name} does not"
+                )
+            from ingenious.db.write_behind import WriteBehindQueue
+            self.write_behind = WriteBehindQueue(
+                self.repository,
+                max_size=config.chat_history.write_behind_max_size,
+                batch_size=config.chat_history.write_behind_batch_size,
+                flush_interval=config.chat_history.write_behind_flush_interval,
+                log_path=config.chat_history.write_behind_log_path,
+                max_attempts=config.chat_history.write_behind_max_attempts
+            )
+
+    async def _flush_thread(self, thread_id: Optional[str]) -> None:
+        """Writes queued rows before a thread is read or changed. thread_id None flushes if anything is queued."""
+        if self.write_behind is not None:
+            await self.write_behind.flush_thread(thread_id)
+
+    async def flush(self) -> None:
+        """Writes any rows queued by the write-behind mode."""
+        if self.write_behind is not None:
+            await self.write_behind.flush()
+
     async def update_thread(
             self,
             thread_id: str,
@@ -268,18 +379,33 @@ class ChatHistoryRepository:
         return await self.repository.add_user(identifier)
 
     async def add_step(self, step_dict: IChatHistoryRepository.StepDict) -> str:
+        if self.write_behind is not None:
+            return await self.write_behind.add_step(step_dict)
         return await self.repository.add_step(step_dict)
 
+    async def add_steps(self, step_dicts: List[IChatHistoryRepository.StepDict]) -> None:
+        if self.write_behind is not None:
+            return await self.write_behind.add_steps(step_dicts)
+        return await self.repository.add_steps(step_dicts)
+
     async def get_user(self, identifier: str) -> IChatHistoryRepository.User | None:
         return await self.repository.get_user(identifier)
 
     async def add_message(self, message: Message) -> str:
+        if self.write_behind is not None:
+            return await self.write_behind.add_message(message)
         return await self.repository.add_message(message)
 
+    async def add_messages(self, messages: List[Message]) -> List[str]:
+        if self.write_behind is not None:
+            return await self.write_behind.add_messages(messages)
+        return await self.repository.add_messages(messages)
+
     async def add_memory(self, memory: Message) -> str:
         return await self.repository.add_memory(memory)
 
     async def get_message(self, message_id: str, thread_id: str) -> Message | None:
+        await self._flush_thread(thread_id)
         return await self.repository.get_message(message_id, thread_id)
 
     async def get_memory(self, message_id: str, thread_id: str) -> Message | None:
@@ -289,16 +415,42 @@ class ChatHistoryRepository:
         return await self.repository.update_memory()
 
     async def get_thread_messages(self, thread_id: str) -> Optional[list[IChatHistoryRepository.ThreadDict]]:
+        await self._flush_thread(thread_id)
         return await self.repository.get_thread_messages(thread_id)
 
+    async def get_thread_messages_before(
+            self, thread_id: str, before: Optional[datetime] = None, limit: int = 20
+    ) -> list[Message]:
+        await self._flush_thread(thread_id)
+        return await self.repository.get_thread_messages_before(thread_id, before, limit)
+
     async def get_thread_memory(self, thread_id: str) -> Optional[list[IChatHistoryRepository.ThreadDict]]:
         return await self.repository.get_thread_memory(thread_id)
 
-    async def get_threads_for_user(self, identifier: str, thread_id: Optional[str]) -> Optional[
-        List[IChatHistoryRepository.ThreadDict]]:
-        return await self.repository.get_threads_for_user(identifier, thread_id)
+    async def get_threads_for_user(
+            self,
+            identifier: str,
+            thread_id: Optional[str],
+            projection: IChatHistoryRepository.ThreadProjection = "full"
+    ) -> Optional[List[IChatHistoryRepository.ThreadDict]]:
+        if projection != "metadata":
+            await self._flush_thread(thread_id)
+        return await self.repository.get_threads_for_user(identifier, thread_id, projection)
+
+    async def get_thread_author(self, thread_id: str, identifier: Optional[str] = None) -> Optional[str]:
+        return await self.repository.get_thread_author(thread_id, identifier)
+
+    async def get_threads_page(
+            self,
+            identifier: str,
+            first: int = 20,
+            cursor: Optional[str] = None,
+            search: Optional[str] = None
+    ) -> Tuple[List[IChatHistoryRepository.ThreadDict], bool]:
+        return await self.repository.get_threads_page(identifier, first, cursor, search)
 
     async def update_message_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
+        await self._flush_thread(thread_id)
         return await self.repository.update_message_feedback(message_id, thread_id, positive_feedback)
 
     async def update_memory_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
@@ -306,6 +458,7 @@ class ChatHistoryRepository:
 
     async def update_message_content_filter_results(
             self, message_id: str, thread_id: str, content_filter_results: dict[str, object]) -> None:
+        await self._flush_thread(thread_id)
         return await self.repository.update_message_content_filter_results(message_id, thread_id,
                                                                            content_filter_results)
 
@@ -314,6 +467,7 @@ class ChatHistoryRepository:
         return await self.repository.update_memory_content_filter_results(message_id, thread_id, content_filter_results)
 
     async def delete_thread(self, thread_id: str) -> None:
+        await self._flush_thread(thread_id)
         return await self.repository.delete_thread(thread_id)
 
     async def delete_thread_memory(self, thread_id: str) -> None:
@@ -321,3 +475,9 @@ class ChatHistoryRepository:
 
     async def delete_user_memory(self, user_id: str) -> None:
         return await self.repository.delete_user_memory(user_id)
+
+    async def close(self) -> None:
+        """Drains the write-behind queue, if enabled, before closing the repository."""
+        if self.write_behind is not None:
+            await self.write_behind.close()
+        return await self.repository.close()
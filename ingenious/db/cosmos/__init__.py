@@ -1,73 +1,272 @@
+import asyncio
+import json
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from azure.cosmos import PartitionKey, exceptions, CosmosClient
+from azure.cosmos import PartitionKey, exceptions
+from azure.cosmos.aio import ContainerProxy, CosmosClient
 
 import ingenious.config.config as Config
 from ingenious.db.chat_history_repository import IChatHistoryRepository
 from ingenious.models.message import Message
 
+# Maximum number of operations Cosmos DB accepts in a single transactional batch.
+TRANSACTIONAL_BATCH_LIMIT = 100
+# Maximum request payload of a transactional batch, with some headroom for the operation envelope.
+TRANSACTIONAL_BATCH_MAX_BYTES = 1800 * 1024
+
 
 class cosmos_ChatHistoryRepository(IChatHistoryRepository):
     def __init__(self, config: Config.Config):
         connection_string = config.chat_history.database_connection_string
-        print(f"Connection string: {connection_string}")
-        database_name = config.chat_history.database_name
-        print(f"Database name: {database_name}")
-        cosmos_client = CosmosClient.from_connection_string(connection_string)
-        database_client = cosmos_client.get_database_client(database_name)
-        self.container = database_client.create_container_if_not_exists(
-            id="chat_history",
-            partition_key=PartitionKey(path="/thread_id")
-        )
-
-        self.container_memory = database_client.create_container_if_not_exists(
-            id="chat_history_memory",
-            partition_key=PartitionKey(path="/thread_id")
-        )
+        self.database_name = config.chat_history.database_name
+        print(f"Database name: {self.database_name}")
+        self.cosmos_client = CosmosClient.from_connection_string(connection_string)
+        self._container: Optional[ContainerProxy] = None
+        self._container_memory: Optional[ContainerProxy] = None
+        self._container_steps: Optional[ContainerProxy] = None
+        self._container_threads: Optional[ContainerProxy] = None
+        self._containers_lock = asyncio.Lock()
+
+    async def _get_containers(self) -> Tuple[ContainerProxy, ContainerProxy]:
+        """Creates the containers on first use. The async client cannot do this from __init__."""
+        if self._container is None:
+            async with self._containers_lock:
+                if self._container is None:
+                    database_client = self.cosmos_client.get_database_client(self.database_name)
+                    self._container_memory = await database_client.create_container_if_not_exists(
+                        id="chat_history_memory",
+                        partition_key=PartitionKey(path="/thread_id")
+                    )
+                    self._container = await database_client.create_container_if_not_exists(
+                        id="chat_history",
+                        partition_key=PartitionKey(path="/thread_id")
+                    )
+        return self._container, self._container_memory
+
+    async def _get_container(self) -> ContainerProxy:
+        return (await self._get_containers())[0]
+
+    async def _get_container_memory(self) -> ContainerProxy:
+        return (await self._get_containers())[1]
+
+    async def _get_container_steps(self) -> ContainerProxy:
+        """Chainlit steps live in their own container, partitioned by thread, created the first time one is written."""
+        if self._container_steps is None:
+            async with self._containers_lock:
+                if self._container_steps is None:
+                    database_client = self.cosmos_client.get_database_client(self.database_name)
+                    self._container_steps = await database_client.create_container_if_not_exists(
+                        id="steps",
+                        partition_key=PartitionKey(path="/threadId")
+                    )
+        return self._container_steps
+
+    async def _get_container_threads(self) -> ContainerProxy:
+        """
+        Chainlit threads, one item per thread, created the first time one is written. The composite index serves
+        the keyset ordering used by get_threads_page.
+        """
+        if self._container_threads is None:
+            async with self._containers_lock:
+                if self._container_threads is None:
+                    database_client = self.cosmos_client.get_database_client(self.database_name)
+                    self._container_threads = await database_client.create_container_if_not_exists(
+                        id="threads",
+                        partition_key=PartitionKey(path="/id"),
+                        indexing_policy={
+                            "indexingMode": "consistent",
+                            "includedPaths": [{"path": "/*"}],
+                            "compositeIndexes": [
+                                [
+                                    {"path": "/userIdentifier", "order": "ascending"},
+                                    {"path": "/createdAt", "order": "descending"},
+                                    {"path": "/id", "order": "descending"}
+                                ],
+                                [
+                                    {"path": "/createdAt", "order": "descending"},
+                                    {"path": "/id", "order": "descending"}
+                                ]
+                            ]
+                        }
+                    )
+        return self._container_threads
+
+    @staticmethod
+    def _batches(items: List[Dict]) -> Iterator[List[Dict]]:
+        """Splits items into chunks that fit the operation count and payload size limits of a transactional batch."""
+        batch: List[Dict] = []
+        batch_bytes = 0
+        for item in items:
+            item_bytes = len(json.dumps(item, default=str))
+            if batch and (len(batch) >= TRANSACTIONAL_BATCH_LIMIT or batch_bytes + item_bytes > TRANSACTIONAL_BATCH_MAX_BYTES):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(item)
+            batch_bytes += item_bytes
+        if batch:
+            yield batch
+
+    async def _upsert_items(self, container: ContainerProxy, items_by_partition: Dict[str, List[Dict]]) -> None:
+        """
+        Writes items with one transactional batch per partition and chunk. Partitions are written concurrently;
+        the items of a chunk are committed together or not at all. Items are upserted, so a batch that is written
+        again after a partial failure, or replayed by the write-behind queue, does not fail on the items already
+        committed. Every chunk is attempted before the first error is raised.
+        """
+        results = await asyncio.gather(*[
+            container.execute_item_batch(
+                batch_operations=[("upsert", (item,)) for item in batch],
+                partition_key=partition_key
+            )
+            for partition_key, items in items_by_partition.items()
+            for batch in self._batches(items)
+        ], return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    @staticmethod
+    async def _delete_items(container: ContainerProxy, thread_id: str, item_ids: List[str]) -> None:
+        """Deletes items of one partition using transactional batches of up to TRANSACTIONAL_BATCH_LIMIT operations."""
+        for i in range(0, len(item_ids), TRANSACTIONAL_BATCH_LIMIT):
+            await container.execute_item_batch(
+                batch_operations=[("delete", (item_id,)) for item_id in item_ids[i:i + TRANSACTIONAL_BATCH_LIMIT]],
+                partition_key=thread_id
+            )
 
     async def add_message(self, message: Message) -> str:
+        container = await self._get_container()
         message.message_id = str(uuid.uuid4())
         message.timestamp = datetime.now()
         message_dict = message.model_dump(mode="json")
         message_dict['id'] = message.message_id
-        self.container.create_item(body=message_dict)
+        await container.create_item(body=message_dict)
 
         return message.message_id
 
+    async def add_messages(self, messages: List[Message], assign_ids: bool = True) -> List[str]:
+        container = await self._get_container()
+        now = datetime.now()
+        items_by_thread: Dict[str, List[Dict]] = defaultdict(list)
+        for i, message in enumerate(messages):
+            if assign_ids:
+                message.message_id = str(uuid.uuid4())
+                # Keep the batch in order when sorting by timestamp
+                message.timestamp = now + timedelta(microseconds=i)
+            message_dict = message.model_dump(mode="json")
+            message_dict['id'] = message.message_id
+            items_by_thread[message.thread_id].append(message_dict)
+
+        await self._upsert_items(container, items_by_thread)
+        return [message.message_id for message in messages]
+
+    async def add_step(self, step_dict: IChatHistoryRepository.StepDict) -> None:
+        await self.add_steps([step_dict])
+
+    async def add_steps(self, step_dicts: List[IChatHistoryRepository.StepDict]) -> None:
+        container = await self._get_container_steps()
+        items_by_thread: Dict[str, List[Dict]] = defaultdict(list)
+        for step_dict in step_dicts:
+            item = dict(step_dict)
+            item["id"] = item.get("id") or str(uuid.uuid4())
+            item["disableFeedback"] = item.get("disableFeedback", False)
+            items_by_thread[item["threadId"]].append(item)
+
+        await self._upsert_items(container, items_by_thread)
+
     async def get_message(self, message_id: str, thread_id: str) -> Message | None:
+        container = await self._get_container()
         try:
-            item = self.container.read_item(item=message_id, partition_key=thread_id)
+            item = await container.read_item(item=message_id, partition_key=thread_id)
             return Message(**item)
         except exceptions.CosmosHttpResponseError as e:
             if e.status_code == 404:
                 return None
             raise
 
-    async def get_thread_messages(self, thread_id: str) -> list[Message]:
+    async def get_thread_messages_page(
+            self, thread_id: str, page_size: int = 100, continuation_token: Optional[str] = None
+    ) -> Tuple[list[Message], Optional[str]]:
+        """
+        Returns one page of a thread's messages in timestamp order.
+
+        :param thread_id: Thread (and partition) to read.
+        :param page_size: Maximum number of messages in the page.
+        :param continuation_token: Token returned with the previous page. None for the first page.
+        :return: The messages and the token for the next page, which is None once the thread has been read.
+        """
+        container = await self._get_container()
         query = "SELECT * FROM c WHERE c.thread_id = @thread_id ORDER BY c.timestamp"
         parameters: list[dict[str, object]] = [{"name": "@thread_id", "value": thread_id}]
-        items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-        return [Message(**item) for item in items]
+        pages = container.query_items(
+            query=query,
+            parameters=parameters,
+            partition_key=thread_id,
+            max_item_count=page_size
+        ).by_page(continuation_token)
+        try:
+            page = await pages.__anext__()
+        except StopAsyncIteration:
+            return [], None
+        messages = [Message(**item) async for item in page]
+        return messages, pages.continuation_token
+
+    async def get_thread_messages_before(
+            self, thread_id: str, before: Optional[datetime] = None, limit: int = 20
+    ) -> list[Message]:
+        container = await self._get_container()
+        parameters: list[dict[str, object]] = [
+            {"name": "@thread_id", "value": thread_id},
+            {"name": "@limit", "value": limit}
+        ]
+        where = "c.thread_id = @thread_id"
+        if before is not None:
+            where += " AND c.timestamp < @before"
+            parameters.append({"name": "@before", "value": before.isoformat()})
+        query = f"SELECT TOP @limit * FROM c WHERE {where} ORDER BY c.timestamp DESC"
+        return [
+            Message(**item) async for item in container.query_items(
+                query=query, parameters=parameters, partition_key=thread_id
+            )
+        ]
+
+    async def get_thread_messages(self, thread_id: str) -> list[Message]:
+        messages: list[Message] = []
+        continuation_token = None
+        while True:
+            page, continuation_token = await self.get_thread_messages_page(
+                thread_id, continuation_token=continuation_token
+            )
+            messages.extend(page)
+            if not continuation_token:
+                return messages
 
     async def update_message_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
-        item = self.container.read_item(item=message_id, partition_key=thread_id)
+        container = await self._get_container()
+        item = await container.read_item(item=message_id, partition_key=thread_id)
         item['positive_feedback'] = positive_feedback
-        self.container.replace_item(item=item, body=item)
+        await container.replace_item(item=item, body=item)
 
     async def update_message_content_filter_results(
             self, message_id: str, thread_id: str, content_filter_results: dict[str, object]) -> None:
-        item = self.container.read_item(item=message_id, partition_key=thread_id)
+        container = await self._get_container()
+        item = await container.read_item(item=message_id, partition_key=thread_id)
         item['content_filter_results'] = content_filter_results
-        self.container.replace_item(item=item, body=item)
+        await container.replace_item(item=item, body=item)
 
     async def delete_thread(self, thread_id: str) -> None:
-        query = "SELECT * FROM c WHERE c.thread_id = @thread_id"
+        container = await self._get_container()
+        query = "SELECT c.id FROM c WHERE c.thread_id = @thread_id"
         parameters: list[dict[str, object]] = [{"name": "@thread_id", "value": thread_id}]
-        items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-        for item in items:
-            self.container.delete_item(item=item['id'], partition_key=item['id'])
+        item_ids = [
+            item['id'] async for item in container.query_items(
+                query=query, parameters=parameters, partition_key=thread_id
+            )
+        ]
+        await self._delete_items(container, thread_id, item_ids)
 
     async def update_thread(
             self,
@@ -77,17 +276,85 @@ class cosmos_ChatHistoryRepository(IChatHistoryRepository):
             metadata: Optional[Dict] = None,
             tags: Optional[List[str]] = None
     ) -> str:
-        pass
+        container = await self._get_container_threads()
+        try:
+            item = await container.read_item(item=thread_id, partition_key=thread_id)
+        except exceptions.CosmosResourceNotFoundError:
+            item = {"id": thread_id, "createdAt": self.get_now_as_string()}
+
+        if name is not None:
+            item["name"] = name
+        elif metadata and "name" in metadata:
+            item["name"] = metadata["name"]
+        if user_id:
+            item["userId"] = user_id
+            user = await self._get_user_by_id(user_id)
+            if user:
+                item["userIdentifier"] = user.identifier
+        if tags is not None:
+            item["tags"] = tags
+        if metadata:
+            item["metadata"] = metadata
+        await container.upsert_item(body=item)
+        return ""
+
+    async def get_threads_page(
+            self,
+            identifier: str,
+            first: int = 20,
+            cursor: Optional[str] = None,
+            search: Optional[str] = None
+    ) -> Tuple[List[IChatHistoryRepository.ThreadDict], bool]:
+        container = await self._get_container_threads()
+        query = (
+            "SELECT TOP @top c.id, c.createdAt, c.name, c.userId, c.userIdentifier, c.tags, c.metadata FROM c "
+            "WHERE c.userIdentifier = @identifier"
+        )
+        parameters: list[dict[str, object]] = [
+            {"name": "@top", "value": first + 1},
+            {"name": "@identifier", "value": identifier}
+        ]
+        if cursor:
+            # Keyset pagination: continue after the cursor thread in (createdAt, id) order
+            try:
+                cursor_item = await container.read_item(item=cursor, partition_key=cursor)
+            except exceptions.CosmosResourceNotFoundError:
+                return [], False
+            query += " AND (c.createdAt < @createdAt OR (c.createdAt = @createdAt AND c.id < @cursor))"
+            parameters.append({"name": "@createdAt", "value": cursor_item["createdAt"]})
+            parameters.append({"name": "@cursor", "value": cursor})
+        if search:
+            query += " AND CONTAINS(c.name, @search, true)"
+            parameters.append({"name": "@search", "value": search})
+        query += " ORDER BY c.createdAt DESC, c.id DESC"
+
+        items = [item async for item in container.query_items(query=query, parameters=parameters)]
+        threads = [
+            IChatHistoryRepository.ThreadDict(
+                id=item["id"],
+                createdAt=item.get("createdAt"),
+                name=item.get("name"),
+                userId=item.get("userId"),
+                userIdentifier=item.get("userIdentifier"),
+                tags=item.get("tags"),
+                metadata=item.get("metadata"),
+                steps=[],
+                elements=[],
+            )
+            for item in items[:first]
+        ]
+        return threads, len(items) > first
 
     async def add_user(self, identifier: str) -> IChatHistoryRepository.User:
+        container = await self._get_container()
         user_id = uuid.uuid4()
         user_data = {
-            "id": user_id,
+            "id": str(user_id),
             "identifier": identifier,
             "createdAt": datetime.now().isoformat(),
             "metadata": {}
         }
-        self.container.create_item(body=user_data)
+        await container.create_item(body=user_data)
         return IChatHistoryRepository.User(
             id=user_id,
             identifier=identifier,
@@ -95,13 +362,25 @@ class cosmos_ChatHistoryRepository(IChatHistoryRepository):
             metadata=user_data["metadata"]
         )
 
+    async def _get_user_by_id(self, user_id: str) -> IChatHistoryRepository.User | None:
+        container = await self._get_container()
+        query = "SELECT * FROM c WHERE c.id = @id AND IS_DEFINED(c.identifier)"
+        parameters = [{"name": "@id", "value": str(user_id)}]
+        async for user_data in container.query_items(query=query, parameters=parameters):
+            return IChatHistoryRepository.User(
+                id=user_data["id"],
+                identifier=user_data["identifier"],
+                createdAt=user_data["createdAt"],
+                metadata=user_data.get("metadata", {})
+            )
+        return None
+
     async def get_user(self, identifier: str) -> IChatHistoryRepository.User | None:
+        container = await self._get_container()
+        # Users are not stored against a thread, so this is the one lookup that has to fan out across partitions.
         query = "SELECT * FROM c WHERE c.identifier = @identifier"
         parameters = [{"name": "@identifier", "value": identifier}]
-        results = list(
-            self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-        if results:
-            user_data = results[0]
+        async for user_data in container.query_items(query=query, parameters=parameters):
             return IChatHistoryRepository.User(
                 id=user_data["id"],
                 identifier=user_data["identifier"],
@@ -110,22 +389,63 @@ class cosmos_ChatHistoryRepository(IChatHistoryRepository):
             )
         return None
 
-    async def get_threads_for_user(self, identifier: str, thread_id: Optional[str]) -> Optional[List[Dict]]:
-        """Retrieve threads associated with a specific user."""
-        query = "SELECT * FROM c WHERE c.user_id = @user_id"
-        parameters = [{"name": "@user_id", "value": identifier}]
+    async def get_thread_author(self, thread_id: str, identifier: Optional[str] = None) -> Optional[str]:
+        container = await self._get_container_threads()
+        try:
+            item = await container.read_item(item=thread_id, partition_key=thread_id)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        return item.get("userIdentifier")
+
+    async def _get_thread_steps(self, thread_id: str) -> List[IChatHistoryRepository.StepDict]:
+        container = await self._get_container_steps()
+        query = "SELECT * FROM c WHERE c.threadId = @thread_id ORDER BY c.createdAt"
+        parameters: list[dict[str, object]] = [{"name": "@thread_id", "value": thread_id}]
+        return [
+            IChatHistoryRepository.StepDict(**{key: value for key, value in item.items() if not key.startswith("_")})
+            async for item in container.query_items(query=query, parameters=parameters, partition_key=thread_id)
+        ]
+
+    async def get_threads_for_user(
+            self,
+            identifier: str,
+            thread_id: Optional[str],
+            projection: IChatHistoryRepository.ThreadProjection = "full"
+    ) -> Optional[List[IChatHistoryRepository.ThreadDict]]:
+        """Retrieve the user's latest 100 threads, or one thread by id if thread_id is provided."""
+        container = await self._get_container_threads()
+        parameters: list[dict[str, object]] = [{"name": "@identifier", "value": identifier}]
         if thread_id:
-            query += " AND c.thread_id = @thread_id"
+            query = "SELECT * FROM c WHERE c.userIdentifier = @identifier AND c.id = @thread_id"
             parameters.append({"name": "@thread_id", "value": thread_id})
-
-        results = list(self.container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        return results if results else None
+            items = container.query_items(query=query, parameters=parameters, partition_key=thread_id)
+        else:
+            query = "SELECT TOP 100 * FROM c WHERE c.userIdentifier = @identifier ORDER BY c.createdAt DESC, c.id DESC"
+            items = container.query_items(query=query, parameters=parameters)
+
+        threads = [
+            IChatHistoryRepository.ThreadDict(
+                id=item["id"],
+                createdAt=item.get("createdAt"),
+                name=item.get("name"),
+                userId=item.get("userId"),
+                userIdentifier=item.get("userIdentifier"),
+                tags=item.get("tags"),
+                metadata=item.get("metadata"),
+                steps=[],
+                # Elements are not stored in Cosmos DB
+                elements=[],
+            )
+            async for item in items
+        ]
+        if projection != "metadata":
+            steps = await asyncio.gather(*[self._get_thread_steps(thread["id"]) for thread in threads])
+            for thread, thread_steps in zip(threads, steps):
+                thread["steps"] = thread_steps
+        return threads
 
     async def add_memory(self, message: Message) -> str:
+        container_memory = await self._get_container_memory()
         message.message_id = str(uuid.uuid4())
         message.timestamp = datetime.now()
 
@@ -148,16 +468,17 @@ class cosmos_ChatHistoryRepository(IChatHistoryRepository):
 
         # Insert the memory record into CosmosDB
         try:
-            self.container_memory.create_item(body=message_dict)
+            await container_memory.create_item(body=message_dict)
         except exceptions.CosmosHttpResponseError as e:
             raise RuntimeError(f"Failed to add memory to CosmosDB: {e}")
 
         return message.message_id
 
     async def get_memory(self, message_id: str, thread_id: str) -> Message | None:
+        container_memory = await self._get_container_memory()
         try:
             query = """
-                SELECT * FROM c WHERE c.thread_id = @thread_id 
+                SELECT * FROM c WHERE c.thread_id = @thread_id
                 AND c.message_id = @message_id AND c.is_memory = true
                 ORDER BY c.timestamp DESC
                 OFFSET 0 LIMIT 1
@@ -166,67 +487,70 @@ class cosmos_ChatHistoryRepository(IChatHistoryRepository):
                 {"name": "@thread_id", "value": thread_id},
                 {"name": "@message_id", "value": message_id}
             ]
-            items = list(self.container_memory.query_items(query=query, parameters=parameters,
-                                                           enable_cross_partition_query=True))
-            if items:
-                return Message(**items[0])
+            async for item in container_memory.query_items(query=query, parameters=parameters,
+                                                           partition_key=thread_id):
+                return Message(**item)
         except exceptions.CosmosHttpResponseError as e:
             if e.status_code == 404:
                 return None
             raise
 
     async def update_memory(self) -> None:
+        container_memory = await self._get_container_memory()
         # Query to find the latest record for each thread
         query = """
-            SELECT c.user_id, c.thread_id, c.message_id, c.positive_feedback, c.timestamp, 
-                   c.role, c.content, c.content_filter_results, c.tool_calls, 
-                   c.tool_call_id, c.tool_call_function
+            SELECT c.id, c.user_id, c.thread_id, c.message_id, c.positive_feedback, c.timestamp,
+                   c.role, c.content, c.content_filter_results, c.tool_calls,
+                   c.tool_call_id, c.tool_call_function, c.is_memory
             FROM c
             WHERE c.is_memory = true
-            ORDER BY c.thread_id, c.timestamp DESC
         """
 
-        # Retrieve the latest memory records from CosmosDB
-        items = list(self.container_memory.query_items(query=query, enable_cross_partition_query=True))
+        # Group the memory records by thread, keeping the latest record of each
         latest_records = {}
-
-        # Deduplicate by thread_id, keeping only the latest record
-        for item in items:
+        superseded_ids: Dict[str, List[str]] = defaultdict(list)
+        async for item in container_memory.query_items(query=query):
             thread_id = item["thread_id"]
-            if thread_id not in latest_records:
+            latest = latest_records.get(thread_id)
+            if latest is None:
                 latest_records[thread_id] = item
+            elif item["timestamp"] > latest["timestamp"]:
+                superseded_ids[thread_id].append(latest["id"])
+                latest_records[thread_id] = item
+            else:
+                superseded_ids[thread_id].append(item["id"])
 
-        # Delete all memory records
-        delete_query = "SELECT c.id FROM c WHERE c.is_memory = true"
-        delete_items = list(self.container_memory.query_items(query=delete_query, enable_cross_partition_query=True))
-        for item in delete_items:
-            self.container_memory.delete_item(item=item['id'], partition_key=item['thread_id'])
-
-        # Insert the latest memory records back into CosmosDB
-        for record in latest_records.values():
-            try:
-                self.container_memory.create_item(body=record)
-            except exceptions.CosmosHttpResponseError as e:
-                raise RuntimeError(f"Failed to update memory in CosmosDB: {e}")
+        # Delete everything but the latest record, one transactional batch per thread partition
+        try:
+            await asyncio.gather(*[
+                self._delete_items(container_memory, thread_id, item_ids)
+                for thread_id, item_ids in superseded_ids.items()
+            ])
+        except exceptions.CosmosHttpResponseError as e:
+            raise RuntimeError(f"Failed to update memory in CosmosDB: {e}")
 
     async def get_thread_memory(self, thread_id: str) -> list[Message]:
+        container_memory = await self._get_container_memory()
         query = """
-            SELECT * FROM c WHERE c.thread_id = @thread_id 
+            SELECT TOP 1 * FROM c WHERE c.thread_id = @thread_id
             AND c.is_memory = true ORDER BY c.timestamp DESC
         """
         parameters = [{"name": "@thread_id", "value": thread_id}]
-        items = list(
-            self.container_memory.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-        return [Message(**item) for item in items] if items else []
+        return [
+            Message(**item) async for item in container_memory.query_items(
+                query=query, parameters=parameters, partition_key=thread_id
+            )
+        ]
 
     async def update_memory_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
+        container_memory = await self._get_container_memory()
         try:
             # Retrieve the memory record
-            item = self.container_memory.read_item(item=message_id, partition_key=thread_id)
+            item = await container_memory.read_item(item=message_id, partition_key=thread_id)
             if item.get('is_memory'):
                 # Update the positive_feedback field
                 item['positive_feedback'] = positive_feedback
-                self.container_memory.replace_item(item=item, body=item)
+                await container_memory.replace_item(item=item, body=item)
         except exceptions.CosmosHttpResponseError as e:
             if e.status_code == 404:
                 raise ValueError("Memory not found")
@@ -234,36 +558,43 @@ class cosmos_ChatHistoryRepository(IChatHistoryRepository):
 
     async def update_memory_content_filter_results(self, message_id: str, thread_id: str,
                                                    content_filter_results: dict[str, object]) -> None:
+        container_memory = await self._get_container_memory()
         try:
             # Retrieve the memory record
-            item = self.container_memory.read_item(item=message_id, partition_key=thread_id)
+            item = await container_memory.read_item(item=message_id, partition_key=thread_id)
             if item.get('is_memory'):
                 # Update the content_filter_results field
                 item['content_filter_results'] = content_filter_results
-                self.container_memory.replace_item(item=item, body=item)
+                await container_memory.replace_item(item=item, body=item)
         except exceptions.CosmosHttpResponseError as e:
             if e.status_code == 404:
                 raise ValueError("Memory not found")
             raise
 
     async def delete_thread_memory(self, thread_id: str) -> None:
+        container_memory = await self._get_container_memory()
         # Query to find all memory records for the thread
         query = "SELECT c.id FROM c WHERE c.thread_id = @thread_id AND c.is_memory = true"
         parameters = [{"name": "@thread_id", "value": thread_id}]
-        items = list(
-            self.container_memory.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-
-        # Delete each memory record found
-        for item in items:
-            self.container_memory.delete_item(item=item['id'], partition_key=thread_id)
+        item_ids = [
+            item['id'] async for item in container_memory.query_items(
+                query=query, parameters=parameters, partition_key=thread_id
+            )
+        ]
+        await self._delete_items(container_memory, thread_id, item_ids)
 
     async def delete_user_memory(self, user_id: str) -> None:
-        # Query to find all memory records for the user
-        query = "SELECT c.id FROM c WHERE c.user_id = @user_id AND c.is_memory = true"
-        parameters = [{"name": "@thread_id", "value": user_id}]
-        items = list(
-            self.container_memory.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-
-        # Delete each memory record found
-        for item in items:
-            self.container_memory.delete_item(item=item['id'], partition_key=user_id)
\ No newline at end of file
+        container_memory = await self._get_container_memory()
+        # Query to find all memory records for the user, across every thread partition
+        query = "SELECT c.id, c.thread_id FROM c WHERE c.user_id = @user_id AND c.is_memory = true"
+        parameters = [{"name": "@user_id", "value": user_id}]
+        item_ids: Dict[str, List[str]] = defaultdict(list)
+        async for item in container_memory.query_items(query=query, parameters=parameters):
+            item_ids[item['thread_id']].append(item['id'])
+
+        await asyncio.gather(*[
+            self._delete_items(container_memory, thread_id, ids) for thread_id, ids in item_ids.items()
+        ])
+
+    async def close(self) -> None:
+        await self.cosmos_client.close()
@@ -1,140 +1,690 @@
-from datetime import datetime
+import asyncio
+import json
+import logging
 import os
 import uuid
-import sqlite3
-from ingenious.models.message import Message
-from ingenious.db.chat_history_repository import IChatHistoryRepository
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import duckdb
+import pandas as pd
+
 import ingenious.config.config as Config
+from ingenious.db.chat_history_repository import IChatHistoryRepository
+from ingenious.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MESSAGE_COLUMNS = [
+    "user_id", "thread_id", "message_id", "positive_feedback", "timestamp", "role", "content",
+    "content_filter_results", "tool_calls", "tool_call_id", "tool_call_function"
+]
+
+STEP_COLUMNS = [
+    "id", "name", "type", "threadId", "parentId", "disableFeedback", "streaming", "waitForAnswer", "isError",
+    "metadata", "tags", "input", "output", "createdAt", "start", "end", "generation", "showInput", "language", "indent"
+]
+
+MESSAGE_TABLE_COLUMNS = '''
+    user_id VARCHAR,
+    thread_id VARCHAR,
+    message_id VARCHAR,
+    positive_feedback BOOLEAN,
+    timestamp TIMESTAMP,
+    role VARCHAR,
+    content VARCHAR,
+    content_filter_results JSON,
+    tool_calls JSON,
+    tool_call_id VARCHAR,
+    tool_call_function JSON
+'''
+
+SCHEMA = [
+    f'CREATE TABLE IF NOT EXISTS chat_history ({MESSAGE_TABLE_COLUMNS})',
+    f'CREATE TABLE IF NOT EXISTS chat_history_summary ({MESSAGE_TABLE_COLUMNS})',
+    '''
+        CREATE TABLE IF NOT EXISTS users (
+            "id" VARCHAR PRIMARY KEY,
+            "identifier" VARCHAR NOT NULL UNIQUE,
+            "metadata" JSON NOT NULL,
+            "createdAt" VARCHAR
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS threads (
+            "id" VARCHAR PRIMARY KEY,
+            "createdAt" VARCHAR,
+            "name" VARCHAR,
+            "userId" VARCHAR,
+            "userIdentifier" VARCHAR,
+            "tags" JSON,
+            "metadata" JSON
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS steps (
+            "id" VARCHAR PRIMARY KEY,
+            "name" VARCHAR NOT NULL,
+            "type" VARCHAR NOT NULL,
+            "threadId" VARCHAR NOT NULL,
+            "parentId" VARCHAR,
+            "disableFeedback" BOOLEAN NOT NULL,
+            "streaming" BOOLEAN NOT NULL,
+            "waitForAnswer" BOOLEAN,
+            "isError" BOOLEAN,
+            "metadata" JSON,
+            "tags" VARCHAR[],
+            "input" VARCHAR,
+            "output" VARCHAR,
+            "createdAt" VARCHAR,
+            "start" VARCHAR,
+            "end" VARCHAR,
+            "generation" JSON,
+            "showInput" VARCHAR,
+            "language" VARCHAR,
+            "indent" INTEGER
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS elements (
+            "id" VARCHAR PRIMARY KEY,
+            "threadId" VARCHAR,
+            "type" VARCHAR,
+            "url" VARCHAR,
+            "chainlitKey" VARCHAR,
+            "name" VARCHAR NOT NULL,
+            "display" VARCHAR,
+            "objectKey" VARCHAR,
+            "size" VARCHAR,
+            "page" INTEGER,
+            "language" VARCHAR,
+            "forId" VARCHAR,
+            "mime" VARCHAR
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS feedbacks (
+            "id" VARCHAR PRIMARY KEY,
+            "forId" VARCHAR NOT NULL,
+            "threadId" VARCHAR NOT NULL,
+            "value" INTEGER NOT NULL,
+            "comment" VARCHAR,
+            "createdAt" TIMESTAMP DEFAULT current_timestamp
+        )
+    ''',
+]
+
+# Tables that can be archived to Parquet, with the expression giving the date partition of each row.
+ARCHIVE_TABLES = {
+    "chat_history": 'CAST("timestamp" AS DATE)',
+    "steps": 'TRY_CAST(left("createdAt", 10) AS DATE)',
+    "feedbacks": 'CAST("createdAt" AS DATE)',
+}
 
 
 class duckdb_ChatHistoryRepository(IChatHistoryRepository):
+    """
+    Chat history stored in DuckDB. Inserts are vectorised (a batch is inserted from one DataFrame) and the columnar
+    storage keeps aggregate queries over large histories cheap. Older rows can be moved into date partitioned Parquet
+    files with archive_to_parquet and queried again, together with the live tables, after attach_parquet.
+    """
+
     def __init__(self, config: Config.Config):
-        db_path = config.chat_history.database_path
-        self.connection = sqlite3.connect(db_path)
+        self.db_path = config.chat_history.database_path
+        self.parquet_path = Path(config.chat_history.duckdb_parquet_path)
+        # Check if the directory exists, if not, create it
+        db_dir_check = os.path.dirname(self.db_path)
+        if db_dir_check and not os.path.exists(db_dir_check):
+            os.makedirs(db_dir_check)
+        self.connection = duckdb.connect(self.db_path)
         self._create_table()
 
     def _create_table(self):
-        with self.connection:
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS chat_history (
-                    user_id TEXT,
-                    thread_id TEXT,
-                    message_id TEXT, 
-                    positive_feedback BOOLEAN, 
-                    timestamp TEXT,
-                    role TEXT,
-                    content TEXT,
-                    content_filter_results TEXT,
-                    tool_calls TEXT,
-                    tool_call_id TEXT, 
-                    tool_call_function TEXT                
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        tags_type = self.connection.execute(
+            "SELECT data_type FROM duckdb_columns() WHERE table_name = 'threads' AND column_name = 'tags'"
+        ).fetchone()
+        if tags_type and tags_type[0].endswith("[]"):
+            # Thread tags are rewritten by update_thread, and DuckDB cannot update list columns, so they are kept as JSON
+            self.connection.execute('ALTER TABLE threads ALTER "tags" TYPE JSON USING to_json("tags")')
+        has_message_index = self.connection.execute(
+            "SELECT 1 FROM duckdb_indexes() WHERE index_name = 'ux_chat_history_message_id'"
+        ).fetchone()
+        if not has_message_index:
+            # Databases created before message ids were unique may hold replayed duplicates. They are kept, with the
+            # rowid appended to their id, so no history is lost and the first row keeps the id callers know.
+            duplicates = '''
+                message_id IS NOT NULL AND rowid NOT IN (
+                    SELECT MIN(rowid) FROM chat_history WHERE message_id IS NOT NULL GROUP BY message_id
+                )
+            '''
+            renamed = self.connection.execute(f'SELECT count(*) FROM chat_history WHERE {duplicates}').fetchone()[0]
+            if renamed:
+                self.connection.execute(
+                    f"UPDATE chat_history SET message_id = message_id || '-' || rowid WHERE {duplicates}"
                 )
-            ''')
+                logger.warning(f"Renamed {renamed} chat_history rows that repeated an earlier message_id")
+            self.connection.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS ux_chat_history_message_id ON chat_history (message_id)'
+            )
+
+    async def _run(self, fn: Callable[[duckdb.DuckDBPyConnection], T]) -> T:
+        """Runs fn off the event loop on its own cursor. DuckDB cursors can be used concurrently from threads."""
+        def work() -> T:
+            cursor = self.connection.cursor()
+            try:
+                return fn(cursor)
+            finally:
+                cursor.close()
+
+        return await asyncio.to_thread(work)
+
+    async def _execute(self, sql: str, params: Sequence[Any] = ()) -> None:
+        await self._run(lambda cursor: cursor.execute(sql, params))
+
+    async def _fetch_all(self, sql: str, params: Sequence[Any] = ()) -> List[Dict]:
+        def work(cursor: duckdb.DuckDBPyConnection) -> List[Dict]:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        return await self._run(work)
+
+    async def _fetch_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[Dict]:
+        rows = await self._fetch_all(sql, params)
+        return rows[0] if rows else None
+
+    async def _insert_frame(
+            self, table: str, columns: List[str], frame: pd.DataFrame, key: Optional[List[str]] = None
+    ) -> None:
+        """
+        Inserts the rows of frame. With a key, rows whose key is already stored, or repeated in the frame, are skipped,
+        so a batch that is written again after a failure is not duplicated.
+        """
+        conflict = ""
+        if key:
+            # DuckDB's ON CONFLICT only covers rows already in the table, not duplicates within one insert
+            frame = frame.drop_duplicates(subset=key)
+            conflict = " ON CONFLICT DO NOTHING"
+
+        def work(cursor: duckdb.DuckDBPyConnection) -> None:
+            cursor.register("new_rows", frame)
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            cursor.execute(f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM new_rows{conflict}')
+            cursor.unregister("new_rows")
+
+        await self._run(work)
+
+    @staticmethod
+    def _to_json(value) -> Optional[str]:
+        return json.dumps(value) if value is not None else None
+
+    @staticmethod
+    def _from_json(value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    @classmethod
+    def _to_message(cls, row: Dict) -> Message:
+        return Message(
+            user_id=row["user_id"],
+            thread_id=row["thread_id"],
+            message_id=row["message_id"],
+            positive_feedback=row["positive_feedback"],
+            timestamp=row["timestamp"],
+            role=row["role"],
+            content=row["content"],
+            content_filter_results=cls._from_json(row["content_filter_results"]),
+            tool_calls=cls._from_json(row["tool_calls"]),
+            tool_call_id=row["tool_call_id"],
+            tool_call_function=cls._from_json(row["tool_call_function"])
+        )
+
+    async def _add_messages(self, table: str, messages: List[Message], assign_ids: bool = True) -> List[str]:
+        now = datetime.now()
+        if assign_ids:
+            for i, message in enumerate(messages):
+                message.message_id = str(uuid.uuid4())
+                # Keep the batch in order when sorting by timestamp
+                message.timestamp = now + timedelta(microseconds=i)
+
+        if messages:
+            frame = pd.DataFrame([
+                (
+                    message.user_id,
+                    message.thread_id,
+                    message.message_id,
+                    message.positive_feedback,
+                    message.timestamp,
+                    message.role,
+                    message.content,
+                    self._to_json(message.content_filter_results),
+                    self._to_json(message.tool_calls),
+                    message.tool_call_id,
+                    self._to_json(message.tool_call_function)
+                ) for message in messages
+            ], columns=MESSAGE_COLUMNS)
+            # Messages whose id is already stored, e.g. from a batch the write-behind queue replays, are skipped
+            key = ["message_id"] if table == "chat_history" else None
+            await self._insert_frame(table, MESSAGE_COLUMNS, frame, key=key)
+        return [message.message_id for message in messages]
+
+    async def _select_messages(self, table: str, where: str, params: Sequence[Any], suffix: str = "") -> List[Message]:
+        columns = ", ".join(MESSAGE_COLUMNS)
+        rows = await self._fetch_all(f'SELECT {columns} FROM {table} WHERE {where} {suffix}', params)
+        return [self._to_message(row) for row in rows]
 
     async def add_message(self, message: Message) -> str:
-        message.message_id = str(uuid.uuid4())
-        message.timestamp = datetime.now()
-
-        with self.connection:
-            self.connection.execute('''
-                INSERT INTO chat_history (
-                                    user_id, 
-                                    thread_id, 
-                                    message_id, 
-                                    positive_feedback, 
-                                    timestamp, 
-                                    role, 
-                                    content, 
-                                    content_filter_results, 
-                                    tool_calls, 
-                                    tool_call_id, 
-                                    tool_call_function)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                    message.user_id, 
-                    message.thread_id, 
-                    message.message_id, 
-                    message.positive_feedback, 
-                    message.timestamp, 
-                    message.role, 
-                    message.content, 
-                    message.content_filter_results, 
-                    message.tool_calls, 
-                    message.tool_call_id, 
-                    message.tool_call_function
-                )
-                                    )
+        return (await self._add_messages("chat_history", [message]))[0]
 
-        return message.message_id
+    async def add_messages(self, messages: List[Message], assign_ids: bool = True) -> List[str]:
+        return await self._add_messages("chat_history", messages, assign_ids)
 
-    async def get_message(self, message_id: str, thread_id: str) -> Message | None:
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, content_filter_results, tool_calls, tool_call_id, tool_call_function
-            FROM chat_history
-            WHERE id = ? AND thread_id = ?
-        ''', (message_id, thread_id))
-        row = cursor.fetchone()
-        if row:
+    async def add_memory(self, message: Message) -> str:
+        return (await self._add_messages("chat_history_summary", [message]))[0]
 
-            return Message(
-                user_id=row[0],
-                thread_id=row[1],
-                message_id=row[2],
-                positive_feedback=row[3],
-                timestamp=row[4],
-                role=row[5],
-                content=row[6],
-                content_filter_results=row[7],
-                tool_calls=row[8],
-                tool_call_id=row[9],
-                tool_call_function=row[10]
-            )
-        return None
+    async def get_message(self, message_id: str, thread_id: str) -> Message | None:
+        messages = await self._select_messages(
+            "chat_history", "message_id = ? AND thread_id = ?", (message_id, thread_id)
+        )
+        return messages[0] if messages else None
 
     async def get_thread_messages(self, thread_id: str) -> list[Message]:
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, content_filter_results, tool_calls, tool_call_id, tool_call_function
-            FROM chat_history
-            WHERE thread_id = ?
-            ORDER BY timestamp
-        ''', (thread_id,))
-        rows = cursor.fetchall()
-        return [Message(
-            user_id=row[0],
-                thread_id=row[1],
-                message_id=row[2],
-                positive_feedback=row[3],
-                timestamp=row[4],
-                role=row[5],
-                content=row[6],
-                content_filter_results=row[7],
-                tool_calls=row[8],
-                tool_call_id=row[9],
-                tool_call_function=row[10]
-                ) for row in rows]
+        messages = await self._select_messages(
+            "chat_history", "thread_id = ?", (thread_id,), "ORDER BY timestamp DESC LIMIT 5"
+        )
+        return list(reversed(messages))
+
+    async def get_thread_messages_before(
+            self, thread_id: str, before: Optional[datetime] = None, limit: int = 20
+    ) -> list[Message]:
+        if before is None:
+            return await self._select_messages(
+                "chat_history", "thread_id = ?", (thread_id, limit), "ORDER BY timestamp DESC LIMIT ?"
+            )
+        return await self._select_messages(
+            "chat_history", "thread_id = ? AND timestamp < ?", (thread_id, before, limit), "ORDER BY timestamp DESC LIMIT ?"
+        )
 
     async def update_message_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
-        with self.connection:
-            self.connection.execute('''
-                UPDATE chat_history
-                SET positive_feedback = ?
-                WHERE id = ? AND thread_id = ?
-            ''', (positive_feedback, message_id, thread_id))
+        await self._execute('''
+            UPDATE chat_history
+            SET positive_feedback = ?
+            WHERE message_id = ? AND thread_id = ?
+        ''', (positive_feedback, message_id, thread_id))
 
     async def update_message_content_filter_results(
             self, message_id: str, thread_id: str, content_filter_results: dict[str, object]) -> None:
-        with self.connection:
-            self.connection.execute('''
-                UPDATE chat_history
-                SET content_filter_results = ?
-                WHERE id = ? AND thread_id = ?
-            ''', (str(content_filter_results), message_id, thread_id))
+        await self._execute('''
+            UPDATE chat_history
+            SET content_filter_results = ?
+            WHERE message_id = ? AND thread_id = ?
+        ''', (self._to_json(content_filter_results), message_id, thread_id))
 
     async def delete_thread(self, thread_id: str) -> None:
-        with self.connection:
-            self.connection.execute('''
-                DELETE FROM chat_history
-                WHERE thread_id = ?
-            ''', (thread_id,))
+        await self._execute('DELETE FROM chat_history WHERE thread_id = ?', (thread_id,))
+
+    async def add_user(self, identifier, metadata: dict = {}) -> IChatHistoryRepository.User:
+        new_id = str(uuid.uuid4())
+        created_at = self.get_now_as_string()
+        await self._execute('''
+            INSERT INTO users (id, identifier, metadata, createdAt)
+            VALUES (?, ?, ?, ?)
+        ''', (new_id, identifier, json.dumps(metadata), created_at))
+        return IChatHistoryRepository.User(
+            id=uuid.UUID(new_id),
+            identifier=identifier,
+            metadata=metadata,
+            createdAt=created_at
+        )
+
+    async def get_user(self, identifier) -> IChatHistoryRepository.User | None:
+        row = await self._fetch_one('''
+            SELECT id, identifier, metadata, createdAt FROM users WHERE identifier = ?
+        ''', (identifier,))
+        if row:
+            return IChatHistoryRepository.User(
+                id=row["id"],
+                identifier=row["identifier"],
+                metadata=self._from_json(row["metadata"]),
+                createdAt=row["createdAt"]
+            )
+        return await self.add_user(identifier)
+
+    async def _get_user_by_id(self, user_id: str) -> IChatHistoryRepository.User | None:
+        row = await self._fetch_one('SELECT id, identifier, metadata, createdAt FROM users WHERE id = ?', (user_id,))
+        if row:
+            return IChatHistoryRepository.User(
+                id=row["id"],
+                identifier=row["identifier"],
+                metadata=self._from_json(row["metadata"]),
+                createdAt=row["createdAt"]
+            )
+        return None
+
+    async def update_thread(
+            self,
+            thread_id: str,
+            name: Optional[str] = None,
+            user_id: Optional[str] = None,
+            metadata: Optional[Dict] = None,
+            tags: Optional[List[str]] = None,
+    ) -> str:
+        user_identifier = None
+        if user_id:
+            user = await self._get_user_by_id(user_id)
+            if user:
+                user_identifier = user.identifier
+
+        data = {
+            "id": thread_id,
+            "createdAt": self.get_now_as_string() if metadata is None else None,
+            "name": (
+                name
+                if name is not None
+                else (metadata.get("name") if metadata and "name" in metadata else None)
+            ),
+            "userId": user_id,
+            "userIdentifier": user_identifier,
+            "tags": self._to_json(tags),
+            "metadata": json.dumps(metadata) if metadata else None,
+        }
+        parameters = {key: value for key, value in data.items() if value is not None}
+        columns = ", ".join(f'"{key}"' for key in parameters.keys())
+        values = ", ".join("?" for _ in parameters.keys())
+        updates = ", ".join(f'"{key}" = EXCLUDED."{key}"' for key in parameters.keys() if key != "id")
+        conflict = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+        await self._execute(
+            f'INSERT INTO threads ({columns}) VALUES ({values}) ON CONFLICT ("id") {conflict}',
+            tuple(parameters.values())
+        )
+        return ""
+
+    async def add_step(self, step_dict: IChatHistoryRepository.StepDict):
+        await self.add_steps([step_dict])
+
+    async def add_steps(self, step_dicts: List[IChatHistoryRepository.StepDict]) -> None:
+        if not step_dicts:
+            return
+        rows = []
+        for step_dict in step_dicts:
+            row = {column: step_dict.get(column) for column in STEP_COLUMNS}
+            row["id"] = step_dict.get("id") or str(uuid.uuid4())
+            row["disableFeedback"] = step_dict.get("disableFeedback", False)
+            row["streaming"] = step_dict.get("streaming", False)
+            row["showInput"] = str(step_dict["showInput"]).lower() if "showInput" in step_dict else None
+            row["metadata"] = json.dumps(step_dict.get("metadata") or {})
+            row["generation"] = json.dumps(step_dict.get("generation") or {})
+            rows.append(row)
+        await self._insert_frame("steps", STEP_COLUMNS, pd.DataFrame(rows, columns=STEP_COLUMNS), key=["id"])
+
+    async def get_thread_author(self, thread_id: str, identifier: Optional[str] = None) -> Optional[str]:
+        row = await self._fetch_one('SELECT "userIdentifier" FROM threads WHERE "id" = ?', (thread_id,))
+        return row["userIdentifier"] if row else None
+
+    async def get_threads_for_user(
+            self,
+            identifier: str,
+            thread_id: Optional[str],
+            projection: IChatHistoryRepository.ThreadProjection = "full"
+    ) -> Optional[List[IChatHistoryRepository.ThreadDict]]:
+        """Fetch the user's latest 100 threads, or one thread by id if thread_id is provided."""
+        where = '"userIdentifier" = ?'
+        params: List[Any] = [identifier]
+        if thread_id is not None:
+            where += ' AND "id" = ?'
+            params.append(thread_id)
+        threads = await self._fetch_all(f'''
+            SELECT "id", "createdAt", "name", "userId", "userIdentifier", "tags", "metadata"
+            FROM threads
+            WHERE {where}
+            ORDER BY "createdAt" DESC
+            LIMIT 100
+        ''', params)
+        if not threads:
+            return []
+
+        thread_ids = [thread["id"] for thread in threads]
+        # Steps and elements are only queried when the projection asks for them
+        steps = []
+        if projection != "metadata":
+            steps = await self._fetch_all('''
+                SELECT s.*, f."value" AS feedback_value, f."comment" AS feedback_comment, f."id" AS feedback_id
+                FROM steps s LEFT JOIN feedbacks f ON s."id" = f."forId"
+                WHERE list_contains(?, s."threadId")
+                ORDER BY s."createdAt" ASC
+            ''', (thread_ids,))
+        elements = []
+        if projection == "full":
+            elements = await self._fetch_all(
+                'SELECT * FROM elements WHERE list_contains(?, "threadId")', (thread_ids,)
+            )
+
+        thread_dicts = {
+            thread["id"]: IChatHistoryRepository.ThreadDict(
+                id=thread["id"],
+                createdAt=thread["createdAt"],
+                name=thread["name"],
+                userId=thread["userId"],
+                userIdentifier=thread["userIdentifier"],
+                tags=self._from_json(thread["tags"]),
+                metadata=self._from_json(thread["metadata"]),
+                steps=[],
+                elements=[],
+            )
+            for thread in threads
+        }
+        for step in steps:
+            feedback = None
+            if step["feedback_value"] is not None:
+                feedback = IChatHistoryRepository.FeedbackDict(
+                    forId=step["id"],
+                    id=step["feedback_id"],
+                    value=step["feedback_value"],
+                    comment=step["feedback_comment"],
+                )
+            thread_dicts[step["threadId"]]["steps"].append(IChatHistoryRepository.StepDict(
+                id=step["id"],
+                name=step["name"],
+                type=step["type"],
+                threadId=step["threadId"],
+                parentId=step["parentId"],
+                streaming=step["streaming"],
+                waitForAnswer=step["waitForAnswer"],
+                isError=step["isError"],
+                metadata=self._from_json(step["metadata"]) or {},
+                tags=step["tags"],
+                input=step["input"] if step["showInput"] not in [None, "false"] else "",
+                output=step["output"] or "",
+                createdAt=step["createdAt"],
+                start=step["start"],
+                end=step["end"],
+                generation=self._from_json(step["generation"]),
+                showInput=step["showInput"],
+                language=step["language"],
+                indent=step["indent"],
+                feedback=feedback,
+            ))
+        for element in elements:
+            thread_dicts[element["threadId"]]["elements"].append(IChatHistoryRepository.ElementDict(
+                id=element["id"],
+                threadId=element["threadId"],
+                type=element["type"],
+                chainlitKey=element["chainlitKey"],
+                url=element["url"],
+                objectKey=element["objectKey"],
+                name=element["name"],
+                display=element["display"],
+                size=element["size"],
+                language=element["language"],
+                autoPlay=None,
+                playerConfig=None,
+                page=element["page"],
+                forId=element["forId"],
+                mime=element["mime"],
+            ))
+        return list(thread_dicts.values())
+
+    async def get_threads_page(
+            self,
+            identifier: str,
+            first: int = 20,
+            cursor: Optional[str] = None,
+            search: Optional[str] = None
+    ) -> Tuple[List[IChatHistoryRepository.ThreadDict], bool]:
+        where = ['"userIdentifier" = ?']
+        params: List[Any] = [identifier]
+        if cursor:
+            # Keyset pagination: continue after the cursor thread in ("createdAt", "id") order
+            where.append('("createdAt", "id") < (SELECT ("createdAt", "id") FROM threads WHERE "id" = ?)')
+            params.append(cursor)
+        if search:
+            where.append('"name" ILIKE ? ESCAPE \'!\'')
+            params.append("%" + search.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%")
+        params.append(first + 1)
+
+        rows = await self._fetch_all(f'''
+            SELECT "id", "createdAt", "name", "userId", "userIdentifier", "tags", "metadata"
+            FROM threads
+            WHERE {" AND ".join(where)}
+            ORDER BY "createdAt" DESC, "id" DESC
+            LIMIT ?
+        ''', params)
+        threads = [
+            IChatHistoryRepository.ThreadDict(
+                id=row["id"],
+                createdAt=row["createdAt"],
+                name=row["name"],
+                userId=row["userId"],
+                userIdentifier=row["userIdentifier"],
+                tags=self._from_json(row["tags"]),
+                metadata=self._from_json(row["metadata"]),
+                steps=[],
+                elements=[],
+            )
+            for row in rows[:first]
+        ]
+        return threads, len(rows) > first
+
+    async def update_memory(self) -> None:
+        # Keep only the latest summary of each thread.
+        await self._execute('''
+            DELETE FROM chat_history_summary
+            WHERE rowid NOT IN (
+                SELECT arg_max(rowid, timestamp) FROM chat_history_summary GROUP BY thread_id
+            )
+        ''')
+
+    async def get_memory(self, message_id: str, thread_id: str) -> Message | None:
+        messages = await self.get_thread_memory(thread_id)
+        return messages[0] if messages else None
+
+    async def get_thread_memory(self, thread_id: str) -> list[Message]:
+        return await self._select_messages(
+            "chat_history_summary", "thread_id = ?", (thread_id,), "ORDER BY timestamp DESC LIMIT 1"
+        )
+
+    async def update_memory_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
+        await self._execute('''
+            UPDATE chat_history_summary
+            SET positive_feedback = ?
+            WHERE message_id = ? AND thread_id = ?
+        ''', (positive_feedback, message_id, thread_id))
+
+    async def update_memory_content_filter_results(
+            self, message_id: str, thread_id: str, content_filter_results: dict[str, object]) -> None:
+        await self._execute('''
+            UPDATE chat_history_summary
+            SET content_filter_results = ?
+            WHERE message_id = ? AND thread_id = ?
+        ''', (self._to_json(content_filter_results), message_id, thread_id))
+
+    async def delete_thread_memory(self, thread_id: str) -> None:
+        await self._execute('DELETE FROM chat_history_summary WHERE thread_id = ?', (thread_id,))
+
+    async def delete_user_memory(self, user_id: str) -> None:
+        await self._execute('DELETE FROM chat_history_summary WHERE user_id = ?', (user_id,))
+
+    async def archive_to_parquet(self, before: date, path: Optional[str] = None) -> Dict[str, int]:
+        """
+        Moves chat_history, steps and feedbacks rows dated before the given day out of the database into Parquet
+        files partitioned by date (<path>/<table>/date=YYYY-MM-DD/*.parquet). Each table is written and deleted in
+        one transaction, so rows are never both archived and live or lost. Archiving the same day again later only
+        adds the rows written since.
+
+        :param before: Rows dated strictly before this day are archived.
+        :param path: Root folder of the archive. Defaults to chat_history.duckdb_parquet_path.
+        :return: Number of rows archived per table.
+        """
+        root = Path(path) if path else self.parquet_path
+        cutoff = f"DATE '{before.isoformat()}'"
+
+        def work(cursor: duckdb.DuckDBPyConnection) -> Dict[str, int]:
+            archived = {}
+            for table, date_expression in ARCHIVE_TABLES.items():
+                where = f"{date_expression} < {cutoff}"
+                target = str((root / table).as_posix()).replace("'", "''")
+                cursor.execute("BEGIN TRANSACTION")
+                try:
+                    count = cursor.execute(f"SELECT count(*) FROM {table} WHERE {where}").fetchone()[0]
+                    if count:
+                        cursor.execute(f'''
+                            COPY (SELECT *, {date_expression} AS date FROM {table} WHERE {where})
+                            TO '{target}' (FORMAT PARQUET, PARTITION_BY (date), OVERWRITE_OR_IGNORE true,
+                                           FILENAME_PATTERN 'part_{{uuid}}')
+                        ''')
+                        cursor.execute(f"DELETE FROM {table} WHERE {where}")
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                archived[table] = count
+            return archived
+
+        root.mkdir(parents=True, exist_ok=True)
+        return await self._run(work)
+
+    async def attach_parquet(self, path: Optional[str] = None) -> List[str]:
+        """
+        Creates a <table>_archive view over the Parquet partitions of each archived table and a <table>_all view
+        that unions it with the live table. Both expose a date column; filtering on it skips whole partitions.
+        Call again after archiving or copying in new partitions.
+
+        :param path: Root folder of the archive. Defaults to chat_history.duckdb_parquet_path.
+        :return: The tables that have archived partitions.
+        """
+        root = Path(path) if path else self.parquet_path
+
+        def work(cursor: duckdb.DuckDBPyConnection) -> List[str]:
+            attached = []
+            for table, date_expression in ARCHIVE_TABLES.items():
+                live = f"SELECT *, {date_expression} AS date FROM {table}"
+                if any((root / table).glob("*/*.parquet")):
+                    files = str((root / table / "*" / "*.parquet").as_posix()).replace("'", "''")
+                    cursor.execute(f'''
+                        CREATE OR REPLACE VIEW {table}_archive AS
+                        SELECT * FROM read_parquet('{files}', hive_partitioning = true, union_by_name = true)
+                    ''')
+                    cursor.execute(f'''
+                        CREATE OR REPLACE VIEW {table}_all AS
+                        {live} UNION ALL BY NAME SELECT * FROM {table}_archive
+                    ''')
+                    attached.append(table)
+                else:
+                    cursor.execute(f"CREATE OR REPLACE VIEW {table}_all AS {live}")
+            return attached
+
+        return await self._run(work)
+
+    async def query(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        """
+        Runs an analytical query (for example over chat_history_all after attach_parquet) and returns the result as
+        a DataFrame.
+        """
+        return await self._run(lambda cursor: cursor.execute(sql, params).df())
+
+    async def close(self) -> None:
+        self.connection.close()
@@ -1,12 +1,13 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 import sqlite3
 from ingenious.models.message import Message
 from ingenious.db.chat_history_repository import IChatHistoryRepository
-from ingenious.db.chat_history_repository import IChatHistoryRepository
+from ingenious.db.sqlite.connection_pool import SqliteConnectionPool
+from ingenious.db.sqlite.migrations import apply_migrations
 import ingenious.config.config as Config
 from types import SimpleNamespace
 
@@ -16,151 +17,50 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         self.db_path = config.chat_history.database_path
         # Check if the directory exists, if not, create it
         db_dir_check = os.path.dirname(self.db_path)
-        if not os.path.exists(db_dir_check):
+        if db_dir_check and not os.path.exists(db_dir_check):
             os.makedirs(db_dir_check)
-        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.pool = SqliteConnectionPool(
+            db_path=self.db_path,
+            pool_size=config.chat_history.sqlite_pool_size,
+            journal_mode=config.chat_history.sqlite_journal_mode,
+            busy_timeout=config.chat_history.sqlite_busy_timeout
+        )
         self._create_table()
 
-    def execute_sql(self, sql, params=[], expect_results=True):
-        connection = None
+    async def execute_sql(self, sql, params=[], expect_results=True):
         try:
-            connection = sqlite3.connect(self.db_path)
-            connection.row_factory = sqlite3.Row  # Set row factory to sqlite3.Row
-            cursor = connection.cursor()
-            # print("Executing SQL: ", sql)
-            # print("Params: ", params)
-
             if expect_results:
-                res = cursor.execute(sql, params)
-                rows = res.fetchall()
-                result = [dict(row) for row in rows]
-                return result
+                rows = await self.pool.fetch_all(sql, params)
+                return [dict(row) for row in rows]
             else:
-                connection.execute(sql, params)
-                connection.commit()
+                await self.pool.execute(sql, params)
 
         except sqlite3.Error as e:
             # Display the exception
             print(e)
 
-        finally:
-            if connection:
-                connection.close()
+    @staticmethod
+    def _to_message(row) -> Message:
+        return Message(
+            user_id=row[0],
+            thread_id=row[1],
+            message_id=row[2],
+            positive_feedback=row[3],
+            timestamp=row[4],
+            role=row[5],
+            content=row[6],
+            content_filter_results=row[7],
+            tool_calls=row[8],
+            tool_call_id=row[9],
+            tool_call_function=row[10]
+        )
 
     def _create_table(self):
-        with self.connection:
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS chat_history (
-                    user_id TEXT,
-                    thread_id TEXT,
-                    message_id TEXT, 
-                    positive_feedback BOOLEAN, 
-                    timestamp TEXT,
-                    role TEXT,
-                    content TEXT,
-                    content_filter_results TEXT,
-                    tool_calls TEXT,
-                    tool_call_id TEXT, 
-                    tool_call_function TEXT                
-                );
-            ''')
-
-            self.connection.execute('''
-                            CREATE TABLE IF NOT EXISTS chat_history_summary (
-                                user_id TEXT,
-                                thread_id TEXT,
-                                message_id TEXT, 
-                                positive_feedback BOOLEAN, 
-                                timestamp TEXT,
-                                role TEXT,
-                                content TEXT,
-                                content_filter_results TEXT,
-                                tool_calls TEXT,
-                                tool_call_id TEXT, 
-                                tool_call_function TEXT                
-                            );
-                        ''')
-
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    "id" UUID PRIMARY KEY,
-                    "identifier" TEXT NOT NULL UNIQUE,
-                    "metadata" JSONB NOT NULL,
-                    "createdAt" TEXT
-                );
-            ''')
-
-            self.connection.execute('''                                     
-                CREATE TABLE IF NOT EXISTS threads (
-                    "id" UUID PRIMARY KEY,
-                    "createdAt" TEXT,
-                    "name" TEXT,
-                    "userId" UUID,
-                    "userIdentifier" TEXT,
-                    "tags" TEXT[],
-                    "metadata" JSONB,
-                    FOREIGN KEY ("userId") REFERENCES users("id") ON DELETE CASCADE
-                );
-            ''')
-
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS steps (
-                    "id" UUID PRIMARY KEY,
-                    "name" TEXT NOT NULL,
-                    "type" TEXT NOT NULL,
-                    "threadId" UUID NOT NULL,
-                    "parentId" UUID,
-                    "disableFeedback" BOOLEAN NOT NULL,
-                    "streaming" BOOLEAN NOT NULL,
-                    "waitForAnswer" BOOLEAN,
-                    "isError" BOOLEAN,
-                    "metadata" JSONB,
-                    "tags" TEXT[],
-                    "input" TEXT,
-                    "output" TEXT,
-                    "createdAt" TEXT,
-                    "start" TEXT,
-                    "end" TEXT,
-                    "generation" JSONB,
-                    "showInput" TEXT,
-                    "language" TEXT,
-                    "indent" INT
-                );
-            ''')
-
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS elements (
-                    "id" UUID PRIMARY KEY,
-                    "threadId" UUID,
-                    "type" TEXT,
-                    "url" TEXT,
-                    "chainlitKey" TEXT,
-                    "name" TEXT NOT NULL,
-                    "display" TEXT,
-                    "objectKey" TEXT,
-                    "size" TEXT,
-                    "page" INT,
-                    "language" TEXT,
-                    "forId" UUID,
-                    "mime" TEXT
-                );
-
-            ''')
-
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS feedbacks (
-                    "id" UUID PRIMARY KEY,
-                    "forId" UUID NOT NULL,
-                    "threadId" UUID NOT NULL,
-                    "value" INT NOT NULL,
-                    "comment" TEXT
-                );
-            ''')
+        with self.pool.connection() as connection:
+            apply_migrations(connection)
 
     async def _get_user_by_id(self, user_id: str) -> IChatHistoryRepository.User | None:
-        cursor = self.connection.cursor()
-        cursor.execute('''SELECT id, identifier, metadata, createdAt FROM users WHERE id = ?''', (user_id,))
-        row = cursor.fetchone()
+        row = await self.pool.fetch_one('''SELECT id, identifier, metadata, createdAt FROM users WHERE id = ?''', (user_id,))
         if row:
             return IChatHistoryRepository.User(
                 id=row[0],
@@ -174,35 +74,34 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         message.message_id = str(uuid.uuid4())
         message.timestamp = datetime.now()
 
-        with self.connection:
-            self.connection.execute('''
-                INSERT INTO chat_history_summary (
-                                    user_id, 
-                                    thread_id, 
-                                    message_id, 
-                                    positive_feedback, 
-                                    timestamp, 
-                                    role, 
-                                    content, 
-                                    content_filter_results, 
-                                    tool_calls, 
-                                    tool_call_id, 
-                                    tool_call_function)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                message.user_id,
-                message.thread_id,
-                message.message_id,
-                message.positive_feedback,
-                message.timestamp,
-                message.role,
-                message.content,
-                message.content_filter_results,
-                message.tool_calls,
-                message.tool_call_id,
-                message.tool_call_function
-            )
-                                    )
+        await self.pool.execute('''
+            INSERT INTO chat_history_summary (
+                                user_id, 
+                                thread_id, 
+                                message_id, 
+                                positive_feedback, 
+                                timestamp, 
+                                role, 
+                                content, 
+                                content_filter_results, 
+                                tool_calls, 
+                                tool_call_id, 
+                                tool_call_function)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            message.user_id,
+            message.thread_id,
+            message.message_id,
+            message.positive_feedback,
+            message.timestamp,
+            message.role,
+            message.content,
+            message.content_filter_results,
+            message.tool_calls,
+            message.tool_call_id,
+            message.tool_call_function
+        )
+                                )
 
         return message.message_id
 
@@ -210,22 +109,47 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         message.message_id = str(uuid.uuid4())
         message.timestamp = datetime.now()
 
-        with self.connection:
-            self.connection.execute('''
-                INSERT INTO chat_history (
-                                    user_id, 
-                                    thread_id, 
-                                    message_id, 
-                                    positive_feedback, 
-                                    timestamp, 
-                                    role, 
-                                    content, 
-                                    content_filter_results, 
-                                    tool_calls, 
-                                    tool_call_id, 
-                                    tool_call_function)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+        await self.pool.execute('''
+            INSERT INTO chat_history (
+                                user_id, 
+                                thread_id, 
+                                message_id, 
+                                positive_feedback, 
+                                timestamp, 
+                                role, 
+                                content, 
+                                content_filter_results, 
+                                tool_calls, 
+                                tool_call_id, 
+                                tool_call_function)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            message.user_id,
+            message.thread_id,
+            message.message_id,
+            message.positive_feedback,
+            message.timestamp,
+            message.role,
+            message.content,
+            message.content_filter_results,
+            message.tool_calls,
+            message.tool_call_id,
+            message.tool_call_function
+        )
+                                )
+
+        return message.message_id
+
+    async def add_messages(self, messages: List[Message], assign_ids: bool = True) -> List[str]:
+        now = datetime.now()
+        if assign_ids:
+            for i, message in enumerate(messages):
+                message.message_id = str(uuid.uuid4())
+                # Keep the batch in order when sorting by timestamp
+                message.timestamp = now + timedelta(microseconds=i)
+
+        rows = [
+            (
                 message.user_id,
                 message.thread_id,
                 message.message_id,
@@ -238,29 +162,51 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
                 message.tool_call_id,
                 message.tool_call_function
             )
-                                    )
-
-        return message.message_id
+            for message in messages
+        ]
+
+        # Messages whose id is already stored, e.g. from a batch the write-behind queue replays, are skipped
+        def insert(connection: sqlite3.Connection) -> None:
+            with connection:
+                connection.executemany('''
+                    INSERT INTO chat_history (
+                                        user_id, 
+                                        thread_id, 
+                                        message_id, 
+                                        positive_feedback, 
+                                        timestamp, 
+                                        role, 
+                                        content, 
+                                        content_filter_results, 
+                                        tool_calls, 
+                                        tool_call_id, 
+                                        tool_call_function)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (message_id) DO NOTHING
+                ''', rows)
+
+        if rows:
+            await self.pool.run(insert)
+        return [message.message_id for message in messages]
 
     async def add_user(self, identifier, metadata: dict = {}) -> IChatHistoryRepository.User:
         now = self.get_now()
         new_id = str(uuid.uuid4())
-        with self.connection:
-            self.connection.execute('''
-                INSERT INTO users (
-                                    id,
-                                    identifier,
-                                    metadata,
-                                    createdAt
-                                    )
-                VALUES (?, ?, ?, ?)
-            ''', (
-                new_id,
-                identifier,
-                json.dumps(metadata),
-                now
-            )
-                                    )
+        await self.pool.execute('''
+            INSERT INTO users (
+                                id,
+                                identifier,
+                                metadata,
+                                createdAt
+                                )
+            VALUES (?, ?, ?, ?)
+        ''', (
+            new_id,
+            identifier,
+            json.dumps(metadata),
+            now
+        )
+                                )
         return IChatHistoryRepository.User(
             id=uuid.UUID(new_id),
             identifier=identifier,
@@ -269,8 +215,7 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         )
 
     async def get_user(self, identifier) -> IChatHistoryRepository.User | None:
-        cursor = self.connection.cursor()
-        cursor.execute('''
+        row = await self.pool.fetch_one('''
             SELECT 
                 id,
                 identifier,
@@ -279,7 +224,6 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             FROM users
             WHERE identifier = ?
         ''', (identifier,))
-        row = cursor.fetchone()
         if row:
             # Convert the dictionary to an object
             return IChatHistoryRepository.User(
@@ -293,31 +237,25 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             return usr
 
     async def get_message(self, message_id: str, thread_id: str) -> Message | None:
-        cursor = self.connection.cursor()
-        cursor.execute('''
+        row = await self.pool.fetch_one('''
             SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, content_filter_results, tool_calls, tool_call_id, tool_call_function
             FROM chat_history
             WHERE message_id = ? AND thread_id = ?
         ''', (message_id, thread_id))
-        row = cursor.fetchone()
         if row:
-            return Message(
-                user_id=row[0],
-                thread_id=row[1],
-                message_id=row[2],
-                positive_feedback=row[3],
-                timestamp=row[4],
-                role=row[5],
-                content=row[6],
-                content_filter_results=row[7],
-                tool_calls=row[8],
-                tool_call_id=row[9],
-                tool_call_function=row[10]
-            )
+            return self._to_message(row)
         return None
 
-    async def get_threads_for_user(self, identifier: str, thread_id: Optional[str]) -> Optional[
-        List[IChatHistoryRepository.ThreadDict]]:
+    async def get_thread_author(self, thread_id: str, identifier: Optional[str] = None) -> Optional[str]:
+        row = await self.pool.fetch_one('''SELECT "userIdentifier" FROM threads WHERE "id" = ?''', (thread_id,))
+        return row[0] if row else None
+
+    async def get_threads_for_user(
+            self,
+            identifier: str,
+            thread_id: Optional[str],
+            projection: IChatHistoryRepository.ThreadProjection = "full"
+    ) -> Optional[List[IChatHistoryRepository.ThreadDict]]:
         """Fetch all user threads up to self.user_thread_limit, or one thread by id if thread_id is provided."""
         if thread_id is None:
             user_threads_query = """
@@ -335,7 +273,7 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
                 LIMIT ?
             """
 
-            user_threads = self.execute_sql(
+            user_threads = await self.execute_sql(
                 user_threads_query,
                 (
                     identifier, 100
@@ -357,7 +295,7 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
                 LIMIT ?
             """
 
-            user_threads = self.execute_sql(
+            user_threads = await self.execute_sql(
                 user_threads_query,
                 (
                     identifier, thread_id, 100
@@ -373,7 +311,7 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             for thread in user_threads:
                 thread_ids_list.append(str(thread["thread_id"]))
 
-            thread_ids = "('" + "','".join(thread_ids_list) + "')"
+            thread_ids = "(" + ", ".join("?" for _ in thread_ids_list) + ")"
 
         steps_feedbacks_query = f"""
             SELECT
@@ -403,9 +341,13 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             WHERE s."threadId" IN {thread_ids}
             ORDER BY s."createdAt" ASC
         """
-        steps_feedbacks = self.execute_sql(
-            steps_feedbacks_query
-        )
+        # Steps and elements are only queried when the projection asks for them
+        steps_feedbacks = []
+        if projection != "metadata":
+            steps_feedbacks = await self.execute_sql(
+                steps_feedbacks_query,
+                thread_ids_list
+            )
 
         elements_query = f"""
             SELECT
@@ -425,7 +367,9 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             FROM elements e
             WHERE e."threadId" IN {thread_ids}
         """
-        elements = self.execute_sql(elements_query)
+        elements = []
+        if projection == "full":
+            elements = await self.execute_sql(elements_query, thread_ids_list)
 
         thread_dicts = {}
         for thread in user_threads:
@@ -514,9 +458,49 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         # print("Thread Dicts: ", thread_dicts)
         return list(thread_dicts.values())
 
+    async def get_threads_page(
+            self,
+            identifier: str,
+            first: int = 20,
+            cursor: Optional[str] = None,
+            search: Optional[str] = None
+    ) -> Tuple[List[IChatHistoryRepository.ThreadDict], bool]:
+        where = ['"userIdentifier" = ?']
+        params: list = [identifier]
+        if cursor:
+            # Keyset pagination: continue after the cursor thread in ("createdAt", "id") order
+            where.append('("createdAt", "id") < (SELECT "createdAt", "id" FROM threads WHERE "id" = ?)')
+            params.append(cursor)
+        if search:
+            where.append('"name" LIKE ? ESCAPE \'!\'')
+            params.append("%" + search.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%")
+        params.append(first + 1)
+
+        rows = await self.pool.fetch_all(f'''
+            SELECT "id", "createdAt", "name", "userId", "userIdentifier", "tags", "metadata"
+            FROM threads
+            WHERE {" AND ".join(where)}
+            ORDER BY "createdAt" DESC, "id" DESC
+            LIMIT ?
+        ''', params)
+        threads = [
+            IChatHistoryRepository.ThreadDict(
+                id=row["id"],
+                createdAt=row["createdAt"],
+                name=row["name"],
+                userId=row["userId"],
+                userIdentifier=row["userIdentifier"],
+                tags=row["tags"],
+                metadata=json.loads(row["metadata"]) if row["metadata"] else None,
+                steps=[],
+                elements=[],
+            )
+            for row in rows[:first]
+        ]
+        return threads, len(rows) > first
+
     async def get_thread_messages(self, thread_id: str) -> list[Message]:
-        cursor = self.connection.cursor()
-        cursor.execute('''
+        rows = await self.pool.fetch_all('''
             SELECT *
             FROM (
                 SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, content_filter_results, tool_calls, tool_call_id, tool_call_function
@@ -527,29 +511,35 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             ) AS last_five
             ORDER BY timestamp ASC;
         ''', (thread_id,))
-        rows = cursor.fetchall()
-        return [Message(
-            user_id=row[0],
-            thread_id=row[1],
-            message_id=row[2],
-            positive_feedback=row[3],
-            timestamp=row[4],
-            role=row[5],
-            content=row[6],
-            content_filter_results=row[7],
-            tool_calls=row[8],
-            tool_call_id=row[9],
-            tool_call_function=row[10]
-        ) for row in rows]
+        return [self._to_message(row) for row in rows]
+
+    async def get_thread_messages_before(
+            self, thread_id: str, before: Optional[datetime] = None, limit: int = 20
+    ) -> list[Message]:
+        if before is None:
+            rows = await self.pool.fetch_all('''
+                SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, content_filter_results, tool_calls, tool_call_id, tool_call_function
+                FROM chat_history
+                WHERE thread_id = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            ''', (thread_id, limit))
+        else:
+            rows = await self.pool.fetch_all('''
+                SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, content_filter_results, tool_calls, tool_call_id, tool_call_function
+                FROM chat_history
+                WHERE thread_id = ? AND timestamp < ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            ''', (thread_id, before, limit))
+        return [self._to_message(row) for row in rows]
 
     async def get_thread(self, thread_id: str) -> list[IChatHistoryRepository.Thread]:
-        cursor = self.connection.cursor()
-        cursor.execute('''
+        rows = await self.pool.fetch_all('''
             SELECT id, createdAt, name, userId, userIdentifier, tags, metadata
             FROM threads
             WHERE id = ?
         ''', (thread_id,))
-        rows = cursor.fetchall()
         return [IChatHistoryRepository.Thread(
             id=row[0],
             createdAt=row[1],
@@ -561,32 +551,28 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         ) for row in rows]
 
     async def update_message_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
-        with self.connection:
-            self.connection.execute('''
-                UPDATE chat_history
-                SET positive_feedback = ?
-                WHERE id = ? AND thread_id = ?
-            ''', (positive_feedback, message_id, thread_id))
+        await self.pool.execute('''
+            UPDATE chat_history
+            SET positive_feedback = ?
+            WHERE id = ? AND thread_id = ?
+        ''', (positive_feedback, message_id, thread_id))
 
     async def update_message_content_filter_results(
             self, message_id: str, thread_id: str, content_filter_results: dict[str, object]) -> None:
-        with self.connection:
-            self.connection.execute('''
-                UPDATE chat_history
-                SET content_filter_results = ?
-                WHERE id = ? AND thread_id = ?
-            ''', (str(content_filter_results), message_id, thread_id))
+        await self.pool.execute('''
+            UPDATE chat_history
+            SET content_filter_results = ?
+            WHERE id = ? AND thread_id = ?
+        ''', (str(content_filter_results), message_id, thread_id))
 
     async def delete_thread(self, thread_id: str) -> None:
-        with self.connection:
-            self.connection.execute('''
-                DELETE FROM chat_history
-                WHERE thread_id = ?
-            ''', (thread_id,))
-
-    async def add_step(self, step_dict: IChatHistoryRepository.StepDict):
-        print("Creating step: ", step_dict)
+        await self.pool.execute('''
+            DELETE FROM chat_history
+            WHERE thread_id = ?
+        ''', (thread_id,))
 
+    @staticmethod
+    def _step_parameters(step_dict: IChatHistoryRepository.StepDict) -> Dict:
         # If disableFeedback is not provided, default to False
         step_dict["disableFeedback"] = step_dict.get("disableFeedback", False)
 
@@ -602,18 +588,43 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         }
         parameters["metadata"] = json.dumps(step_dict.get("metadata", {}))
         parameters["generation"] = json.dumps(step_dict.get("generation", {}))
+        return parameters
+
+    async def add_step(self, step_dict: IChatHistoryRepository.StepDict):
+        print("Creating step: ", step_dict)
+        parameters = self._step_parameters(step_dict)
         columns = ", ".join(f'"{key}"' for key in parameters.keys())
         values = ", ".join("?" for key in parameters.keys())
         query = f"""
             INSERT INTO steps ({columns})
             VALUES ({values});
         """
-        self.execute_sql(
+        await self.execute_sql(
             sql=query,
             params=tuple(parameters.values()),
             expect_results=False
         )
 
+    async def add_steps(self, step_dicts: List[IChatHistoryRepository.StepDict]) -> None:
+        # Steps only carry the keys that are set, so group them by column list and insert each group with executemany.
+        groups: Dict[tuple, List[tuple]] = {}
+        for step_dict in step_dicts:
+            parameters = self._step_parameters(step_dict)
+            groups.setdefault(tuple(parameters.keys()), []).append(tuple(parameters.values()))
+
+        def insert(connection: sqlite3.Connection) -> None:
+            with connection:
+                for keys, rows in groups.items():
+                    columns = ", ".join(f'"{key}"' for key in keys)
+                    values = ", ".join("?" for _ in keys)
+                    connection.executemany(
+                        f'INSERT INTO steps ({columns}) VALUES ({values}) ON CONFLICT ("id") DO NOTHING', rows
+                    )
+
+        if groups:
+            # Errors propagate so callers such as the write-behind queue can retry the batch instead of losing it
+            await self.pool.run(insert)
+
     async def update_thread(
             self,
             thread_id: str,
@@ -659,7 +670,7 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             ON CONFLICT ("id") DO UPDATE
             SET {updates};
         """
-        self.execute_sql(
+        await self.execute_sql(
             sql=query,
             params=tuple(parameters.values()),
             expect_results=False
@@ -668,42 +679,47 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
         return ""
 
     async def update_memory(self) -> None:
-        cursor = self.connection.cursor()
+        await self.pool.run(self._update_memory)
 
-        # Create a temporary table for the latest records
-        cursor.execute('''
-            CREATE TEMP TABLE latest_chat_history AS
-            SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
-                   content_filter_results, tool_calls, tool_call_id, tool_call_function
-            FROM (
+    @staticmethod
+    def _update_memory(connection: sqlite3.Connection) -> None:
+        # Runs as one transaction on a single pooled connection so the temp table stays visible throughout.
+        with connection:
+            cursor = connection.cursor()
+
+            # Create a temporary table for the latest records
+            cursor.execute('''
+                CREATE TEMP TABLE latest_chat_history AS
                 SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
-                       content_filter_results, tool_calls, tool_call_id, tool_call_function,
-                       ROW_NUMBER() OVER (PARTITION BY thread_id ORDER BY timestamp DESC) AS row_num
-                FROM chat_history_summary
-            ) AS LatestRecords
-            WHERE row_num = 1
-        ''')
-
-        # Clear the original table
-        cursor.execute('DELETE FROM chat_history_summary')
-
-        # Insert the latest records back into the original table
-        cursor.execute('''
-            INSERT INTO chat_history_summary (user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
-                                              content_filter_results, tool_calls, tool_call_id, tool_call_function)
-            SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
-                   content_filter_results, tool_calls, tool_call_id, tool_call_function
-            FROM latest_chat_history
-        ''')
+                       content_filter_results, tool_calls, tool_call_id, tool_call_function
+                FROM (
+                    SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
+                           content_filter_results, tool_calls, tool_call_id, tool_call_function,
+                           ROW_NUMBER() OVER (PARTITION BY thread_id ORDER BY timestamp DESC) AS row_num
+                    FROM chat_history_summary
+                ) AS LatestRecords
+                WHERE row_num = 1
+            ''')
+
+            # Clear the original table
+            cursor.execute('DELETE FROM chat_history_summary')
+
+            # Insert the latest records back into the original table
+            cursor.execute('''
+                INSERT INTO chat_history_summary (user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
+                                                  content_filter_results, tool_calls, tool_call_id, tool_call_function)
+                SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
+                       content_filter_results, tool_calls, tool_call_id, tool_call_function
+                FROM latest_chat_history
+            ''')
 
-        # Drop the temporary table
-        cursor.execute('DROP TABLE latest_chat_history')
+            # Drop the temporary table
+            cursor.execute('DROP TABLE latest_chat_history')
 
-        cursor.close()
+            cursor.close()
 
     async def get_memory(self, message_id: str, thread_id: str) -> Message | None:
-        cursor = self.connection.cursor()
-        cursor.execute('''
+        row = await self.pool.fetch_one('''
             SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
                    content_filter_results, tool_calls, tool_call_id, tool_call_function
             FROM chat_history_summary
@@ -711,26 +727,12 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             ORDER BY timestamp DESC
             LIMIT 1
         ''', (thread_id,))
-        row = cursor.fetchone()
         if row:
-            return Message(
-                user_id=row[0],
-                thread_id=row[1],
-                message_id=row[2],
-                positive_feedback=row[3],
-                timestamp=row[4],
-                role=row[5],
-                content=row[6],
-                content_filter_results=row[7],
-                tool_calls=row[8],
-                tool_call_id=row[9],
-                tool_call_function=row[10]
-            )
+            return self._to_message(row)
         return None
 
     async def get_thread_memory(self, thread_id: str) -> list[Message]:
-        cursor = self.connection.cursor()
-        cursor.execute('''
+        rows = await self.pool.fetch_all('''
             SELECT user_id, thread_id, message_id, positive_feedback, timestamp, role, content, 
                    content_filter_results, tool_calls, tool_call_id, tool_call_function
             FROM chat_history_summary
@@ -738,48 +740,34 @@ class sqlite_ChatHistoryRepository(IChatHistoryRepository):
             ORDER BY timestamp DESC
             LIMIT 1
         ''', (thread_id,))
-        rows = cursor.fetchall()
-        return [Message(
-            user_id=row[0],
-            thread_id=row[1],
-            message_id=row[2],
-            positive_feedback=row[3],
-            timestamp=row[4],
-            role=row[5],
-            content=row[6],
-            content_filter_results=row[7],
-            tool_calls=row[8],
-            tool_call_id=row[9],
-            tool_call_function=row[10]
-        ) for row in rows]
+        return [self._to_message(row) for row in rows]
 
     async def update_memory_feedback(self, message_id: str, thread_id: str, positive_feedback: bool | None) -> None:
-        with self.connection:
-            self.connection.execute('''
-                UPDATE chat_history_summary
-                SET positive_feedback = ?
-                WHERE id = ? AND thread_id = ?
-            ''', (positive_feedback, message_id, thread_id))
+        await self.pool.execute('''
+            UPDATE chat_history_summary
+            SET positive_feedback = ?
+            WHERE id = ? AND thread_id = ?
+        ''', (positive_feedback, message_id, thread_id))
 
     async def update_memory_content_filter_results(
             self, message_id: str, thread_id: str, content_filter_results: dict[str, object]) -> None:
-        with self.connection:
-            self.connection.execute('''
-                UPDATE chat_history_summary
-                SET content_filter_results = ?
-                WHERE id = ? AND thread_id = ?
-            ''', (str(content_filter_results), message_id, thread_id))
+        await self.pool.execute('''
+            UPDATE chat_history_summary
+            SET content_filter_results = ?
+            WHERE id = ? AND thread_id = ?
+        ''', (str(content_filter_results), message_id, thread_id))
 
     async def delete_thread_memory(self, thread_id: str) -> None:
-        with self.connection:
-            self.connection.execute('''
-                DELETE FROM chat_history_summary
-                WHERE thread_id = ?
-            ''', (thread_id,))
+        await self.pool.execute('''
+            DELETE FROM chat_history_summary
+            WHERE thread_id = ?
+        ''', (thread_id,))
 
     async def delete_user_memory(self, user_id: str) -> None:
-        with self.connection:
-            self.connection.execute('''
-                DELETE FROM chat_history_summary
-                WHERE user_id = ?
-            ''', (user_id,))
+        await self.pool.execute('''
+            DELETE FROM chat_history_summary
+            WHERE user_id = ?
+        ''', (user_id,))
+
+    async def close(self) -> None:
+        self.pool.close()
@@ -0,0 +1,124 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class SqliteConnectionPool:
+    """
+    Bounded pool of sqlite connections whose queries run on a dedicated thread executor.
+
+    The executor has one worker per pooled connection, so at most pool_size queries run at once and the event loop
+    never blocks on disk I/O. Connections are opened in WAL mode by default, which lets readers proceed while a write
+    is in progress, and keep a statement cache so a repeated query is only compiled once per connection.
+    """
+
+    def __init__(
+            self,
+            db_path: str,
+            pool_size: int = 5,
+            journal_mode: Optional[str] = "wal",
+            busy_timeout: float = 5.0,
+            statement_cache_size: int = 256
+    ):
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.journal_mode = journal_mode
+        self.busy_timeout = busy_timeout
+        self.statement_cache_size = statement_cache_size
+        self._connections: queue.LifoQueue = queue.LifoQueue(maxsize=self.pool_size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+        connection.row_factory = sqlite3.Row
+        if self.journal_mode:
+            connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            if self.journal_mode.lower() == "wal":
+                # Durable across application crashes; only an OS crash can lose the last transactions.
+                connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot use a closed connection pool")
+        try:
+            return self._connections.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if not create:
+            return self._connections.get()
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _release(self, connection: sqlite3.Connection) -> None:
+        if connection.in_transaction:
+            connection.rollback()
+        if self._closed:
+            connection.close()
+        else:
+            self._connections.put_nowait(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrows a connection for synchronous use on the calling thread."""
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._release(connection)
+
+    async def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Runs fn with a pooled connection on the executor and returns its result."""
+        def work() -> T:
+            with self.connection() as connection:
+                return fn(connection)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, work)
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> None:
+        """Executes a single statement in its own transaction."""
+        def work(connection: sqlite3.Connection) -> None:
+            with connection:
+                connection.execute(sql, params)
+
+        await self.run(work)
+
+    async def fetch_all(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        return await self.run(lambda connection: connection.execute(sql, params).fetchall())
+
+    async def fetch_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        return await self.run(lambda connection: connection.execute(sql, params).fetchone())
+
+    def close(self) -> None:
+        """Waits for running queries to finish and closes every pooled connection."""
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                self._connections.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,215 @@
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    statements: List[str]
+    # Runs in the migration's transaction before the statements, for data fixes that need to be counted or logged
+    prepare: Optional[Callable[[sqlite3.Connection], None]] = None
+
+
+def _rekey_duplicate_message_ids(connection: sqlite3.Connection) -> None:
+    # Replays before message ids were unique may have stored a message more than once. The copies are kept, with the
+    # rowid appended to their id, so no history is lost and the first row keeps the id callers know.
+    renamed = connection.execute('''
+        UPDATE chat_history
+        SET message_id = message_id || '-' || rowid
+        WHERE message_id IS NOT NULL AND rowid NOT IN (
+            SELECT MIN(rowid) FROM chat_history WHERE message_id IS NOT NULL GROUP BY message_id
+        )
+    ''').rowcount
+    if renamed:
+        logger.warning(f"Renamed {renamed} chat_history rows that repeated an earlier message_id")
+
+
+# Applied in order. The schema version of a database is stored in PRAGMA user_version, so existing databases are
+# upgraded in place by running only the migrations above their current version. Never edit a released migration;
+# append a new one instead.
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        description="Chat history and chainlit tables",
+        statements=[
+            '''
+                CREATE TABLE IF NOT EXISTS chat_history (
+                    user_id TEXT,
+                    thread_id TEXT,
+                    message_id TEXT,
+                    positive_feedback BOOLEAN,
+                    timestamp TEXT,
+                    role TEXT,
+                    content TEXT,
+                    content_filter_results TEXT,
+                    tool_calls TEXT,
+                    tool_call_id TEXT,
+                    tool_call_function TEXT
+                );
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS chat_history_summary (
+                    user_id TEXT,
+                    thread_id TEXT,
+                    message_id TEXT,
+                    positive_feedback BOOLEAN,
+                    timestamp TEXT,
+                    role TEXT,
+                    content TEXT,
+                    content_filter_results TEXT,
+                    tool_calls TEXT,
+                    tool_call_id TEXT,
+                    tool_call_function TEXT
+                );
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS users (
+                    "id" UUID PRIMARY KEY,
+                    "identifier" TEXT NOT NULL UNIQUE,
+                    "metadata" JSONB NOT NULL,
+                    "createdAt" TEXT
+                );
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS threads (
+                    "id" UUID PRIMARY KEY,
+                    "createdAt" TEXT,
+                    "name" TEXT,
+                    "userId" UUID,
+                    "userIdentifier" TEXT,
+                    "tags" TEXT[],
+                    "metadata" JSONB,
+                    FOREIGN KEY ("userId") REFERENCES users("id") ON DELETE CASCADE
+                );
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS steps (
+                    "id" UUID PRIMARY KEY,
+                    "name" TEXT NOT NULL,
+                    "type" TEXT NOT NULL,
+                    "threadId" UUID NOT NULL,
+                    "parentId" UUID,
+                    "disableFeedback" BOOLEAN NOT NULL,
+                    "streaming" BOOLEAN NOT NULL,
+                    "waitForAnswer" BOOLEAN,
+                    "isError" BOOLEAN,
+                    "metadata" JSONB,
+                    "tags" TEXT[],
+                    "input" TEXT,
+                    "output" TEXT,
+                    "createdAt" TEXT,
+                    "start" TEXT,
+                    "end" TEXT,
+                    "generation" JSONB,
+                    "showInput" TEXT,
+                    "language" TEXT,
+                    "indent" INT
+                );
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS elements (
+                    "id" UUID PRIMARY KEY,
+                    "threadId" UUID,
+                    "type" TEXT,
+                    "url" TEXT,
+                    "chainlitKey" TEXT,
+                    "name" TEXT NOT NULL,
+                    "display" TEXT,
+                    "objectKey" TEXT,
+                    "size" TEXT,
+                    "page" INT,
+                    "language" TEXT,
+                    "forId" UUID,
+                    "mime" TEXT
+                );
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS feedbacks (
+                    "id" UUID PRIMARY KEY,
+                    "forId" UUID NOT NULL,
+                    "threadId" UUID NOT NULL,
+                    "value" INT NOT NULL,
+                    "comment" TEXT
+                );
+            ''',
+        ]
+    ),
+    Migration(
+        version=2,
+        description="Indexes for thread, user and feedback lookups",
+        statements=[
+            'CREATE INDEX IF NOT EXISTS ix_chat_history_thread_timestamp ON chat_history (thread_id, timestamp)',
+            'CREATE INDEX IF NOT EXISTS ix_chat_history_message ON chat_history (message_id, thread_id)',
+            'CREATE INDEX IF NOT EXISTS ix_chat_history_summary_thread_timestamp ON chat_history_summary (thread_id, timestamp)',
+            'CREATE INDEX IF NOT EXISTS ix_chat_history_summary_user ON chat_history_summary (user_id)',
+            'CREATE INDEX IF NOT EXISTS ix_threads_user_identifier_created ON threads ("userIdentifier", "createdAt")',
+            'CREATE INDEX IF NOT EXISTS ix_steps_thread_created ON steps ("threadId", "createdAt")',
+            'CREATE INDEX IF NOT EXISTS ix_elements_thread ON elements ("threadId")',
+            'CREATE INDEX IF NOT EXISTS ix_feedbacks_for ON feedbacks ("forId")',
+            'CREATE INDEX IF NOT EXISTS ix_feedbacks_thread ON feedbacks ("threadId")',
+            'ANALYZE',
+        ]
+    ),
+    Migration(
+        version=3,
+        description="Keyset index for paging a user's threads",
+        statements=[
+            'CREATE INDEX IF NOT EXISTS ix_threads_user_identifier_created_id ON threads ("userIdentifier", "createdAt", "id")',
+            'DROP INDEX IF EXISTS ix_threads_user_identifier_created',
+        ]
+    ),
+    Migration(
+        version=4,
+        description="Unique message ids, so replayed inserts are skipped",
+        statements=[
+            'CREATE UNIQUE INDEX IF NOT EXISTS ux_chat_history_message_id ON chat_history (message_id)',
+            'DROP INDEX IF EXISTS ix_chat_history_message',
+        ],
+        prepare=_rekey_duplicate_message_ids
+    ),
+]
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(connection: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> int:
+    """
+    Brings the database up to the latest schema version and returns that version.
+
+    Each migration runs in its own IMMEDIATE transaction together with the user_version bump, so a failed migration
+    leaves the database at the previous version and concurrent processes starting against the same file do not apply
+    a migration twice.
+
+    :param connection: Connection to the sqlite database to upgrade.
+    :param migrations: Migrations ordered by version.
+    """
+    version = get_schema_version(connection)
+    for migration in migrations:
+        if migration.version <= version:
+            continue
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have applied it while we waited for the write lock.
+            if get_schema_version(connection) >= migration.version:
+                connection.rollback()
+                version = migration.version
+                continue
+            if migration.prepare is not None:
+                migration.prepare(connection)
+            for statement in migration.statements:
+                connection.execute(statement)
+            connection.execute(f'PRAGMA user_version = {int(migration.version)}')
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        logger.info(f"Applied sqlite migration {migration.version}: {migration.description}")
+        version = migration.version
+    return version
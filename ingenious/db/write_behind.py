@@ -0,0 +1,351 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import re
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, TextIO
+
+from ingenious.models.message import Message
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MESSAGE = "message"
+STEP = "step"
+
+# Longest wait between background flushes while the database keeps failing
+MAX_RETRY_INTERVAL = 60.0
+
+
+@dataclass
+class WriteBehindEntry:
+    id: str
+    kind: str
+    data: object
+    attempts: int = 0
+
+
+def _try_lock(f: TextIO) -> bool:
+    """Takes an exclusive lock on an open log without waiting. The lock is released when the file is closed."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class WriteBehindQueue:
+    """
+    Write-behind buffer in front of an IChatHistoryRepository.
+
+    add_message and add_step return as soon as the row is queued. A background task flushes the queue through the
+    repository's bulk add_messages / add_steps calls once batch_size rows are waiting or every flush_interval
+    seconds. When the queue holds max_size rows, writers flush inline, so memory stays bounded under load.
+
+    Every queued row is appended to a log owned by this process before it is acknowledged, and an ack line is
+    appended once its batch is committed. Each process writes its own file next to log_path and holds a lock on it,
+    so workers sharing a folder never truncate each other's rows. When a queue is created, the logs of processes
+    that died with rows still unacknowledged are taken over and their rows replayed. Delivery is at least once; the
+    repositories skip messages and steps whose id is already stored, so a replayed batch is not duplicated.
+
+    A batch that fails is retried one row at a time, backing off up to MAX_RETRY_INTERVAL seconds between attempts,
+    so a single bad row cannot hold back the rest. A row that has failed max_attempts times is moved to the failed
+    rows file next to log_path and must be replayed by hand.
+    """
+
+    def __init__(
+            self,
+            repository,
+            max_size: int = 10000,
+            batch_size: int = 100,
+            flush_interval: float = 0.5,
+            log_path: str = "",
+            max_attempts: int = 10
+    ):
+        self.repository = repository
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log_path = log_path
+        self.max_attempts = max_attempts
+        self._pending: Deque[WriteBehindEntry] = deque()
+        self._pending_threads: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._flush_now: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._isolate = False
+        self._failures = 0
+        self._log: Optional[TextIO] = None
+        self._own_log_path = ""
+        self.failed_path = ""
+        if self.log_path:
+            log_dir = os.path.dirname(self.log_path)
+            if log_dir and not os.path.exists(log_dir):
+                os.makedirs(log_dir)
+            root, ext = os.path.splitext(self.log_path)
+            self._own_log_path = f"{root}.{os.getpid()}-{uuid.uuid4().hex[:8]}{ext}"
+            self.failed_path = f"{root}.failed{ext}"
+            self._replay_logs()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _orphaned_log_paths(self) -> List[str]:
+        root, ext = os.path.splitext(self.log_path)
+        own_log = re.compile(re.escape(root) + r"\.\d+-[0-9a-f]{8}" + re.escape(ext) + "$")
+        # log_path itself is the single shared log written by earlier versions
+        paths = [path for path in glob.glob(f"{glob.escape(root)}.*{ext}") if own_log.match(path)]
+        return paths + [self.log_path] if os.path.exists(self.log_path) else paths
+
+    @staticmethod
+    def _read_log(f: TextIO, entries: Dict[str, WriteBehindEntry]) -> None:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-write
+                continue
+            if "ack" in record:
+                for entry_id in record["ack"]:
+                    entries.pop(entry_id, None)
+            else:
+                entries[record["id"]] = WriteBehindEntry(record["id"], record["kind"], record["data"])
+
+    def _replay_logs(self) -> None:
+        # Take over the logs whose owner is gone: a live process holds the lock on its own log
+        entries: Dict[str, WriteBehindEntry] = {}
+        adopted = []
+        for path in self._orphaned_log_paths():
+            try:
+                f = open(path, "r+", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            try:
+                # The file may have been taken over and removed while this process waited to open it
+                if not _try_lock(f) or not os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                    f.close()
+                    continue
+            except FileNotFoundError:
+                f.close()
+                continue
+            f.seek(0)
+            self._read_log(f, entries)
+            adopted.append((path, f))
+
+        self._log = open(self._own_log_path, "w", encoding="utf-8")
+        if not _try_lock(self._log):
+            raise RuntimeError(f"Unable to lock the write-behind log {self._own_log_path}")
+        for entry in entries.values():
+            if entry.kind == MESSAGE:
+                entry.data = Message.model_validate(entry.data)
+            self._append(entry)
+        if entries:
+            logger.warning(f"Replaying {len(entries)} chat history writes from {len(adopted)} write-behind logs")
+
+        # The rows are now in this process's log, so the old files can go
+        for path, f in adopted:
+            if os.name == "nt":
+                f.close()
+                os.remove(path)
+            else:
+                os.remove(path)
+                f.close()
+
+    def _append(self, entry: WriteBehindEntry) -> None:
+        self._pending.append(entry)
+        thread_id = self._thread_id(entry)
+        self._pending_threads[thread_id] = self._pending_threads.get(thread_id, 0) + 1
+        if self._log is not None:
+            self._log.write(json.dumps({"id": entry.id, "kind": entry.kind, "data": self._dump(entry)}, default=str) + "\n")
+            self._log.flush()
+
+    @staticmethod
+    def _dump(entry: WriteBehindEntry) -> object:
+        return entry.data.model_dump(mode="json") if isinstance(entry.data, Message) else entry.data
+
+    def _ack(self, entries: List[WriteBehindEntry]) -> None:
+        for entry in entries:
+            thread_id = self._thread_id(entry)
+            self._pending_threads[thread_id] -= 1
+            if not self._pending_threads[thread_id]:
+                del self._pending_threads[thread_id]
+        if self._log is not None:
+            if self._pending:
+                self._log.write(json.dumps({"ack": [entry.id for entry in entries]}) + "\n")
+                self._log.flush()
+            else:
+                self._log.seek(0)
+                self._log.truncate()
+
+    def _move_aside(self, entry: WriteBehindEntry, error: BaseException) -> None:
+        """Takes a row that keeps failing out of the queue, keeping a copy in the failed rows file."""
+        logger.error(
+            f"Giving up on a chat history {entry.kind} after {entry.attempts} failed attempts: {error}. "
+            f"{'Kept in ' + self.failed_path if self.failed_path else 'Row: ' + json.dumps(self._dump(entry), default=str)}"
+        )
+        if self.failed_path:
+            with open(self.failed_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "id": entry.id,
+                    "kind": entry.kind,
+                    "data": self._dump(entry),
+                    "error": str(error),
+                    "failed_at": datetime.now().isoformat()
+                }, default=str) + "\n")
+        self._ack([entry])
+
+    @staticmethod
+    def _thread_id(entry: WriteBehindEntry) -> str:
+        return entry.data.thread_id if isinstance(entry.data, Message) else entry.data.get("threadId")
+
+    def _ensure_started(self) -> None:
+        """Starts the flusher on the running loop. Queued rows survive a change of loop and move to the new flusher."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._flush_now = asyncio.Event()
+            self._task = None
+        if not self._closed and (self._task is None or self._task.done()):
+            self._task = loop.create_task(self._run())
+
+    async def _enqueue(self, entry: WriteBehindEntry) -> None:
+        if self._closed:
+            raise RuntimeError("The write-behind queue has been closed")
+        self._ensure_started()
+        if len(self._pending) >= self.max_size:
+            # Back pressure: the writer pays for the flush rather than growing the queue without bound. If the
+            # database cannot take the rows, the new row is refused rather than queued past max_size.
+            await self.flush()
+        self._append(entry)
+        if len(self._pending) >= self.batch_size:
+            self._flush_now.set()
+
+    async def add_message(self, message: Message) -> str:
+        message.message_id = str(uuid.uuid4())
+        message.timestamp = datetime.now()
+        await self._enqueue(WriteBehindEntry(str(uuid.uuid4()), MESSAGE, message))
+        return message.message_id
+
+    async def add_messages(self, messages: List[Message]) -> List[str]:
+        now = datetime.now()
+        for i, message in enumerate(messages):
+            message.message_id = str(uuid.uuid4())
+            message.timestamp = now + timedelta(microseconds=i)
+            await self._enqueue(WriteBehindEntry(str(uuid.uuid4()), MESSAGE, message))
+        return [message.message_id for message in messages]
+
+    async def add_step(self, step_dict: dict) -> None:
+        step = dict(step_dict)
+        # A replayed step must carry the same id for the repository to recognise it
+        step["id"] = step.get("id") or str(uuid.uuid4())
+        await self._enqueue(WriteBehindEntry(str(uuid.uuid4()), STEP, step))
+
+    async def add_steps(self, step_dicts: List[dict]) -> None:
+        for step_dict in step_dicts:
+            await self.add_step(step_dict)
+
+    def has_pending(self, thread_id: Optional[str] = None) -> bool:
+        if thread_id is None:
+            return bool(self._pending)
+        return thread_id in self._pending_threads
+
+    async def flush_thread(self, thread_id: Optional[str]) -> None:
+        """
+        Flushes the queue if it holds rows of the thread, so that reads see the thread's own writes. A failed flush
+        is logged rather than raised: the read goes ahead without the rows still queued.
+        """
+        if self.has_pending(thread_id):
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Reading thread {thread_id} without {len(self._pending)} queued chat history writes: {e}")
+
+    async def _write(self, batch: List[WriteBehindEntry]) -> None:
+        messages = [entry.data for entry in batch if entry.kind == MESSAGE]
+        steps = [entry.data for entry in batch if entry.kind == STEP]
+        if messages:
+            await self.repository.add_messages(messages, assign_ids=False)
+        if steps:
+            await self.repository.add_steps(steps)
+
+    async def flush(self) -> None:
+        """
+        Writes every queued row. After a failed batch, rows are written one at a time until one succeeds, and a row
+        that fails on its own max_attempts times is moved aside. Rows still queued stay in the log and the error is
+        raised.
+        """
+        self._ensure_started()
+        async with self._lock:
+            while self._pending:
+                size = 1 if self._isolate else self.batch_size
+                batch = [self._pending.popleft() for _ in range(min(size, len(self._pending)))]
+                try:
+                    # Writes are idempotent, so a batch that partly committed before failing can be written again
+                    await self._write(batch)
+                except Exception as e:
+                    if len(batch) == 1:
+                        batch[0].attempts += 1
+                        if batch[0].attempts >= self.max_attempts:
+                            self._move_aside(batch[0], e)
+                            continue
+                    self._isolate = True
+                    self._pending.extendleft(reversed(batch))
+                    raise
+                except BaseException:
+                    self._pending.extendleft(reversed(batch))
+                    raise
+                self._isolate = False
+                self._ack(batch)
+
+    async def _run(self) -> None:
+        while True:
+            # Back off while the database keeps failing
+            interval = min(self.flush_interval * 2 ** self._failures, MAX_RETRY_INTERVAL)
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+                self._failures = 0
+            except Exception as e:
+                self._failures += 1
+                logger.warning(f"Failed to flush {len(self._pending)} chat history writes, will retry: {e}")
+            if self._closed:
+                return
+
+    async def close(self) -> None:
+        """Drains the queue and stops the flusher. Rows that cannot be written stay in the log for the next start."""
+        self._closed = True
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            self._flush_now.set()
+            await self._task
+        try:
+            if self._pending:
+                await self.flush()
+        except Exception as e:
+            logger.warning(f"Failed to drain {len(self._pending)} chat history writes, kept in {self._own_log_path}: {e}")
+        finally:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+                if not self._pending:
+                    os.remove(self._own_log_path)
@@ -5,9 +5,9 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from typing_extensions import Annotated
 from ingenious.db.chat_history_repository import ChatHistoryRepository
-from ingenious.db.chat_history_repository import DatabaseClientType
 
-from ingenious.external_services.openai_service import OpenAIService
+import ingenious.core.service_registry as service_registry
+from ingenious.core.service_registry import ServiceRegistry
 from ingenious.services.chat_service import ChatService
 from ingenious.services.message_feedback_service import MessageFeedbackService
 import ingenious.config.config as Config
@@ -19,32 +19,22 @@ security = HTTPBasic()
 config: config_models.Config = Config.get_config(os.getenv("INGENIOUS_PROJECT_PATH", ""))
 
 
-def get_openai_service():
-    model = config.models[0]
-    return OpenAIService(
-        azure_endpoint=str(model.base_url),
-        api_key=str(model.api_key),
-        api_version=str(model.api_version),
-        open_ai_model=str(model.model)
-    )
+def get_service_registry() -> ServiceRegistry:
+    return service_registry.get_service_registry(config)
 
 
-def get_chat_history_repository():
-    db_type_val = config.chat_history.database_type.lower()
-    try:
-        db_type = DatabaseClientType(db_type_val)
+def get_openai_service():
+    return get_service_registry().get_openai_service()
 
-    except ValueError:
-        raise ValueError(f"Unknown database type: {db_type_val}")
 
-    chr = ChatHistoryRepository(db_type=db_type, config=config)
-    
-    return chr
+def get_chat_history_repository():
+    return get_service_registry().get_chat_history_repository()
 
 
 def get_security_service(
         credentials: Annotated[HTTPBasicCredentials, Depends(security)]
 ):
+    config = get_config()
     if config.web_configuration.authentication.enable:
         current_username_bytes = credentials.username.encode("utf8")
         correct_username_bytes = config.web_configuration.authentication.username.encode('utf-8')
@@ -72,6 +62,7 @@ def get_chat_service(
     chat_history_repository: Annotated[ChatHistoryRepository, Depends(get_chat_history_repository)],
     conversation_flow: str = ""
 ):
+    config = get_config()
     cs_type = config.chat_service.type
     return ChatService(
         chat_service_type=cs_type,
@@ -90,7 +81,7 @@ def sync_templates():
     if config.file_storage.storage_type == "local":
         return
     else:
-        fs = FileStorage(config)
+        fs = get_file_storage_revisions()
         working_dir = os.getcwd()
         template_path = os.path.join(working_dir, "ingenious", "templates")
         template_files = fs.list_files(file_path=template_path)
@@ -103,14 +94,15 @@ def sync_templates():
 
 
 def get_file_storage_data() -> FileStorage:
-    return FileStorage(config, Category="data")
+    return get_service_registry().get_file_storage("data")
 
 
 def get_file_storage_revisions() -> FileStorage:
-    return FileStorage(config, Category="revisions")
+    return get_service_registry().get_file_storage("revisions")
 
 
 def get_config():
-    return config
+    # The current configuration from the config service. Module-level config keeps the version loaded at import
+    return Config.get_config(os.getenv("INGENIOUS_PROJECT_PATH", ""))
 
 
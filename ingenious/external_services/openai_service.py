@@ -1,8 +1,12 @@
 import logging
 import re
+import threading
+from typing import Optional
+import httpx
 from ingenious.errors.content_filter_error import ContentFilterError
 from ingenious.errors.token_limit_exceeded_error import TokenLimitExceededError
-from openai import AzureOpenAI, NOT_GIVEN, BadRequestError
+from ingenious.models.config import OpenAIClientConfig
+from openai import AzureOpenAI, AsyncAzureOpenAI, NOT_GIVEN, BadRequestError
 from openai.types.chat import (
     ChatCompletionMessageParam,
     ChatCompletionToolParam,
@@ -11,6 +15,77 @@ from openai.types.chat import (
 
 logger = logging.getLogger(__name__)
 
+# One client (and therefore one HTTP connection pool) per endpoint, key and api version for the whole process
+_clients: dict[tuple, AzureOpenAI | AsyncAzureOpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(
+    azure_endpoint: str,
+    api_key: str,
+    api_version: str,
+    client_config: Optional[OpenAIClientConfig] = None
+) -> AzureOpenAI | AsyncAzureOpenAI:
+    """
+    Returns the process wide Azure OpenAI client for the given endpoint, creating it on first use.
+
+    When client_config.asynchronous is set an AsyncAzureOpenAI client is returned. Its connection pool is bound to
+    the event loop that first uses it, which for the API is the uvicorn worker loop.
+    """
+    asynchronous = client_config.asynchronous if client_config else False
+    key = (asynchronous, azure_endpoint, api_key, api_version)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            limits = None
+            timeout = None
+            if client_config:
+                limits = httpx.Limits(
+                    max_connections=client_config.max_connections,
+                    max_keepalive_connections=client_config.max_keepalive_connections,
+                    keepalive_expiry=client_config.keepalive_expiry
+                )
+                timeout = httpx.Timeout(client_config.timeout)
+
+            if asynchronous:
+                http_client = httpx.AsyncClient(limits=limits, timeout=timeout) if limits else None
+                client = AsyncAzureOpenAI(
+                    azure_endpoint=azure_endpoint,
+                    api_key=api_key,
+                    api_version=api_version,
+                    http_client=http_client
+                )
+            else:
+                http_client = httpx.Client(limits=limits, timeout=timeout) if limits else None
+                client = AzureOpenAI(
+                    azure_endpoint=azure_endpoint,
+                    api_key=api_key,
+                    api_version=api_version,
+                    http_client=http_client
+                )
+            _clients[key] = client
+    return client
+
+
+async def close_openai_clients() -> None:
+    """Closes every shared client and its connection pool. Called when the API shuts down."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        try:
+            if isinstance(client, AsyncAzureOpenAI):
+                await client.close()
+            else:
+                client.close()
+        except Exception as e:
+            logger.warning(f"Failed to close OpenAI client: {e}")
+
 
 class OpenAIService:
     def __init__(
@@ -18,13 +93,16 @@ class OpenAIService:
         azure_endpoint: str,
         api_key: str,
         api_version: str,
-        open_ai_model: str
+        open_ai_model: str,
+        client_config: Optional[OpenAIClientConfig] = None
     ):
-        self.client = AzureOpenAI(
+        self.client = get_openai_client(
             azure_endpoint=azure_endpoint,
             api_key=api_key,
-            api_version=api_version
+            api_version=api_version,
+            client_config=client_config
         )
+        self.asynchronous = isinstance(self.client, AsyncAzureOpenAI)
         self.model = open_ai_model
 
     async def generate_response(
@@ -36,7 +114,7 @@ class OpenAIService:
     ) -> ChatCompletionMessage:
         logger.debug(f"Generating OpenAI response for messages: {messages}")
         try:
-            response = self.client.chat.completions.create(
+            completion_args = dict(
                 model=self.model,
                 messages=messages,
                 tools=tools or NOT_GIVEN,
@@ -44,6 +122,10 @@ class OpenAIService:
                 response_format={"type": "json_object"} if json_mode else NOT_GIVEN,
                 temperature=0.2,
             )
+            if self.asynchronous:
+                response = await self.client.chat.completions.create(**completion_args)
+            else:
+                response = self.client.chat.completions.create(**completion_args)
             return response.choices[0].message
         except BadRequestError as error:
             # Log the error
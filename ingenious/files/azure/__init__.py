@@ -1,9 +1,72 @@
-from azure.storage.blob import BlobServiceClient
-from azure.identity import ManagedIdentityCredential, DefaultAzureCredential, ClientSecretCredential
+import asyncio
+from typing import AsyncGenerator, Awaitable, Callable, Dict, Tuple
+
+import aiohttp
+from azure.core.exceptions import ResourceExistsError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob.aio import BlobServiceClient
+from azure.identity.aio import ManagedIdentityCredential, DefaultAzureCredential, ClientSecretCredential
 from ingenious.files.files_repository import IFileStorage
 from pathlib import Path
 from ingenious.models.config import AuthenticationMethod as file_storage_AuthenticationMethod,  FileStorageContainer, Config
 
+# One aiohttp session per event loop, shared by every Azure file storage repository running on that loop so that
+# their connections come from a single pool. Sessions are bound to the loop they were created on, and the prompt
+# tuner runs each call on a new loop through asyncio.run, so they cannot be shared across loops. Each session is
+# closed when its loop shuts down.
+_sessions: Dict[asyncio.AbstractEventLoop, Tuple[aiohttp.ClientSession, AsyncGenerator]] = {}
+
+
+async def _close_on_loop_shutdown(close: Callable[[], Awaitable[None]]) -> AsyncGenerator:
+    try:
+        yield
+    finally:
+        try:
+            await close()
+        except Exception as e:
+            print(f"Failed to close Azure file storage resources: {e}")
+
+
+async def _close_with_loop(close: Callable[[], Awaitable[None]]) -> AsyncGenerator:
+    """
+    Arranges for close to be awaited when the running loop shuts down, and returns the generator that does it.
+
+    asyncio.run and uvicorn call loop.shutdown_asyncgens() before closing their loop, which finalises every async
+    generator started on that loop while it is still running. Keep a reference to the generator for as long as the
+    resources are in use; calling its aclose() closes them earlier.
+    """
+    closer = _close_on_loop_shutdown(close)
+    await closer.__anext__()
+    return closer
+
+
+def _forget_closed_loops(entries: Dict[asyncio.AbstractEventLoop, tuple]) -> None:
+    # Entries of finished loops were closed by the loop's shutdown; only a loop closed without it leaves them open
+    for loop in [loop for loop in entries if loop.is_closed()]:
+        closer = entries.pop(loop)[-1]
+        if closer.ag_frame is not None:
+            print("An event loop was closed without shutting down its async generators; "
+                  "its Azure file storage connections could not be closed")
+
+
+async def _get_shared_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    _forget_closed_loops(_sessions)
+
+    entry = _sessions.get(loop)
+    if entry is None or entry[0].closed:
+        session = aiohttp.ClientSession()
+        entry = (session, await _close_with_loop(session.close))
+        _sessions[loop] = entry
+    return entry[0]
+
+
+async def close_shared_session() -> None:
+    """Closes the shared session of the running loop. Clients using it are recreated on their next call."""
+    entry = _sessions.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].aclose()
+
 
 class azure_FileStorageRepository(IFileStorage):
 
@@ -15,21 +78,70 @@ class azure_FileStorageRepository(IFileStorage):
         self.client_id = fs_config.client_id
         self.container_name = fs_config.container_name
         self.authentication_method = fs_config.authentication_method
+        self.max_concurrency = fs_config.max_concurrency
+        self._clients: Dict[
+            asyncio.AbstractEventLoop, Tuple[BlobServiceClient, aiohttp.ClientSession, AsyncGenerator]
+        ] = {}
+        self._container_checked = False
 
+    def _create_credential(self):
         if self.authentication_method == file_storage_AuthenticationMethod.TOKEN:
-            self.blob_service_client = BlobServiceClient(account_url=self.url, credential=self.token)
-        
+            return self.token
+
         if self.authentication_method == file_storage_AuthenticationMethod.CLIENT_ID_AND_SECRET:
-            cred = ClientSecretCredential(self.client_id, self.token)
-            self.blob_service_client = BlobServiceClient(account_url=self.url, credential=cred)
-        
+            return ClientSecretCredential(self.client_id, self.token)
+
         if self.authentication_method == file_storage_AuthenticationMethod.MSI:
-            self.blob_service_client = BlobServiceClient(account_url=self.url, credential=ManagedIdentityCredential(client_id=self.client_id))
-            print("======")
-            print(self.client_id, self.url)
+            return ManagedIdentityCredential(client_id=self.client_id)
 
         if self.authentication_method == file_storage_AuthenticationMethod.DEFAULT_CREDENTIAL:
-            self.blob_service_client = BlobServiceClient(account_url=self.url, credential=DefaultAzureCredential())
+            return DefaultAzureCredential()
+
+        return None
+
+    async def _get_blob_service_client(self) -> BlobServiceClient:
+        """
+        Returns the blob service client for the running event loop. The client is created once per loop, reuses the
+        loop's shared transport and keeps its credential, so tokens and connections are not re-established per call.
+        The client and its credential are closed when the loop shuts down.
+        """
+        loop = asyncio.get_running_loop()
+        _forget_closed_loops(self._clients)
+
+        entry = self._clients.get(loop)
+        if entry is not None and not entry[1].closed:
+            return entry[0]
+
+        session = await _get_shared_session()
+        credential = self._create_credential()
+        blob_service_client = BlobServiceClient(
+            account_url=self.url,
+            credential=credential,
+            transport=AioHttpTransport(session=session, session_owner=False),
+            max_single_get_size=4 * 1024 * 1024,
+            max_chunk_get_size=4 * 1024 * 1024,
+            max_single_put_size=4 * 1024 * 1024,
+            max_block_size=4 * 1024 * 1024
+        )
+
+        async def close_client() -> None:
+            await blob_service_client.close()
+            if hasattr(credential, "close"):
+                await credential.close()
+
+        self._clients[loop] = (blob_service_client, session, await _close_with_loop(close_client))
+
+        if not self._container_checked:
+            # Create the container if it does not exist. Only checked once per repository rather than per write.
+            try:
+                await blob_service_client.get_container_client(self.container_name).create_container()
+            except ResourceExistsError:
+                pass
+            except Exception as e:
+                print(f"Failed to check container {self.container_name}: {e}")
+            self._container_checked = True
+
+        return blob_service_client
 
     async def write_file(self, contents: str, file_name: str, file_path: str):
         """
@@ -45,16 +157,13 @@ class azure_FileStorageRepository(IFileStorage):
         """
         try:
             path = Path(self.fs_config.path) / Path(file_path) / Path(file_name)
-            # Create the container if it does not exist
-            container_client = self.blob_service_client.get_container_client(self.container_name)
-            if not container_client.container_name:
-                container_client.create_container()
+            blob_service_client = await self._get_blob_service_client()
 
             # Create a blob client
-            blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
+            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
 
-            # Upload the data
-            blob_client.upload_blob(contents, overwrite=True)
+            # Upload the data, in parallel blocks for large files
+            await blob_client.upload_blob(contents, overwrite=True, max_concurrency=self.max_concurrency)
             #print(f"Successfully uploaded {path} to container {self.container_name}.")
         except Exception as e:
             print(f"Failed to upload {path} to container {self.container_name}: {e}")
@@ -66,17 +175,16 @@ class azure_FileStorageRepository(IFileStorage):
         :param file_name: Name of the blob (file) to read.
         :param file_path: Path of the blob (file) to read.
         """
-        
+
         try:
             path = Path(self.fs_config.path) / Path(file_path) / Path(file_name)
-            print(path)
+            blob_service_client = await self._get_blob_service_client()
             # Create a blob client
-            blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
+            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
 
             # encoding param is necessary for readall() to return str, otherwise it returns bytes
-            downloader = blob_client.download_blob(max_concurrency=1, encoding='UTF-8')
-            data = downloader.readall()
-
+            downloader = await blob_client.download_blob(max_concurrency=self.max_concurrency, encoding='UTF-8')
+            data = await downloader.readall()
 
             #print(f"Successfully downloaded {path} from container {self.container_name}.")
             return data
@@ -91,14 +199,15 @@ class azure_FileStorageRepository(IFileStorage):
         :param file_name: Name of the blob (file) to delete.
         :param file_path: Path of the blob (file) to delete.
         """
-        
+
         try:
             path = Path(self.fs_config.path) / Path(file_path) / Path(file_name)
+            blob_service_client = await self._get_blob_service_client()
             # Create a blob client
-            blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
+            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
 
             # Delete the blob
-            blob_client.delete_blob()
+            await blob_client.delete_blob()
             #print(f"Successfully deleted {path} from container {self.container_name}.")
         except Exception as e:
             print(f"Failed to delete {path} from container {self.container_name}: {e}")
@@ -113,9 +222,10 @@ class azure_FileStorageRepository(IFileStorage):
         try:
             path = Path(self.fs_config.path) / Path(file_path)
             prefix = str(path).replace("\\", "/")  # Ensure the path is in the correct format for Azure
+            blob_service_client = await self._get_blob_service_client()
             # List blobs in the container with the specified prefix
-            container_client = self.blob_service_client.get_container_client(self.container_name)
-            blobs = [blob.name for blob in container_client.list_blobs(name_starts_with=prefix)]
+            container_client = blob_service_client.get_container_client(self.container_name)
+            blobs = [blob.name async for blob in container_client.list_blobs(name_starts_with=prefix)]
             # print(f"Blobs in container {self.container_name} with prefix {prefix}: {blobs}")
             return blobs
         except Exception as e:
@@ -126,27 +236,53 @@ class azure_FileStorageRepository(IFileStorage):
         """
         Check if a blob exists in an Azure Blob container.
 
-        :param container_name: Name of the Azure Blob container.
-        :param blob_name: Name of the blob (file) to check.
-        :param connection_string: Connection string to Azure Storage account.
+        :param file_path: Path within the storage container.
+        :param file_name: Name of the blob (file) to check.
         :return: True if the blob exists, False otherwise.
         """
-        
+
         try:
             path = Path(self.fs_config.path) / Path(file_path) / Path(file_name)
+            blob_service_client = await self._get_blob_service_client()
             # Create a blob client
-            blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
-            exists = blob_client.exists()
+            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
+            exists = await blob_client.exists()
             #print(f"Blob {path} exists in container {self.container_name}: {exists}")
             return exists
         except Exception as e:
             print(f"Failed to check if blob {path} exists in container {self.container_name}: {e}")
             return False
-        
+
+    async def get_file_version(self, file_name: str, file_path: str):
+        """
+        Get the ETag of a blob, used to validate cached copies.
+
+        :param file_name: Name of the blob (file).
+        :param file_path: Path within the storage container.
+        :return: The blob's ETag, or None if it does not exist.
+        """
+        try:
+            path = Path(self.fs_config.path) / Path(file_path) / Path(file_name)
+            blob_service_client = await self._get_blob_service_client()
+            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=str(path))
+            properties = await blob_client.get_blob_properties()
+            return properties.etag
+        except Exception:
+            return None
+
     async def get_base_path(self) -> str:
         """
         Get the base path of the Azure Blob container.
 
         :return: Base path of the Azure Blob container.
         """
-        return self.url + '/' + self.fs_config.path
\ No newline at end of file
+        return self.url + '/' + self.fs_config.path
+
+    async def close(self) -> None:
+        """
+        Close the blob service client of the running loop and the loop's shared transport.
+        """
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[2].aclose()
+        await close_shared_session()
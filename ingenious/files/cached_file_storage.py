@@ -0,0 +1,200 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiofiles
+
+from ingenious.files.files_repository import IFileStorage
+
+CacheKey = Tuple[str, str]
+
+
+@dataclass
+class CachedFile:
+    content: str
+    version: Optional[str]
+    validated_at: float
+    size: int
+
+
+class ByteLRUCache:
+    """
+    In-memory cache bounded by the total size of its entries. Inserting past the limit evicts the least recently used
+    entries. Any object with the same get/put/pop/clear methods can be passed to CachedFileStorage instead.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[CacheKey, CachedFile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[CachedFile]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: CacheKey, entry: CachedFile) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def pop(self, key: CacheKey) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class CachedFileStorage(IFileStorage):
+    """
+    Read-through cache around another IFileStorage.
+
+    Reads are served from memory for ttl seconds. After that the backend's get_file_version (ETag or mtime) is
+    compared with the cached version and the file is only downloaded again if it changed. An optional disk tier keeps
+    validated copies across restarts; it is only used when the backend can report versions. Listings and existence
+    checks are cached for ttl seconds. write_file and delete_file go straight to the backend and invalidate the
+    affected entries.
+    """
+
+    def __init__(
+            self,
+            repository: IFileStorage,
+            max_bytes: int = 64 * 1024 * 1024,
+            ttl: float = 5.0,
+            disk_path: str = "",
+            memory_cache=None
+    ):
+        self.repository = repository
+        self.config = repository.config
+        self.fs_config = repository.fs_config
+        self.ttl = ttl
+        self.disk_path = Path(disk_path) if disk_path else None
+        if self.disk_path:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+        self._memory = memory_cache if memory_cache is not None else ByteLRUCache(max_bytes)
+        self._listings: Dict[str, Tuple[float, List[str]]] = {}
+        self._exists: Dict[CacheKey, Tuple[float, bool]] = {}
+
+    def _disk_file(self, key: CacheKey) -> Path:
+        return self.disk_path / hashlib.sha256(f"{key[0]}\n{key[1]}".encode("utf-8")).hexdigest()
+
+    async def _read_disk(self, key: CacheKey) -> Optional[dict]:
+        try:
+            async with aiofiles.open(self._disk_file(key), "r", encoding="utf-8") as f:
+                return json.loads(await f.read())
+        except (OSError, ValueError):
+            return None
+
+    async def _write_disk(self, key: CacheKey, content: str, version: str) -> None:
+        try:
+            async with aiofiles.open(self._disk_file(key), "w", encoding="utf-8") as f:
+                await f.write(json.dumps({"version": version, "content": content}))
+        except OSError as e:
+            print(f"Failed to write cache file for {key[1]}: {e}")
+
+    def _invalidate(self, file_name: str, file_path: str) -> None:
+        key = (file_path, file_name)
+        self._memory.pop(key)
+        self._exists.pop(key, None)
+        self._listings.pop(file_path, None)
+        if self.disk_path:
+            self._disk_file(key).unlink(missing_ok=True)
+
+    def invalidate_all(self) -> None:
+        self._memory.clear()
+        self._listings.clear()
+        self._exists.clear()
+
+    async def read_file(self, file_name: str, file_path: str):
+        key = (file_path, file_name)
+        now = time.monotonic()
+        entry = self._memory.get(key)
+        if entry is not None and now - entry.validated_at < self.ttl:
+            return entry.content
+
+        version = await self.repository.get_file_version(file_name, file_path)
+        if entry is not None and version is not None and version == entry.version:
+            entry.validated_at = now
+            return entry.content
+
+        if self.disk_path and version is not None:
+            cached = await self._read_disk(key)
+            if cached is not None and cached.get("version") == version:
+                content = cached["content"]
+                self._memory.put(key, CachedFile(content, version, now, len(content.encode("utf-8"))))
+                return content
+
+        content = await self.repository.read_file(file_name, file_path)
+        if content:
+            self._memory.put(key, CachedFile(content, version, now, len(content.encode("utf-8"))))
+            if self.disk_path and version is not None:
+                await self._write_disk(key, content, version)
+        else:
+            self._memory.pop(key)
+        return content
+
+    async def write_file(self, contents: str, file_name: str, file_path: str):
+        try:
+            return await self.repository.write_file(contents, file_name, file_path)
+        finally:
+            self._invalidate(file_name, file_path)
+
+    async def delete_file(self, file_name: str, file_path: str):
+        try:
+            return await self.repository.delete_file(file_name, file_path)
+        finally:
+            self._invalidate(file_name, file_path)
+
+    async def list_files(self, file_path: str):
+        now = time.monotonic()
+        cached = self._listings.get(file_path)
+        if cached is not None and now - cached[0] < self.ttl:
+            return list(cached[1])
+        files = await self.repository.list_files(file_path)
+        if files is not None:
+            self._listings[file_path] = (now, list(files))
+        return files
+
+    async def check_if_file_exists(self, file_path: str, file_name: str) -> bool:
+        key = (file_path, file_name)
+        now = time.monotonic()
+        entry = self._memory.get(key)
+        if entry is not None and now - entry.validated_at < self.ttl:
+            return True
+        cached = self._exists.get(key)
+        if cached is not None and now - cached[0] < self.ttl:
+            return cached[1]
+        exists = await self.repository.check_if_file_exists(file_path, file_name)
+        self._exists[key] = (now, exists)
+        return exists
+
+    async def get_file_version(self, file_name: str, file_path: str) -> Optional[str]:
+        return await self.repository.get_file_version(file_name, file_path)
+
+    async def get_base_path(self) -> str:
+        return await self.repository.get_base_path()
+
+    async def close(self) -> None:
+        self.invalidate_all()
+        await self.repository.close()
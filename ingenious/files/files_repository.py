@@ -1,6 +1,9 @@
+import asyncio
 import importlib
+import threading
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Dict, List, Optional
 from ingenious.models.config import FileStorageContainer, Config
 
 
@@ -39,6 +42,35 @@ class IFileStorage(ABC):
         """ returns the base path of the file storage """
         pass
 
+    async def get_file_version(self, file_name: str, file_path: str) -> Optional[str]:
+        """ returns a validator (ETag or mtime) that changes whenever the file changes, or None if unavailable """
+        return None
+
+    async def read_files(self, file_names: List[str], file_path: str) -> Dict[str, str]:
+        """ reads several files from the same folder concurrently, returning their contents keyed by file name """
+        semaphore = asyncio.Semaphore(self.fs_config.batch_concurrency)
+
+        async def read(file_name: str):
+            async with semaphore:
+                return await self.read_file(file_name=file_name, file_path=file_path)
+
+        contents = await asyncio.gather(*[read(file_name) for file_name in file_names])
+        return dict(zip(file_names, contents))
+
+    async def write_files(self, files: Dict[str, str], file_path: str) -> None:
+        """ writes several files, given as file name to contents, to the same folder concurrently """
+        semaphore = asyncio.Semaphore(self.fs_config.batch_concurrency)
+
+        async def write(file_name: str, contents: str):
+            async with semaphore:
+                return await self.write_file(contents=contents, file_name=file_name, file_path=file_path)
+
+        await asyncio.gather(*[write(file_name, contents) for file_name, contents in files.items()])
+
+    async def close(self) -> None:
+        """ releases any clients held by the file storage """
+        pass
+
 
 class FileStorage:
 
@@ -46,7 +78,7 @@ class FileStorage:
         self.config = config        
         self.add_sub_folders = getattr(self.config.file_storage, Category).add_sub_folders
         module_name = \
-            f"ingenious.files.{self.config.file_storage.revisions.storage_type.lower()}"
+            f"ingenious.files.{getattr(self.config.file_storage, Category).storage_type.lower()}"
         
         # Dynamically import the module based on the storage type
         
@@ -68,6 +100,15 @@ class FileStorage:
                 f"Unsupported File Storage client type: {module_name}.{class_name}"
             ) from e
 
+        if fs_config.cache_enable:
+            from ingenious.files.cached_file_storage import CachedFileStorage
+            self.repository = CachedFileStorage(
+                self.repository,
+                max_bytes=fs_config.cache_max_bytes,
+                ttl=fs_config.cache_ttl,
+                disk_path=fs_config.cache_disk_path
+            )
+
     async def write_file(self, contents: str, file_name: str, file_path: str):
         return await self.repository.write_file(contents=contents, file_name=file_name, file_path=file_path)
 
@@ -85,6 +126,15 @@ class FileStorage:
     
     async def check_if_file_exists(self, file_path: str, file_name: str):
         return await self.repository.check_if_file_exists(file_path, file_name)
+
+    async def read_files(self, file_names: List[str], file_path: str) -> Dict[str, str]:
+        return await self.repository.read_files(file_names, file_path)
+
+    async def write_files(self, files: Dict[str, str], file_path: str):
+        return await self.repository.write_files(files, file_path)
+
+    async def close(self):
+        return await self.repository.close()
     
     async def get_prompt_template_path(self, revision_id: str = None):
         if revision_id:
@@ -115,4 +165,52 @@ class FileStorage:
             template_path = str(Path("functional_test_outputs")/Path(revision_id))
         else: 
             template_path = str(Path("functional_test_outputs"))
-        return template_path
\ No newline at end of file
+        return template_path
+
+
+_file_storages: Dict[tuple, FileStorage] = {}
+_file_storages_lock = threading.Lock()
+
+
+def get_file_storage(config: Config, Category: str = "revisions") -> FileStorage:
+    """
+    Returns a FileStorage shared by every caller using the same category and storage settings, so that backend clients,
+    credentials and transports are created once rather than on every call. Any change to the location, credentials or
+    cache settings of the category, e.g. after a configuration reload, gives a new FileStorage.
+    """
+    fs_config: FileStorageContainer = getattr(config.file_storage, Category)
+    key = (
+        Category,
+        fs_config.storage_type.lower(),
+        fs_config.container_name,
+        fs_config.path,
+        fs_config.url,
+        str(fs_config.authentication_method),
+        fs_config.client_id,
+        fs_config.token,
+        fs_config.max_concurrency,
+        fs_config.cache_enable,
+        fs_config.cache_max_bytes,
+        fs_config.cache_ttl,
+        fs_config.cache_disk_path
+    )
+    fs = _file_storages.get(key)
+    if fs is None:
+        with _file_storages_lock:
+            fs = _file_storages.get(key)
+            if fs is None:
+                fs = FileStorage(config, Category=Category)
+                _file_storages[key] = fs
+    return fs
+
+
+async def close_file_storages() -> None:
+    """Closes every shared FileStorage. Later calls to get_file_storage create new ones."""
+    with _file_storages_lock:
+        file_storages = list(_file_storages.values())
+        _file_storages.clear()
+    for fs in file_storages:
+        try:
+            await fs.close()
+        except Exception as e:
+            print(f"Failed to close file storage: {e}")
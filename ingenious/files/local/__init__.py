@@ -93,6 +93,21 @@ class local_FileStorageRepository(IFileStorage):
             print(f"Failed to check if {file_name} exists in {path}: {e}")
             return False
 
+    async def get_file_version(self, file_name: str, file_path: str):
+        """
+        Get the modification time and size of a local file, used to validate cached copies.
+
+        :param file_name: Name of the file.
+        :param file_path: Path to the file.
+        :return: The version string, or None if the file does not exist.
+        """
+        path = Path(self.fs_config.path) / Path(file_path) / Path(file_name)
+        try:
+            stat = path.stat()
+            return f"{stat.st_mtime_ns}-{stat.st_size}"
+        except OSError:
+            return None
+
     async def get_base_path(self) -> str:
         """
         Get the base path of the local file storage.
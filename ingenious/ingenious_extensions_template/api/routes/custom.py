@@ -20,8 +20,8 @@ class Api_Routes(IApiRoutes):
 
             logger = logging.getLogger(__name__)        
            
-            fs = files_repository.FileStorage(config=config, Category='revisions')
-            fs_data = files_repository.FileStorage(config=config, Category='data')
+            fs = files_repository.get_file_storage(config, Category='revisions')
+            fs_data = files_repository.get_file_storage(config, Category='data')
 
             # Todo implement the processing logic
 
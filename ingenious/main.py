@@ -1,9 +1,9 @@
 import os
+import threading
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.wsgi import WSGIMiddleware
-from chainlit.utils import mount_chainlit
 from dotenv import load_dotenv
 import logging
 import ingenious.config.config as ingen_config
@@ -11,12 +11,16 @@ import importlib.resources as pkg_resources
 
 # Import your routers
 from ingenious.models.api_routes import IApiRoutes
+import ingenious.dependencies as igen_deps
 from ingenious.utils.namespace_utils import import_class_with_fallback, import_module_with_fallback, get_inbuilt_api_routes
 from ingenious.api.routes import \
     chat as chat_route, \
     message_feedback as message_feedback_route, \
     diagnostic as diagnostic_route, \
+    flows as flows_route, \
     prompts as prompts_route
+from ingenious.services.chat_services.multi_agent.service import get_conversation_flows, warm_conversation_flow_cache
+from ingenious.services.chat_services.multi_agent.tool_functions_standard import close_sql_engines
 
 config = ingen_config.get_config(os.getenv("INGENIOUS_PROJECT_PATH", ""))
 
@@ -28,6 +32,31 @@ logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
 
+class LazyWSGIApp:
+    """WSGI app that builds the wrapped app on its first request, so its imports are not paid at startup."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._app = None
+        self._lock = threading.Lock()
+
+    @property
+    def app(self):
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = self._factory()
+        return self._app
+
+    def __call__(self, environ, start_response):
+        return self.app(environ, start_response)
+
+
+def create_prompt_tuner_app():
+    import ingenious_prompt_tuner as prompt_tuner
+    return prompt_tuner.create_app()
+
+
 class FastAgentAPI:
     def __init__(self, config: ingen_config.Config):
         # Set the working directory
@@ -35,8 +64,7 @@ class FastAgentAPI:
 
         # Initialize FastAPI app
         self.app = FastAPI(title="FastAgent API", version="1.0.0")
-        import ingenious_prompt_tuner as prompt_tuner
-        self.flask_app = prompt_tuner.create_app()
+        self.lazy_flask_app = LazyWSGIApp(create_prompt_tuner_app)
 
         # TODO: Add CORS option to config.
         origins = [
@@ -58,6 +86,7 @@ class FastAgentAPI:
         self.app.include_router(chat_route.router, prefix="/api/v1", tags=["Chat"])
         self.app.include_router(diagnostic_route.router, prefix="/api/v1", tags=["Diagnostic"])
         self.app.include_router(prompts_route.router, prefix="/api/v1", tags=["Prompts"])
+        self.app.include_router(flows_route.router, prefix="/api/v1", tags=["Flows"])
         self.app.include_router(
             message_feedback_route.router, prefix="/api/v1", tags=["Message Feedback"]
         )
@@ -74,15 +103,47 @@ class FastAgentAPI:
 
         # Mount ChainLit
         if config.chainlit_configuration.enable:
+            from chainlit.utils import mount_chainlit
             chainlit_path = pkg_resources.files("ingenious.chainlit") / "app.py"
             mount_chainlit(app=self.app, target=str(chainlit_path), path="/chainlit")
 
-        # Mount Flask App 
-        self.app.mount("/prompt-tuner", WSGIMiddleware(self.flask_app))
+        # Mount Flask App. It is created on the first prompt tuner request
+        if config.prompt_tuner.enable and config.prompt_tuner.mode == "fast_api":
+            self.app.mount("/prompt-tuner", WSGIMiddleware(self.lazy_flask_app))
 
         # Redirect `/` to `/docs`
         self.app.get("/", tags=["Root"])(self.redirect_to_docs)
 
+        # Create shared repositories and clients once per process and release them on shutdown
+        registry = igen_deps.get_service_registry()
+        self.app.add_event_handler("startup", registry.startup)
+        self.app.add_event_handler("shutdown", registry.shutdown)
+        self.app.add_event_handler("shutdown", close_sql_engines)
+
+        # Pick up edits to config.yml and profiles.yml without a restart
+        if config.web_configuration.config_reload_interval:
+            self.app.add_event_handler("startup", self.start_config_watcher)
+            self.app.add_event_handler("shutdown", ingen_config.get_config_service().stop_watching)
+
+        # Discover the conversation flows once at startup and optionally resolve them all up front
+        self.app.add_event_handler("startup", self.discover_conversation_flows)
+        if config.chat_service.warm_conversation_flows:
+            self.app.add_event_handler("startup", self.warm_conversation_flows)
+
+    @property
+    def flask_app(self):
+        return self.lazy_flask_app.app
+
+    async def start_config_watcher(self):
+        ingen_config.get_config_service().start_watching(config.web_configuration.config_reload_interval)
+
+    async def discover_conversation_flows(self):
+        get_conversation_flows(refresh=True)
+
+    async def warm_conversation_flows(self):
+        warmed = warm_conversation_flow_cache()
+        logger.info(f"Warmed conversation flows: {warmed}")
+
     async def redirect_to_docs(self):
         """Redirect the root endpoint to /docs."""
         return RedirectResponse(url="/docs")
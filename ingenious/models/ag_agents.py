@@ -2,14 +2,16 @@
 
 from abc import ABC
 import asyncio
-from typing import List
+from typing import List, Optional
 from autogen_agentchat.agents import AssistantAgent
+import logging
 from autogen_core import (
-    Agent, MessageContext, RoutedAgent, SingleThreadedAgentRuntime, message_handler, TopicId
+    EVENT_LOGGER_NAME, Agent, AgentId, CancellationToken, MessageContext, RoutedAgent, SingleThreadedAgentRuntime, message_handler, TopicId
 )
 from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 from autogen_agentchat.messages import TextMessage, ChatMessage
-from autogen_core.models import LLMMessage, UserMessage, AssistantMessage, FunctionExecutionResultMessage, ChatCompletionClient, SystemMessage
+from autogen_core.models import LLMMessage, UserMessage, AssistantMessage, FunctionExecutionResultMessage, ChatCompletionClient, SystemMessage, CreateResult
+from autogen_core.logging import LLMCallEvent
 from autogen_core import FunctionCall
 from autogen_core.tools import FunctionTool, Tool
 from autogen_agentchat.base import Response
@@ -20,6 +22,81 @@ from ingenious.models.agent import (
     LLMUsageTracker,
     AgentChats,
 )
+from ingenious.utils.chat_stream import get_chat_stream
+from ingenious.utils.token_counter import num_tokens_from_message_lists
+
+logger = logging.getLogger(__name__)
+
+
+def _to_event_messages(messages: List[LLMMessage]) -> List[dict]:
+    """Flattens a session into the role/content shape that LLMUsageTracker reads from LLMCallEvent."""
+    event_messages = []
+    for m in messages:
+        if isinstance(m, SystemMessage):
+            event_messages.append({"role": "system", "content": m.content})
+        elif isinstance(m, UserMessage):
+            event_messages.append({"role": "user", "content": m.content if isinstance(m.content, str) else None})
+        elif isinstance(m, AssistantMessage):
+            event_messages.append({"role": "assistant", "content": m.content if isinstance(m.content, str) else None})
+        elif isinstance(m, FunctionExecutionResultMessage):
+            for r in m.content:
+                event_messages.append({"role": "tool", "content": r.content})
+    return event_messages
+
+
+async def create_completion(
+    model_client: ChatCompletionClient,
+    agent_id: AgentId,
+    model_name: str,
+    messages: List[LLMMessage],
+    cancellation_token: CancellationToken,
+    tools: Optional[List[Tool]] = None,
+) -> CreateResult:
+    """
+        Runs a chat completion. When the current request is being streamed the completion is streamed too and each
+        token delta is published to the chat stream; otherwise this is a plain create() call.
+    """
+    tools = tools or []
+    stream = get_chat_stream()
+    if stream is None:
+        return await model_client.create(messages=messages, tools=tools, cancellation_token=cancellation_token)
+
+    create_result: CreateResult = None
+    async for chunk in model_client.create_stream(messages=messages, tools=tools, cancellation_token=cancellation_token):
+        if isinstance(chunk, str):
+            stream.publish("token", {"agent_name": agent_id.type, "delta": chunk})
+        else:
+            create_result = chunk
+
+    # create_stream does not log an LLMCallEvent, so log one here to keep LLMUsageTracker working.
+    event_messages = _to_event_messages(messages)
+    message = {"role": "assistant", "content": None, "tool_calls": None}
+    if isinstance(create_result.content, str):
+        message["content"] = create_result.content
+    else:
+        message["tool_calls"] = [{"tool_call_id": call.id, "content": call.arguments} for call in create_result.content]
+
+    prompt_tokens = create_result.usage.prompt_tokens
+    completion_tokens = create_result.usage.completion_tokens
+    if not prompt_tokens and not completion_tokens:
+        # Streamed responses only carry usage when the deployment supports stream_options, so estimate it instead.
+        try:
+            prompt_tokens, completion_tokens = num_tokens_from_message_lists(
+                [event_messages, [message]], model=model_name
+            )
+        except Exception as e:
+            logger.warning(f"Could not estimate token usage for streamed completion: {e}")
+
+    logging.getLogger(EVENT_LOGGER_NAME).info(
+        LLMCallEvent(
+            messages=event_messages,
+            response={"choices": [{"finish_reason": create_result.finish_reason, "message": message}]},
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            agent_id=agent_id,
+        )
+    )
+    return create_result
 
 
 class RoutedAssistantAgent(RoutedAgent, ABC):
@@ -66,7 +143,10 @@ class RoutedAssistantAgent(RoutedAgent, ABC):
         execute_tool_calls = True
         
         # Run the chat completion with the tools.
-        create_result = await self._model_client.create(
+        create_result = await create_completion(
+            model_client=self._model_client,
+            agent_id=self.id,
+            model_name=self._agent.model.model,
             messages=session,
             tools=self._tools,
             cancellation_token=ctx.cancellation_token,
@@ -90,7 +170,10 @@ class RoutedAssistantAgent(RoutedAgent, ABC):
             session.append(FunctionExecutionResultMessage(content=results))
 
             # Run the chat completion again to reflect on the history and function execution results.
-            create_result = await self._model_client.create(
+            create_result = await create_completion(
+                model_client=self._model_client,
+                agent_id=self.id,
+                model_name=self._agent.model.model,
                 messages=session,
                 cancellation_token=ctx.cancellation_token,
             )
@@ -152,17 +235,18 @@ class RoutedResponseOutputAgent(RoutedAgent, ABC):
     def __init__(self, agent: Agent, data_identifier: str, next_agent_topic: str = None, additional_data: str = '') -> None:
         super().__init__(agent.agent_name)
         self._next_agent_topic = next_agent_topic
-        model_client = AzureOpenAIChatCompletionClient(**agent.model.__dict__)
+        self._model_client = AzureOpenAIChatCompletionClient(**agent.model.__dict__)
         assistant_agent = AssistantAgent(
             name=agent.agent_name,
             system_message=agent.system_prompt,
             description="I am an AI assistant that helps with research.",
-            model_client=model_client
+            model_client=self._model_client
         )
         self._delegate = assistant_agent
         self._agent: Agent = agent
         self._data_identifier = data_identifier
         self._additional_data = additional_data
+        self._system_messages = [SystemMessage(content=agent.system_prompt)]
 
     @message_handler
     async def handle_my_message_type(
@@ -177,10 +261,21 @@ class RoutedResponseOutputAgent(RoutedAgent, ABC):
             identifier=self._data_identifier,
             ctx=ctx
         )
-        agent_chat.chat_response = await self._delegate.on_messages(
-            messages=[TextMessage(content=content, source=ctx.topic_id.source)],
-            cancellation_token=ctx.cancellation_token
-        )
+        if get_chat_stream() is None:
+            agent_chat.chat_response = await self._delegate.on_messages(
+                messages=[TextMessage(content=content, source=ctx.topic_id.source)],
+                cancellation_token=ctx.cancellation_token
+            )
+        else:
+            # The assistant agent cannot stream in this autogen version, so call the model client directly.
+            create_result = await create_completion(
+                model_client=self._model_client,
+                agent_id=self.id,
+                model_name=self._agent.model.model,
+                messages=self._system_messages + [UserMessage(content=content, source=ctx.topic_id.source)],
+                cancellation_token=ctx.cancellation_token,
+            )
+            agent_chat.chat_response = Response(chat_message=TextMessage(content=create_result.content, source=self._agent.agent_name))
 
         if self._next_agent_topic:
             await self.publish_my_message(agent_chat)
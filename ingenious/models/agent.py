@@ -3,11 +3,12 @@ import asyncio
 from datetime import datetime, timedelta
 from autogen_core import CancellationToken, FunctionCall, MessageContext, SingleThreadedAgentRuntime, TypeSubscription
 from pydantic import BaseModel
-from ingenious.files.files_repository import FileStorage
+from ingenious.files.files_repository import get_file_storage
 from ingenious.models.config import Config, ModelConfig
 import ingenious.config.config as ig_config
 from ingenious.models.llm_event_kwargs import LLMEventKwargs, ToolCall
 from ingenious.models.message import Message as ChatHistoryMessage
+from ingenious.utils.chat_stream import get_chat_stream
 from typing import List, Optional
 import logging
 from autogen_core.tools import FunctionTool, Tool
@@ -239,6 +240,7 @@ class LLMUsageTracker(logging.Handler):
         self._revision_id: str = revision_id
         self._identifier: str = identifier
         self._event_type: str = event_type
+        self._chat_stream = get_chat_stream()
 
     @property
     def tokens(self) -> int:
@@ -259,54 +261,58 @@ class LLMUsageTracker(logging.Handler):
     async def write_llm_responses_to_file(
             self, file_prefixes: List[str] = []
     ):
+        files = {}
         for agent_chat in self._queue:
             agent = self._agents.get_agent_by_name(agent_chat.target_agent_name)
             if agent.log_to_prompt_tuner:
-                fs = FileStorage(self._config)
-                output_path = await fs.get_output_path(self._revision_id)
-                content = agent_chat.model_dump_json()
                 temp_file_prefixes = file_prefixes.copy()
                 temp_file_prefixes.append("agent_response")
                 temp_file_prefixes.append(self._event_type)
                 temp_file_prefixes.append(agent_chat.source_agent_name)
                 temp_file_prefixes.append(agent_chat.target_agent_name)
                 temp_file_prefixes.append(self._identifier)
-                await fs.write_file(
-                    content,
-                    f"{"_".join(temp_file_prefixes)}.md",
-                    output_path
-                )
+                files[f"{"_".join(temp_file_prefixes)}.md"] = agent_chat.model_dump_json()
+
+        if files:
+            fs = get_file_storage(self._config)
+            output_path = await fs.get_output_path(self._revision_id)
+            await fs.write_files(files, output_path)
     
-    # TODO: Implement this function
     async def write_llm_responses_to_repository(
             self, user_id: str, thread_id: str, message_id: str
     ):
+        files = {}
+        messages: List[ChatHistoryMessage] = []
         for agent_chat in self._queue:
             agent = self._agents.get_agent_by_name(agent_chat.target_agent_name)
-            if agent.log_to_prompt_tuner:                
-                fs = FileStorage(self._config)
-                output_path = await fs.get_output_path(self._revision_id)
+            if agent.log_to_prompt_tuner:
                 content = agent_chat.model_dump_json()
-                await fs.write_file(
-                    content,
-                    f"agent_response_{self._event_type}_{agent_chat.source_agent_name}_{agent_chat.target_agent_name}_{self._identifier}.md",
-                    output_path
+                files[f"agent_response_{self._event_type}_{agent_chat.source_agent_name}_{agent_chat.target_agent_name}_{self._identifier}.md"] = content
+                messages.append(
+                    ChatHistoryMessage(
+                        user_id=user_id,
+                        thread_id=thread_id,
+                        message_id=message_id,
+                        role="agent_chat",
+                        content=content,
+                        content_filter_results=None,
+                        tool_calls=None,
+                        tool_call_id=None,
+                        tool_call_function=None
+                    )
                 )
 
-                message: ChatHistoryMessage = ChatHistoryMessage(
-                    user_id=user_id,
-                    thread_id=thread_id,
-                    message_id=message_id,
-                    role="agent_chat",
-                    # Get the item from the queue where chat_name = "summary"
-                    content=agent_chat.model_dump_json(),
-                    content_filter_results=None,
-                    tool_calls=None,
-                    tool_call_id=None,
-                    tool_call_function=None
-                )
+        if not messages:
+            return
 
-                write_message = await self._chat_history_database.add_message(message=message)
+        fs = get_file_storage(self._config)
+        output_path = await fs.get_output_path(self._revision_id)
+        # The files are written concurrently (bounded by batch_concurrency) while the messages go to the chat history
+        # in a single multi-row insert, so the cost no longer grows with the number of agents in the flow.
+        await asyncio.gather(
+            fs.write_files(files, output_path),
+            self._chat_history_database.add_messages(messages)
+        )
 
     async def post_chats_to_queue(self, target_queue: asyncio.Queue[AgentChat]):
         for agent_chat in self._queue:
@@ -356,6 +362,15 @@ class LLMUsageTracker(logging.Handler):
                 chat.end_time = datetime.now().timestamp()
                 if add_chat:
                     self._queue.append(chat)
+                    if self._chat_stream is not None:
+                        self._chat_stream.publish("agent_response", {
+                            "agent_name": agent_name,
+                            "source_agent_name": source_name,
+                            "content": response,
+                            "prompt_tokens": event.prompt_tokens,
+                            "completion_tokens": event.completion_tokens,
+                            "execution_time": chat.get_execution_time()
+                        })
                 
         except Exception as e:
             print(f'Failed to emit log record :{e}')
@@ -7,7 +7,7 @@ import json
 import ingenious.dependencies as ig_dependencies
 import ingenious.utils.model_utils as model_utils
 from rich import progress
-from ingenious.files.files_repository import FileStorage
+from ingenious.files.files_repository import get_file_storage
 from ingenious.utils.stage_executor import ProgressConsoleWrapper
 from collections import defaultdict
 import os
@@ -1078,7 +1078,7 @@ class RootModel(BaseModel):
         self._ball_history_file_name = f"ball_history_for_fixture_id_{self.Fixture.Id}.json"
 
         # Check if the parquet file already exists
-        fs = FileStorage(ig_dependencies.get_config())
+        fs = get_file_storage(ig_dependencies.get_config())
         file_check: bool = await fs.check_if_file_exists(file_path=self._ball_history_path,
                                                          file_name=self._ball_history_file_name)
 
@@ -1152,7 +1152,7 @@ class RootModel(BaseModel):
         return self._NewBallsInThisFeed
 
     async def Delete_New_Ball_Watermark(self, config: ig_dependencies.Config):
-        fs = FileStorage(config)
+        fs = get_file_storage(config)
         await fs.delete_file(file_path=self._ball_history_path, file_name=self._ball_history_file_name)
         self._NewBallsMarked = False
         self._NewBallsInThisFeed = None
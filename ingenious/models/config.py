@@ -16,7 +16,20 @@ class ChatHistoryConfig(config_ns_models.ChatHistoryConfig):
             database_path=config.database_path,
             database_connection_string=profile.database_connection_string,
             database_name=config.database_name,
-            memory_path=config.memory_path)
+            memory_path=config.memory_path,
+            sqlite_pool_size=config.sqlite_pool_size,
+            sqlite_journal_mode=config.sqlite_journal_mode,
+            sqlite_busy_timeout=config.sqlite_busy_timeout,
+            duckdb_parquet_path=config.duckdb_parquet_path,
+            write_behind=config.write_behind,
+            write_behind_max_size=config.write_behind_max_size,
+            write_behind_batch_size=config.write_behind_batch_size,
+            write_behind_flush_interval=config.write_behind_flush_interval,
+            write_behind_log_path=config.write_behind_log_path,
+            write_behind_max_attempts=config.write_behind_max_attempts,
+            history_token_budget=config.history_token_budget,
+            history_summary_token_budget=config.history_summary_token_budget,
+            history_page_size=config.history_page_size)
 
 
 class ModelConfig(config_ns_models.ModelConfig):
@@ -28,6 +41,23 @@ class ModelConfig(config_ns_models.ModelConfig):
                          base_url=profile.base_url, api_key=profile.api_key)
 
 
+class OpenAIClientConfig(config_ns_models.OpenAIClientConfig):
+    def __init__(self, config: config_ns_models.OpenAIClientConfig):
+        super().__init__(
+            asynchronous=config.asynchronous,
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+            timeout=config.timeout)
+
+
+class TokenCounterConfig(config_ns_models.TokenCounterConfig):
+    def __init__(self, config: config_ns_models.TokenCounterConfig):
+        super().__init__(
+            model_max_tokens=config.model_max_tokens,
+            default_max_tokens=config.default_max_tokens)
+
+
 class ChainlitConfig(config_ns_models.ChainlitConfig):
     authentication: profile_models.ChainlitAuthConfig = Field(default_factory=profile_models.ChainlitAuthConfig)
 
@@ -35,9 +65,17 @@ class ChainlitConfig(config_ns_models.ChainlitConfig):
         super().__init__(enable=config.enable, authentication=profile.authentication)
 
 
+class PromptTunerConfig(config_ns_models.PromptTunerConfig):
+    def __init__(self, config: config_ns_models.PromptTunerConfig):
+        super().__init__(enable=config.enable, mode=config.mode)
+
+
 class ChatServiceConfig(config_ns_models.ChatServiceConfig):
     def __init__(self, config: config_ns_models.ChatServiceConfig, profile: profile_models.ChatServiceConfig):
-        super().__init__(type=config.type)
+        super().__init__(
+            type=config.type,
+            warm_conversation_flows=config.warm_conversation_flows,
+            prompt_template_cache_ttl=config.prompt_template_cache_ttl)
 
 
 class ToolServiceConfig(config_ns_models.ToolServiceConfig):
@@ -90,6 +128,7 @@ class WebConfig(config_ns_models.WebConfig):
             port=config.port,
             type=config.type,
             asynchronous=config.asynchronous,
+            config_reload_interval=config.config_reload_interval,
             authentication=profile.authentication
         )
 
@@ -99,7 +138,20 @@ class LocaldbConfig(config_ns_models.LocaldbConfig):
         super().__init__(
             database_path=config.database_path,
             sample_csv_path=config.sample_csv_path,
-            sample_database_name=config.sample_database_name)
+            sample_database_name=config.sample_database_name,
+            sample_chunk_size=config.sample_chunk_size)
+
+
+class SqlToolsConfig(config_ns_models.SqlToolsConfig):
+    def __init__(self, config: config_ns_models.SqlToolsConfig):
+        super().__init__(
+            pool_size=config.pool_size,
+            max_rows=config.max_rows,
+            max_bytes=config.max_bytes,
+            fetch_size=config.fetch_size,
+            schema_cache_ttl=config.schema_cache_ttl,
+            result_cache_ttl=config.result_cache_ttl,
+            result_cache_max_bytes=config.result_cache_max_bytes)
 
 
 class AuthenticationMethod(str, Enum):
@@ -121,7 +173,13 @@ class FileStorageContainer(config_ns_models.FileStorageContainer):
             storage_type=config.storage_type,
             container_name=config.container_name,
             path=config.path,
-            add_sub_folders=config.add_sub_folders
+            add_sub_folders=config.add_sub_folders,
+            max_concurrency=config.max_concurrency,
+            batch_concurrency=config.batch_concurrency,
+            cache_enable=config.cache_enable,
+            cache_max_bytes=config.cache_max_bytes,
+            cache_ttl=config.cache_ttl,
+            cache_disk_path=config.cache_disk_path
         )
         self.url = profile.url
         self.token = profile.token
@@ -150,12 +208,16 @@ class Config(BaseModel):
     tool_service: ToolServiceConfig
     chat_service: ChatServiceConfig
     chainlit_configuration: ChainlitConfig
+    prompt_tuner: PromptTunerConfig
     azure_search_services: List[AzureSearchConfig]
     web_configuration: WebConfig
     receiver_configuration: ReceiverConfig
     local_sql_db: LocaldbConfig
     azure_sql_services: AzureSqlConfig
+    sql_tools: SqlToolsConfig
     file_storage: FileStorage
+    openai_client: OpenAIClientConfig
+    token_counter: TokenCounterConfig
 
     def __init__(self, config: config_ns_models.Config, profile: profile_models.Profile):
         super().__init__(
@@ -165,12 +227,16 @@ class Config(BaseModel):
             tool_service=ToolServiceConfig(config.tool_service, profile.tool_service),
             chat_service=ChatServiceConfig(config.chat_service, profile.chat_service),
             chainlit_configuration=ChainlitConfig(config.chainlit_configuration, profile.chainlit_configuration),
+            prompt_tuner=PromptTunerConfig(config.prompt_tuner),
             azure_search_services=[],
             web_configuration=WebConfig(config.web_configuration, profile.web_configuration),
             receiver_configuration=ReceiverConfig(profile.receiver_configuration),
             local_sql_db=LocaldbConfig(config.local_sql_db),
             azure_sql_services=AzureSqlConfig(config.azure_sql_services, profile.azure_sql_services),
-            file_storage=FileStorage(config.file_storage, profile.file_storage)
+            sql_tools=SqlToolsConfig(config.sql_tools),
+            file_storage=FileStorage(config.file_storage, profile.file_storage),
+            openai_client=OpenAIClientConfig(config.openai_client),
+            token_counter=TokenCounterConfig(config.token_counter)
         )
 
         models: List[config_models.ModelConfig] = []
@@ -8,6 +8,19 @@ class ChatHistoryConfig(BaseModel):
     database_connection_string: str = Field("", description="Connection string for the database. Only used for cosmosdb")
     database_name: str = Field("", description="Name of the database. Only used for cosmosdb")
     memory_path: str = Field("./tmp", description="Path to the memory storage.")
+    sqlite_pool_size: int = Field(5, description="Maximum number of pooled sqlite connections, and of queries run concurrently off the event loop. Only used for sqlite")
+    sqlite_journal_mode: str = Field("wal", description="sqlite journal mode set on each pooled connection. WAL lets reads run alongside a write. Only used for sqlite")
+    sqlite_busy_timeout: float = Field(5.0, description="Seconds a sqlite connection waits for a lock before raising. Only used for sqlite")
+    duckdb_parquet_path: str = Field("./tmp/chat_history_parquet", description="Folder of the date partitioned Parquet archive. Only used for duckdb")
+    write_behind: bool = Field(False, description="Queue message and step inserts and write them in batches in the background instead of during the request")
+    write_behind_max_size: int = Field(10000, description="Maximum number of queued rows. Writers flush inline once it is reached")
+    write_behind_batch_size: int = Field(100, description="Number of queued rows that triggers a flush, and the maximum rows per bulk insert")
+    write_behind_flush_interval: float = Field(0.5, description="Seconds between background flushes of the write-behind queue")
+    write_behind_log_path: str = Field("./.tmp/chat_history_write_behind.log", description="Append-only log of queued rows, replayed at startup if the process stopped before they were written. Each process writes its own file next to this path. Empty disables it")
+    write_behind_max_attempts: int = Field(10, description="Times a queued row may fail on its own before it is moved to the failed rows file next to write_behind_log_path")
+    history_token_budget: int = Field(2000, description="Tokens of recent thread history sent with each request. Older turns are folded into the thread summary. 0 loads the thread with get_thread_messages instead")
+    history_summary_token_budget: int = Field(500, description="Maximum tokens kept in the thread summary that older turns are folded into")
+    history_page_size: int = Field(20, description="Messages read per query while loading thread history newest first")
 
 
 class ModelConfig(BaseModel):
@@ -16,12 +29,51 @@ class ModelConfig(BaseModel):
     api_version: str = Field(..., description="Version of the API")
 
 
+class OpenAIClientConfig(BaseModel):
+    asynchronous: bool = Field(True, description="Use the non-blocking AsyncAzureOpenAI client for chat completions")
+    max_connections: int = Field(100, description="Maximum number of concurrent HTTP connections to the model endpoint")
+    max_keepalive_connections: int = Field(20, description="Maximum number of idle connections kept open for reuse")
+    keepalive_expiry: float = Field(30.0, description="Seconds an idle connection is kept alive before being closed")
+    timeout: float = Field(600.0, description="Request timeout in seconds")
+
+
+# Context windows of the models get_max_tokens knows without configuration. Entries in the token_counter section of
+# config.yml are looked up first, so they override or extend this table rather than replace it.
+DEFAULT_MODEL_MAX_TOKENS: Dict[str, int] = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-3.5-turbo-0613": 4096,
+    "gpt-3.5-turbo-16k": 16384,
+    "gpt-3.5-turbo-0125": 16384,
+    "gpt-4": 8192,
+    "gpt-4-0314": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-32k-0314": 32768,
+    "gpt-4-0613": 8192,
+    "gpt-4-32k-0613": 32768,
+}
+
+
+class TokenCounterConfig(BaseModel):
+    model_max_tokens: Dict[str, int] = Field(
+        default_factory=lambda: dict(DEFAULT_MODEL_MAX_TOKENS),
+        description="Context window of each model, in tokens, returned by get_max_tokens. Merged over DEFAULT_MODEL_MAX_TOKENS"
+    )
+    default_max_tokens: int = Field(4096, description="Context window assumed for models missing from model_max_tokens")
+
+
 class ChainlitConfig(BaseModel):
     enable: bool = Field(False, description="Enables or Disables the Python based Chainlit chat interface")
 
 
+class PromptTunerConfig(BaseModel):
+    enable: bool = Field(True, description="Enables or Disables the Flask based prompt tuner")
+    mode: str = Field("fast_api", description="Mount the prompt tuner in the FastAPI app (fast_api) or run it stand alone (flask)")
+
+
 class ChatServiceConfig(BaseModel):
     type: str = Field("multi_agent", description="Right now only valid value is 'multi_agent'")
+    warm_conversation_flows: bool = Field(False, description="Import every discovered conversation flow at startup")
+    prompt_template_cache_ttl: float = Field(300, description="Seconds a compiled prompt template is served before its source is revalidated. 0 always revalidates")
 
 
 class ToolServiceConfig(BaseModel):
@@ -49,12 +101,24 @@ class WebConfig(BaseModel):
     port: int = Field(80, description="Port of the web server")
     type: str = Field("fastapi", description="Type of the web server (e.g. fastapi)")
     asynchronous: bool = Field(False, description="Enables or Disables the Asynchronous Response")
+    config_reload_interval: float = Field(0, description="Seconds between checks of config.yml and profiles.yml for changes, which are then reloaded. 0 disables the watcher")
 
 
 class LocaldbConfig(BaseModel):
     database_path: str = Field("/tmp/sample_sql_db", description="Database path")
     sample_csv_path: str = Field("", description="Sample csv path")
     sample_database_name: str = Field("sample_sql_db", description="Sample database name")
+    sample_chunk_size: int = Field(50000, description="Rows read and inserted at a time when the sample dataset is loaded")
+
+
+class SqlToolsConfig(BaseModel):
+    pool_size: int = Field(4, description="Maximum number of database connections used by the SQL tools")
+    max_rows: int = Field(1000, description="Maximum rows returned to the agent for one query. Larger results are truncated")
+    max_bytes: int = Field(1000000, description="Maximum size, in bytes of JSON, of the rows returned for one query")
+    fetch_size: int = Field(200, description="Rows fetched from the database at a time")
+    schema_cache_ttl: float = Field(3600, description="Seconds the column names of a table are reused before they are read again. The local sample table is also re-read when its source file changes. 0 disables the cache")
+    result_cache_ttl: float = Field(300, description="Seconds the result of a read-only query is reused for the same normalised SQL. 0 disables the cache")
+    result_cache_max_bytes: int = Field(16777216, description="Size limit of the query result cache. Least recently used results are evicted first")
 
 
 class FileStorageContainer(BaseModel):
@@ -78,6 +142,30 @@ class FileStorageContainer(BaseModel):
         default=True,
         description="Add sub_folders to the path. Used for local storage and Azure storage."
     )
+    max_concurrency: int = Field(
+        default=4,
+        description="Parallel connections used to upload or download a single file in chunks. Used for Azure storage."
+    )
+    batch_concurrency: int = Field(
+        default=16,
+        description="Maximum number of files transferred at once by read_files and write_files."
+    )
+    cache_enable: bool = Field(
+        default=False,
+        description="Serve repeated reads, listings and existence checks from a read-through cache."
+    )
+    cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Size limit of the in-memory cache tier. Least recently used files are evicted first."
+    )
+    cache_ttl: float = Field(
+        default=5.0,
+        description="Seconds a cached entry is served before it is revalidated against the file's ETag or mtime."
+    )
+    cache_disk_path: str = Field(
+        default="",
+        description="Directory for an optional on-disk cache tier that survives restarts. Empty disables it."
+    )
 
 
 class FileStorage(BaseModel):
@@ -99,8 +187,12 @@ class Config(BaseModel):
     tool_service: ToolServiceConfig
     chat_service: ChatServiceConfig
     chainlit_configuration: ChainlitConfig
+    prompt_tuner: PromptTunerConfig = Field(default_factory=PromptTunerConfig, description="Prompt tuner configuration")
     azure_search_services: List[AzureSearchConfig]
     web_configuration: WebConfig
     local_sql_db: LocaldbConfig
     azure_sql_services: AzureSqlConfig
+    sql_tools: SqlToolsConfig = Field(default_factory=SqlToolsConfig, description="Limits of the SQL tools used by the agents")
     file_storage: FileStorage = Field(default_factory=lambda: FileStorage(enable=True, storage_type='local', container_name="", path="./"), description="File Storage configuration")
+    openai_client: OpenAIClientConfig = Field(default_factory=OpenAIClientConfig, description="Shared Azure OpenAI client configuration")
+    token_counter: TokenCounterConfig = Field(default_factory=TokenCounterConfig, description="Model token limits used by token_counter")
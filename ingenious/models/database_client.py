@@ -5,6 +5,7 @@ import enum
 
 class DatabaseClientType(enum.Enum):
     SQLITE = "sqlite"
+    DUCKDB = "duckdb"
     COSMOS = "cosmos"
 
 
@@ -1,25 +1,113 @@
 import logging
-from typing import List, Optional
+import sys
+import threading
+from typing import Dict, List, Optional
 import uuid
 from abc import ABC, abstractmethod
 
 from openai.types.chat import ChatCompletionMessageParam
 import ingenious.config.config as ig_config
 from ingenious.db.chat_history_repository import ChatHistoryRepository
-from ingenious.dependencies import get_openai_service
 from ingenious.errors.content_filter_error import ContentFilterError
-from ingenious.files.files_repository import FileStorage
+from ingenious.files.files_repository import get_file_storage
 from ingenious.models.chat import IChatRequest, IChatResponse
 from ingenious.models.message import Message
+from ingenious.services.thread_history_loader import ThreadHistoryLoader
 from ingenious.utils.conversation_builder import (build_user_message)
-from ingenious.utils.namespace_utils import import_class_with_fallback, get_path_from_namespace_with_fallback
+from ingenious.utils.prompt_template_cache import prompt_template_cache
+from ingenious.utils.namespace_utils import (
+    import_class_with_fallback,
+    get_path_from_namespace_with_fallback,
+    get_namespaces,
+    discover_namespace_modules
+)
 import os
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import FileSystemLoader
 from pathlib import Path
 
 
 logger = logging.getLogger(__name__)
 
+CONVERSATION_FLOWS_MODULE = "services.chat_services.multi_agent.conversation_flows"
+
+# Resolved ConversationFlow classes keyed by (conversation_flow, namespace search path)
+_conversation_flow_classes: Dict[tuple, type] = {}
+_conversation_flow_classes_lock = threading.Lock()
+
+# Names of the conversation flows discovered across the namespaces. Built once and rebuilt on demand.
+_conversation_flows: Optional[List[str]] = None
+
+
+def get_conversation_flows(refresh: bool = False) -> List[str]:
+    """
+    Returns the names of the available conversation flows. The namespaces are scanned on first call and when refresh
+    is set; all other calls are served from memory.
+    """
+    global _conversation_flows
+    if _conversation_flows is None or refresh:
+        flows = discover_namespace_modules(CONVERSATION_FLOWS_MODULE)
+        with _conversation_flow_classes_lock:
+            _conversation_flows = flows
+        logger.info(f"Discovered conversation flows: {flows}")
+    return list(_conversation_flows)
+
+
+def _conversation_flow_cache_key(conversation_flow: str) -> tuple:
+    return (conversation_flow.lower(), tuple(get_namespaces()), os.getcwd())
+
+
+def get_conversation_flow_class(conversation_flow: str):
+    """
+    Returns the ConversationFlow class for a flow, resolving it through the namespace fallback chain on first use only.
+    """
+    key = _conversation_flow_cache_key(conversation_flow)
+    conversation_flow_class = _conversation_flow_classes.get(key)
+    if conversation_flow_class is None:
+        with _conversation_flow_classes_lock:
+            conversation_flow_class = _conversation_flow_classes.get(key)
+            if conversation_flow_class is None:
+                flow = conversation_flow.lower()
+                module_name = f"{CONVERSATION_FLOWS_MODULE}.{flow}.{flow}"
+                conversation_flow_class = import_class_with_fallback(module_name, "ConversationFlow")
+                _conversation_flow_classes[key] = conversation_flow_class
+    return conversation_flow_class
+
+
+def clear_conversation_flow_cache(conversation_flow: Optional[str] = None, reload_modules: bool = False) -> None:
+    """
+    Invalidates cached ConversationFlow classes, either for one flow or for all of them.
+
+    Set reload_modules to also drop the flow modules from sys.modules so edited flows are re-imported on the next
+    request. Intended for development reloads.
+    """
+    with _conversation_flow_classes_lock:
+        keys = [
+            k for k in _conversation_flow_classes
+            if conversation_flow is None or k[0] == conversation_flow.lower()
+        ]
+        for key in keys:
+            conversation_flow_class = _conversation_flow_classes.pop(key)
+            if reload_modules:
+                sys.modules.pop(conversation_flow_class.__module__, None)
+
+
+def warm_conversation_flow_cache(conversation_flows: Optional[List[str]] = None) -> List[str]:
+    """
+    Resolves the given flows, or every discovered flow, ahead of the first request. Flows that fail to import are
+    logged and skipped. Returns the names of the flows that were cached.
+    """
+    if conversation_flows is None:
+        conversation_flows = get_conversation_flows()
+
+    warmed = []
+    for conversation_flow in conversation_flows:
+        try:
+            get_conversation_flow_class(conversation_flow)
+            warmed.append(conversation_flow)
+        except Exception as e:
+            logger.warning(f"Unable to warm conversation flow {conversation_flow}: {e}")
+    return warmed
+
 
 class multi_agent_chat_service:
     config: ig_config.Config
@@ -35,6 +123,8 @@ class multi_agent_chat_service:
         self.config = config
         self.chat_history_repository = chat_history_repository
         self.conversation_flow = conversation_flow
+        # Imported here so the service layer does not load the FastAPI dependencies, and their config, on import
+        from ingenious.dependencies import get_openai_service
         self.openai_service = get_openai_service()
 
     async def get_chat_response(self, chat_request: IChatRequest) -> IChatResponse:
@@ -53,8 +143,21 @@ class multi_agent_chat_service:
             chat_request.thread_id = str(uuid.uuid4())
             
         # Get thread messages & add to messages list
-        thread_messages = await self.chat_history_repository.get_thread_messages(chat_request.thread_id)
         chat_request.thread_memory = 'no existing context.'
+        chat_history_config = self.config.chat_history
+        if chat_history_config.history_token_budget:
+            thread_history = await ThreadHistoryLoader(
+                self.chat_history_repository,
+                model=self.config.models[0].model,
+                token_budget=chat_history_config.history_token_budget,
+                summary_token_budget=chat_history_config.history_summary_token_budget,
+                page_size=chat_history_config.history_page_size
+            ).load(chat_request.thread_id, chat_request.user_id)
+            thread_messages = thread_history.messages
+            if thread_history.summary:
+                chat_request.thread_memory = thread_history.summary
+        else:
+            thread_messages = await self.chat_history_repository.get_thread_messages(chat_request.thread_id)
 
         msg = f'current_memory: {chat_request.thread_memory}'
         logger.log(level=logging.INFO, msg=msg)
@@ -77,10 +180,7 @@ class multi_agent_chat_service:
                 self.conversation_flow = chat_request.conversation_flow
             if not self.conversation_flow:
                 raise ValueError(f"conversation_flow4 not set {chat_request}")
-            module_name = f"services.chat_services.multi_agent.conversation_flows.{self.conversation_flow.lower()}.{self.conversation_flow.lower()}"
-            class_name = "ConversationFlow"
-
-            conversation_flow_service_class: IConversationFlow = import_class_with_fallback(module_name, class_name)
+            conversation_flow_service_class: IConversationFlow = get_conversation_flow_class(self.conversation_flow)
 
             conversation_flow_service_class_instance = conversation_flow_service_class(parent_multi_agent_chat_service=self)
             
@@ -145,7 +245,7 @@ class IConversationPattern(ABC):
             event_type: str,
             output_path: str
     ):
-        fs = FileStorage(self.config)
+        fs = get_file_storage(self.config)
         for res in response_array:
             make_llm_calls = True
             if make_llm_calls:
@@ -178,15 +278,18 @@ class IConversationFlow(ABC):
     def GetConfig(self):
         return self._config
     
-    async def Get_Template(self, revision_id: str = None, file_name: str = "user_prompt.md"):       
-        fs = FileStorage(self._config)
-        template_path = await fs.get_prompt_template_path(revision_id)
-        content = await fs.read_file(file_name=file_name, file_path=template_path)
-        if content is None:
+    async def Get_Template(self, revision_id: str = None, file_name: str = "user_prompt.md"):
+        fs = get_file_storage(self._config, "revisions")
+        template = await prompt_template_cache.get_template(
+            fs,
+            file_name=file_name,
+            revision_id=revision_id,
+            ttl=self._config.chat_service.prompt_template_cache_ttl
+        )
+        if template is None:
+            template_path = await fs.get_prompt_template_path(revision_id)
             print(f"Prompt file {file_name} not found in {template_path}")
             return ""
-        env = Environment()
-        template = env.from_string(content)
         return template.render()
     
     def Get_Models(self):
@@ -0,0 +1,175 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from ingenious.services.chat_services.multi_agent.sql_query_engine import QueryResult
+
+# String literals and quoted identifiers are kept as written; comments and runs of whitespace outside them are not
+_SQL_TOKENS = re.compile(
+    r"""(?P<literal>'(?:[^']|'')*'|"(?:[^"]|"")*"|\[[^\]]*\])"""
+    r"""|(?P<comment>--[^\n]*|/\*.*?\*/)"""
+    r"""|(?P<space>\s+)""",
+    re.DOTALL
+)
+_READ_ONLY_PREFIX = re.compile(r"^(select|with)\b", re.IGNORECASE)
+# Keywords of statements that change data or schema. REPLACE is also a string function, which is allowed
+_WRITE_KEYWORDS = re.compile(
+    r"\b(insert|update|delete|merge|into|create|drop|alter|truncate|pragma|attach|detach|vacuum|reindex|grant|revoke"
+    r"|exec|execute)\b|\breplace\b(?!\s*\()",
+    re.IGNORECASE
+)
+
+
+def normalise_sql(sql: str) -> str:
+    """
+    Returns sql with comments removed, whitespace collapsed to single spaces, trailing semicolons dropped and
+    everything outside literals and quoted identifiers lower-cased, so queries that differ only in layout or keyword
+    case share a cache entry.
+    """
+    parts = []
+    position = 0
+    for match in _SQL_TOKENS.finditer(sql):
+        if match.start() > position:
+            parts.append(sql[position:match.start()].lower())
+        if match.lastgroup == "literal":
+            parts.append(match.group())
+        elif parts and parts[-1] != " ":
+            parts.append(" ")
+        position = match.end()
+    parts.append(sql[position:].lower())
+    return re.sub(r"[\s;]+$", "", "".join(parts)).strip()
+
+
+def is_cacheable_sql(normalised_sql: str) -> bool:
+    """
+    Whether a statement looks like a single query that only reads. A WITH clause can lead into a DELETE and SELECT
+    can write with INTO, so any statement naming a write keyword outside literals is rejected as well.
+    """
+    if not _READ_ONLY_PREFIX.match(normalised_sql):
+        return False
+    code = _SQL_TOKENS.sub(lambda match: "" if match.lastgroup == "literal" else " ", normalised_sql)
+    return ";" not in code and not _WRITE_KEYWORDS.search(code)
+
+
+@dataclass
+class CachedSchema:
+    columns: List[str]
+    version: Optional[Hashable]
+    loaded_at: float
+
+
+class SchemaCatalogue:
+    """
+    Column names of the tables the SQL agents query, cached per (source, table).
+
+    An entry is reused until ttl seconds have passed or the version passed in differs from the one it was loaded
+    with, e.g. the checksum of the loaded sample file. A ttl of 0 disables the catalogue.
+    """
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], CachedSchema] = {}
+        self._lock = threading.Lock()
+
+    def get_columns(
+            self,
+            source: str,
+            table: str,
+            loader: Callable[[], List[str]],
+            version: Optional[Hashable] = None
+    ) -> List[str]:
+        """
+        :param source: Name of the database the table is in, e.g. "local" or "azure".
+        :param table: Name of the table.
+        :param loader: Called to read the column names when there is no valid entry.
+        :param version: Version of the table's data. A different version reloads the columns.
+        :return: The column names of the table.
+        """
+        key = (source, table)
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry.version == version and time.monotonic() - entry.loaded_at < self.ttl:
+                return list(entry.columns)
+
+        columns = loader()
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = CachedSchema(columns=list(columns), version=version, loaded_at=time.monotonic())
+        return columns
+
+    def invalidate(self, source: Optional[str] = None, table: Optional[str] = None) -> None:
+        # Drops the entries of one table, of every table of a source, or all entries
+        with self._lock:
+            for key in list(self._entries):
+                if (source is None or key[0] == source) and (table is None or key[1] == table):
+                    del self._entries[key]
+
+
+@dataclass
+class CachedResult:
+    result: QueryResult
+    version: Optional[Hashable]
+    expires_at: float
+
+
+class QueryResultCache:
+    """
+    Results of read-only queries, keyed by source and normalised SQL text, served for ttl seconds.
+
+    Only statements that pass is_cacheable_sql, and that the engine did not report as writing, are cached. Entries
+    loaded with a different version of the source are treated as missing. The cache holds at most max_bytes of rows;
+    the least recently used entries are evicted first. Errors and timeouts are never cached. A ttl of 0 disables the
+    cache.
+    """
+
+    def __init__(self, ttl: float = 300, max_bytes: int = 16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, str], CachedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: str, sql: str, version: Optional[Hashable] = None) -> Optional[QueryResult]:
+        if self.ttl <= 0:
+            return None
+        key = (source, normalise_sql(sql))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version or time.monotonic() >= entry.expires_at:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.result
+
+    def put(self, source: str, sql: str, result: QueryResult, version: Optional[Hashable] = None) -> None:
+        if self.ttl <= 0 or result.error or result.timed_out or result.read_only is False or result.size > self.max_bytes:
+            return
+        normalised_sql = normalise_sql(sql)
+        if not is_cacheable_sql(normalised_sql):
+            return
+        key = (source, normalised_sql)
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = CachedResult(result=result, version=version, expires_at=time.monotonic() + self.ttl)
+            self.size += result.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.result.size
+
+    def _pop(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.result.size
+
+    def invalidate(self, source: Optional[str] = None) -> None:
+        # Drops the results of one source, or all results
+        with self._lock:
+            for key in list(self._entries):
+                if source is None or key[0] == source:
+                    self._pop(key)
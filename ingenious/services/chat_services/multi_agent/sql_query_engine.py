@@ -0,0 +1,234 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from ingenious.db.sqlite.connection_pool import SqliteConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryResult:
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    truncated: bool = False
+    timed_out: bool = False
+    error: Optional[str] = None
+    # Size of the rows as JSON, in bytes
+    size: int = 0
+    # Whether the database confirmed the statement only read data. None when the engine cannot tell
+    read_only: Optional[bool] = None
+
+
+class BoundedConnectionPool:
+    """
+    Thread-safe pool that opens at most max_size connections with factory. Callers wait up to acquire_timeout seconds
+    for a free connection. Connections that failed mid-query are discarded rather than returned.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int = 4, acquire_timeout: float = 30.0):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.acquire_timeout = acquire_timeout
+        self._connections: queue.LifoQueue = queue.LifoQueue(maxsize=self.max_size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self):
+        if self._closed:
+            raise RuntimeError("Cannot use a closed connection pool")
+        try:
+            return self._connections.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.max_size
+            if create:
+                self._created += 1
+        if not create:
+            try:
+                return self._connections.get(timeout=self.acquire_timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No database connection became free within {self.acquire_timeout} seconds")
+
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, connection) -> None:
+        with self._lock:
+            self._created -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        connection = self._acquire()
+        try:
+            yield connection
+        except BaseException:
+            self._discard(connection)
+            raise
+        if self._closed:
+            self._discard(connection)
+        else:
+            self._connections.put_nowait(connection)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._connections.get_nowait())
+            except queue.Empty:
+                break
+
+
+class IQueryEngine(ABC):
+    """
+    Runs SQL written by an agent on pooled connections, one cursor per query.
+
+    Rows are fetched fetch_size at a time and the fetch stops once max_rows rows or max_bytes bytes of JSON have been
+    read, so a runaway query cannot exhaust memory or the model's context. A query that runs past its timeout is
+    cancelled in the database, rather than left running in an abandoned thread.
+    """
+
+    def __init__(self, max_rows: int = 1000, max_bytes: int = 1_000_000, fetch_size: int = 200, timeout: float = 15.0):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.fetch_size = fetch_size
+        self.timeout = timeout
+
+    def _fetch(self, cursor) -> QueryResult:
+        result = QueryResult()
+        if cursor.description is None:
+            return result
+        columns = [column[0] for column in cursor.description]
+        while True:
+            batch = cursor.fetchmany(self.fetch_size)
+            if not batch:
+                return result
+            for row in batch:
+                record = dict(zip(columns, row))
+                record_size = len(json.dumps(record, default=str))
+                if len(result.rows) >= self.max_rows or result.size + record_size > self.max_bytes:
+                    result.truncated = True
+                    return result
+                result.rows.append(record)
+                result.size += record_size
+
+    @abstractmethod
+    def execute(self, sql: str, params: Sequence[Any] = (), timeout: Optional[float] = None) -> QueryResult:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+class SqliteQueryEngine(IQueryEngine):
+    """Query engine for a local sqlite database. Timeouts abort the statement through a progress handler."""
+
+    # Number of sqlite VM instructions between deadline checks
+    PROGRESS_INTERVAL = 10000
+
+    # Authorizer actions of a statement that only reads
+    READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, getattr(sqlite3, "SQLITE_RECURSIVE", 33)}
+
+    def __init__(self, db_path: str, pool_size: int = 4, **limits):
+        super().__init__(**limits)
+        self.pool = SqliteConnectionPool(db_path, pool_size=pool_size)
+
+    def execute(self, sql: str, params: Sequence[Any] = (), timeout: Optional[float] = None) -> QueryResult:
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        writes = []
+
+        def authorize(action, *args):
+            # Called while the statement is prepared. Setting an authorizer expires cached statements, so it runs
+            # on every execute
+            if action not in self.READ_ACTIONS:
+                writes.append(action)
+            return sqlite3.SQLITE_OK
+
+        with self.pool.connection() as connection:
+            # A non-zero return from the handler makes sqlite abort the running statement
+            connection.set_progress_handler(lambda: int(time.monotonic() > deadline), self.PROGRESS_INTERVAL)
+            connection.set_authorizer(authorize)
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, params)
+                result = self._fetch(cursor)
+                result.read_only = not writes
+                return result
+            except sqlite3.OperationalError as e:
+                if time.monotonic() > deadline:
+                    return QueryResult(timed_out=True, error="Query timed out.")
+                return QueryResult(error=str(e))
+            except sqlite3.Error as e:
+                return QueryResult(error=str(e))
+            finally:
+                cursor.close()
+                connection.set_progress_handler(None, 0)
+                connection.set_authorizer(None)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class OdbcQueryEngine(IQueryEngine):
+    """
+    Query engine for an ODBC database such as Azure SQL. Each query runs with the driver's query timeout, and is
+    also cancelled from a timer in case the driver does not enforce it.
+    """
+
+    def __init__(self, connection_string: str, pool_size: int = 4, **limits):
+        super().__init__(**limits)
+        self.connection_string = connection_string
+        self.pool = BoundedConnectionPool(self._connect, max_size=pool_size)
+
+    def _connect(self):
+        import pyodbc
+        return pyodbc.connect(self.connection_string)
+
+    def execute(self, sql: str, params: Sequence[Any] = (), timeout: Optional[float] = None) -> QueryResult:
+        import pyodbc
+        timeout = timeout if timeout is not None else self.timeout
+        try:
+            with self.pool.connection() as connection:
+                # Applies to cursors created from now on, and is passed to the driver as SQL_ATTR_QUERY_TIMEOUT
+                connection.timeout = max(1, int(timeout))
+                cursor = connection.cursor()
+                timer = threading.Timer(timeout + 1, cursor.cancel)
+                timer.start()
+                try:
+                    cursor.execute(sql, *params)
+                    result = self._fetch(cursor)
+                    if result.truncated:
+                        # Stop the server sending the rest of the result set
+                        cursor.cancel()
+                    return result
+                finally:
+                    timer.cancel()
+                    cursor.close()
+        except pyodbc.OperationalError as e:
+            # HYT00 is the ODBC state for an expired query timeout; a cancelled query reports HY008
+            if e.args and e.args[0] in ("HYT00", "HY008"):
+                return QueryResult(timed_out=True, error="Query timed out.")
+            return QueryResult(error=str(e))
+        except (pyodbc.Error, TimeoutError) as e:
+            return QueryResult(error=str(e))
+
+    def close(self) -> None:
+        self.pool.close()
@@ -1,21 +1,137 @@
+import json
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import threading
 from typing import Dict
 
-import matplotlib.pyplot as plt
-import pandas as pd
-import pyodbc
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
-import json
 import ingenious.config.config as ingen_config
-from ingenious.utils.load_sample_data import sqlite_sample_db
-_config = ingen_config.get_config()
+from ingenious.services.chat_services.multi_agent.sql_cache import QueryResultCache, SchemaCatalogue
+from ingenious.services.chat_services.multi_agent.sql_query_engine import (
+    IQueryEngine,
+    OdbcQueryEngine,
+    QueryResult,
+    SqliteQueryEngine
+)
+
+# matplotlib, pandas, pyodbc and the Azure Search SDK are imported by the tools that use them, and the SQL
+# connections or sample database are opened on first use, so importing this module stays cheap.
+_sql_lock = threading.Lock()
+_test_db = None
+_local_engine: IQueryEngine = None
+_azure_engine: IQueryEngine = None
+_schema_catalogue: SchemaCatalogue = None
+_result_cache: QueryResultCache = None
+
+
+def get_test_db():
+    global _test_db
+    if _test_db is None:
+        with _sql_lock:
+            if _test_db is None:
+                from ingenious.utils.load_sample_data import sqlite_sample_db
+                _test_db = sqlite_sample_db()  # this is for local sql initialisation
+    return _test_db
+
+
+def _engine_limits(_config) -> dict:
+    return dict(
+        pool_size=_config.sql_tools.pool_size,
+        max_rows=_config.sql_tools.max_rows,
+        max_bytes=_config.sql_tools.max_bytes,
+        fetch_size=_config.sql_tools.fetch_size
+    )
+
+
+def get_local_engine() -> IQueryEngine:
+    global _local_engine
+    if _local_engine is None:
+        test_db = get_test_db()
+        test_db.ensure_loaded()
+        with _sql_lock:
+            if _local_engine is None:
+                _local_engine = SqliteQueryEngine(test_db.db_path, **_engine_limits(ingen_config.get_config()))
+    return _local_engine
+
+
+def get_azure_engine() -> IQueryEngine:
+    global _azure_engine
+    if _azure_engine is None:
+        with _sql_lock:
+            if _azure_engine is None:
+                _config = ingen_config.get_config()
+                _azure_engine = OdbcQueryEngine(
+                    _config.azure_sql_services.database_connection_string, **_engine_limits(_config)
+                )
+    return _azure_engine
+
+
+def get_schema_catalogue() -> SchemaCatalogue:
+    global _schema_catalogue
+    if _schema_catalogue is None:
+        with _sql_lock:
+            if _schema_catalogue is None:
+                _schema_catalogue = SchemaCatalogue(ttl=ingen_config.get_config().sql_tools.schema_cache_ttl)
+    return _schema_catalogue
+
+
+def get_result_cache() -> QueryResultCache:
+    global _result_cache
+    if _result_cache is None:
+        with _sql_lock:
+            if _result_cache is None:
+                sql_tools = ingen_config.get_config().sql_tools
+                _result_cache = QueryResultCache(
+                    ttl=sql_tools.result_cache_ttl, max_bytes=sql_tools.result_cache_max_bytes
+                )
+    return _result_cache
+
+
+def invalidate_sql_caches() -> None:
+    # Forget cached column names and query results, e.g. after the tables were changed outside the sample loader
+    if _schema_catalogue is not None:
+        _schema_catalogue.invalidate()
+    if _result_cache is not None:
+        _result_cache.invalidate()
+
+
+def get_local_data_version():
+    # Checksum of the file the sample table was loaded from, so cached schemas and results follow reloads made by
+    # any worker
+    from ingenious.utils.load_sample_data import SOURCES_TABLE
+    result = get_local_engine().execute(
+        f"SELECT sha256 FROM {SOURCES_TABLE} WHERE table_name = ?", (get_test_db().table_name,)
+    )
+    return result.rows[0]["sha256"] if result.rows else None
+
+
+def close_sql_engines() -> None:
+    global _local_engine, _azure_engine
+    invalidate_sql_caches()
+    with _sql_lock:
+        for engine in (_local_engine, _azure_engine):
+            if engine is not None:
+                engine.close()
+        _local_engine = None
+        _azure_engine = None
+
+
+def format_query_result(result: QueryResult):
+    # The rows as the agent sees them, with a note when the result was cut short
+    if result.error:
+        return result.error
+    if result.truncated:
+        return {
+            "rows": result.rows,
+            "note": f"Result truncated to the first {len(result.rows)} rows. Aggregate or filter to see the rest."
+        }
+    return result.rows
 
 
 class ToolFunctions:
     @staticmethod
     def aisearch(search_query: str, index_name: str) -> str:
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents import SearchClient
+        _config = ingen_config.get_config()
         credential = AzureKeyCredential(_config.azure_search_services[0].key)
         client = SearchClient(
             endpoint=_config.azure_search_services[0].endpoint,
@@ -41,7 +157,7 @@ class ToolFunctions:
 
     @staticmethod
     def update_memory(context: str) -> None:
-        memory_path = _config.chat_history.memory_path
+        memory_path = ingen_config.get_config().chat_history.memory_path
         with open(f"{memory_path}/context.md", "w") as memory_file:
             memory_file.write(context)
 
@@ -57,6 +173,9 @@ class PandasExecutor:
         Example:
         plot_bar_chart({"GROUP_A": 518, "GROUP_B": 100})
         """
+        import matplotlib.pyplot as plt
+        import pandas as pd
+
         # Convert the dictionary to a DataFrame for easier plotting
         df = pd.DataFrame(list(data.items()), columns=['Category', 'Value'])
 
@@ -77,6 +196,7 @@ class PandasExecutor:
 
 #SQL Tools TODO: need a better way to wrap these functions
 def get_conn(_config):
+    import pyodbc
     connection_string = _config.azure_sql_services.database_connection_string
     # credential = identity.DefaultAzureCredential(exclude_interactive_browser_credential=False)
     # token_bytes = credential.get_token("https://database.windows.net/.default").token.encode("UTF-16-LE")
@@ -86,80 +206,64 @@ def get_conn(_config):
     cursor = conn.cursor()
     return conn, cursor
 
-if _config.azure_sql_services.database_name == 'skip':
-    test_db = sqlite_sample_db() #this is for local sql initialisation
-else:
-    conn, cursor = get_conn(_config)
-
 class SQL_ToolFunctions:
 
-    if _config.azure_sql_services.database_name == 'skip':
-        @staticmethod
-        def get_db_attr(_config):
-            table_name = _config.local_sql_db.sample_database_name
-            result = test_db.execute_sql(f"""SELECT * FROM {table_name} LIMIT 1""")
-            column_names = [key for key in result[0]]
-            return table_name, column_names
-
-        @staticmethod
-        def execute_sql_local(sql: str,
-                              timeout: int = 10  # Timeout in seconds
-                              ) -> str:
-
-            def run_query(sql: str):
-                return test_db.execute_sql(sql)
-
-            with ThreadPoolExecutor() as executor:
-                future = executor.submit(run_query, sql)  # Pass 'sql' as an argument
-                try:
-                    # Wait for the query to complete within the specified timeout
-                    result = future.result(timeout=timeout)
-                    return result
-                except TimeoutError:
-                    # Handle case where the query execution exceeded the timeout
-                    return ""
-                except Exception as e:
-                    # Handle any other exceptions that may arise during query execution
-                    return str(e)
-
-    else:
-        @staticmethod
-        def get_azure_db_attr(_config):
-            database_name = _config.azure_sql_services.database_name
-            table_name = _config.azure_sql_services.table_name
-            cursor.execute(f"""
+    @staticmethod
+    def get_db_attr(_config):
+        table_name = _config.local_sql_db.sample_database_name
+
+        def load_columns():
+            result = get_local_engine().execute(f"""PRAGMA table_info("{table_name}")""")
+            if result.error:
+                raise ValueError(f"Unable to read the columns of {table_name}: {result.error}")
+            return [row["name"] for row in result.rows]
+
+        column_names = get_schema_catalogue().get_columns(
+            "local", table_name, load_columns, version=get_local_data_version()
+        )
+        return table_name, column_names
+
+    @staticmethod
+    def execute_sql_local(sql: str,
+                          timeout: int = 10  # Timeout in seconds
+                          ) -> str:
+        cache = get_result_cache()
+        version = get_local_data_version()
+        result = cache.get("local", sql, version)
+        if result is None:
+            result = get_local_engine().execute(sql, timeout=timeout)
+            cache.put("local", sql, result, version)
+        return format_query_result(result)
+
+    @staticmethod
+    def get_azure_db_attr(_config):
+        database_name = _config.azure_sql_services.database_name
+        table_name = _config.azure_sql_services.table_name
+
+        def load_columns():
+            result = get_azure_engine().execute("""
                 SELECT COLUMN_NAME 
                 FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = '{table_name}'
-            """)
-            column_names = [row[0] for row in cursor.fetchall()]
-            # cursor.close()
-            # conn.close()
-            return database_name, table_name, column_names
-
-        @staticmethod
-        def execute_sql_azure(sql: str,
-                              timeout: int = 15  # Timeout in seconds
-                              ) -> str:
-
-            def run_query(sql_query):
-                try:
-                    cursor.execute(sql_query)
-                    r = [dict((cursor.description[i][0], value) \
-                              for i, value in enumerate(row)) for row in cursor.fetchall()]
-                    # cursor.close()
-                    # conn.close()
-                    return json.dumps(r)
-                except Exception as query_err:
-                    return f"Query Error: {query_err}"
-
-            # Run query in a separate thread with a timeout
-            with ThreadPoolExecutor() as executor:
-                future = executor.submit(run_query, sql)
-                try:
-                    result = future.result(timeout=timeout)
-                    return result
-                except TimeoutError:
-                    return "Query timed out."
-                except Exception as e:
-                    return f"Execution Error: {e}"
+                WHERE TABLE_NAME = ?
+            """, (table_name,))
+            if result.error:
+                raise ValueError(f"Unable to read the columns of {table_name}: {result.error}")
+            return [row["COLUMN_NAME"] for row in result.rows]
+
+        column_names = get_schema_catalogue().get_columns(f"azure:{database_name}", table_name, load_columns)
+        return database_name, table_name, column_names
+
+    @staticmethod
+    def execute_sql_azure(sql: str,
+                          timeout: int = 15  # Timeout in seconds
+                          ) -> str:
+        cache = get_result_cache()
+        result = cache.get("azure", sql)
+        if result is None:
+            result = get_azure_engine().execute(sql, timeout=timeout)
+            cache.put("azure", sql, result)
+        if result.timed_out:
+            return "Query timed out."
+        if result.error:
+            return f"Query Error: {result.error}"
+        return json.dumps(format_query_result(result), default=str)
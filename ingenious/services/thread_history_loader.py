@@ -0,0 +1,147 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from ingenious.db.chat_history_repository import ChatHistoryRepository
+from ingenious.models.message import Message
+from ingenious.utils.token_counter import (
+    get_token_count_model,
+    num_tokens_from_message_lists,
+    num_tokens_from_string,
+    num_tokens_from_strings
+)
+
+logger = logging.getLogger(__name__)
+
+# Role of the chat_history_summary rows written by the loader. Their content is a JSON object holding the summary and
+# the timestamp of the newest message folded into it (folded_until), so a turn is folded exactly once.
+SUMMARY_ROLE = "thread_summary"
+
+
+@dataclass
+class ThreadHistory:
+    messages: List[Message] = field(default_factory=list)
+    summary: Optional[str] = None
+    tokens: int = 0
+
+
+class ThreadHistoryLoader:
+    """
+    Loads the most recent turns of a thread that fit in a token budget.
+
+    Messages are read newest first, one page at a time, and counted with utils/token_counter until the budget is
+    spent. Turns that no longer fit are folded into the thread's summary in chat_history_summary, which is returned
+    with the kept turns. Only the pages holding the kept turns and the turns that dropped out since the last fold are
+    read, so the reads and the prompt size of a request stay flat however long the thread grows.
+    """
+
+    def __init__(
+            self,
+            chat_history_repository: ChatHistoryRepository,
+            model: str,
+            token_budget: int = 2000,
+            summary_token_budget: int = 500,
+            page_size: int = 20
+    ):
+        self.chat_history_repository = chat_history_repository
+        self.model = get_token_count_model(model)
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.page_size = page_size
+
+    def count_tokens(self, messages: List[Message]) -> List[int]:
+        return num_tokens_from_message_lists(
+            [[{"role": message.role, "content": message.content or ""}] for message in messages],
+            self.model,
+            reply_priming=False
+        )
+
+    async def load(self, thread_id: str, user_id: Optional[str] = None) -> ThreadHistory:
+        summary, folded_until = await self._get_summary(thread_id)
+
+        kept: List[Message] = []
+        dropped: List[Message] = []
+        tokens = 0
+        full = False
+        before: Optional[datetime] = None
+        while True:
+            page = await self.chat_history_repository.get_thread_messages_before(thread_id, before, self.page_size)
+            reached_folded = False
+            page_tokens = self.count_tokens(page) if not full else [0] * len(page)
+            for message, message_tokens in zip(page, page_tokens):
+                if not full:
+                    if tokens + message_tokens <= self.token_budget:
+                        kept.append(message)
+                        tokens += message_tokens
+                        continue
+                    full = True
+                if folded_until is not None and message.timestamp <= folded_until:
+                    reached_folded = True
+                    break
+                dropped.append(message)
+
+            if len(page) < self.page_size or reached_folded:
+                break
+            # Without a previous fold, only the turns just past the budget are folded, so an old thread is not read
+            # in full the first time it is loaded
+            if full and folded_until is None and dropped:
+                break
+            before = page[-1].timestamp
+
+        if dropped:
+            dropped.reverse()
+            summary = await self.fold(summary, dropped)
+            await self.chat_history_repository.add_memory(Message(
+                user_id=user_id,
+                thread_id=thread_id,
+                role=SUMMARY_ROLE,
+                content=json.dumps({"summary": summary, "folded_until": dropped[-1].timestamp.isoformat()})
+            ))
+
+        kept.reverse()
+        return ThreadHistory(messages=kept, summary=summary, tokens=tokens)
+
+    async def _get_summary(self, thread_id: str):
+        memories = await self.chat_history_repository.get_thread_memory(thread_id)
+        if not memories:
+            return None, None
+        latest = max(memories, key=lambda memory: memory.timestamp)
+        if latest.role != SUMMARY_ROLE:
+            return latest.content, None
+        try:
+            record = json.loads(latest.content)
+            return record["summary"], datetime.fromisoformat(record["folded_until"])
+        except (TypeError, ValueError, KeyError):
+            logger.warning(f"Ignoring invalid summary row of thread {thread_id}")
+            return None, None
+
+    async def fold(self, summary: Optional[str], messages: List[Message]) -> str:
+        """
+        Appends the dropped turns to the summary and keeps its most recent summary_token_budget tokens, in the same
+        way IConversationPattern.Maintain_Memory keeps the latest words of its memory file. Override to summarise
+        with a model instead.
+
+        :param summary: The thread's current summary, if any.
+        :param messages: The turns to fold in, oldest first.
+        :return: The new summary.
+        """
+        lines = summary.splitlines() if summary else []
+        lines.extend(f"{message.role}: {message.content or ''}" for message in messages)
+
+        kept_lines: List[str] = []
+        tokens = 0
+        for line, line_tokens in zip(reversed(lines), reversed(num_tokens_from_strings(lines, self.model))):
+            if tokens + line_tokens > self.summary_token_budget:
+                if not kept_lines:
+                    # A single turn longer than the budget keeps its last words
+                    words = line.split()
+                    while words and num_tokens_from_string(" ".join(words), self.model) > self.summary_token_budget:
+                        words = words[len(words) // 10 + 1:]
+                    kept_lines.append(" ".join(words))
+                break
+            kept_lines.append(line)
+            tokens += line_tokens
+        kept_lines.reverse()
+        return "\n".join(kept_lines)
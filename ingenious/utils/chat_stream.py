@@ -0,0 +1,53 @@
+import asyncio
+import json
+from contextvars import ContextVar, Token
+from typing import AsyncIterator, Optional
+
+_current_chat_stream: ContextVar[Optional["ChatStream"]] = ContextVar("chat_stream", default=None)
+
+
+class ChatStream:
+    """
+    Collects the events produced while a conversation flow runs and renders them as server-sent events.
+
+    Producers (agents, the LLM usage tracker) call publish() from the event loop thread. The streaming route consumes
+    events() until close() is called.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def publish(self, event: str, data: dict) -> None:
+        if not self._closed:
+            self._queue.put_nowait((event, data))
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put_nowait(None)
+
+    async def events(self) -> AsyncIterator[str]:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def get_chat_stream() -> Optional[ChatStream]:
+    """Returns the stream for the chat request being processed in the current context, if the client asked for one."""
+    return _current_chat_stream.get()
+
+
+def set_chat_stream(stream: Optional[ChatStream]) -> Token:
+    return _current_chat_stream.set(stream)
+
+
+def reset_chat_stream(token: Token) -> None:
+    _current_chat_stream.reset(token)
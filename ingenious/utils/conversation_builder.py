@@ -7,7 +7,7 @@ from openai.types.chat import (
     ChatCompletionAssistantMessageParam,
 )
 from ingenious.config.config import Config
-from ingenious.files.files_repository import FileStorage
+from ingenious.files.files_repository import get_file_storage
 
 logger = logging.getLogger(__name__)
 
@@ -65,7 +65,7 @@ def build_message(
 
 
 async def Sync_Prompt_Templates(_config: Config, revision: str):
-    fs = FileStorage(_config, Category="revisions")
+    fs = get_file_storage(_config, Category="revisions")
     # Check the storage type and handle Jinja files accordingly
     azure_template_dir = "prompts/"+revision
     if _config.file_storage.revisions.storage_type != 'local':
@@ -1,24 +1,38 @@
-from datetime import datetime
+import hashlib
 import os
 import sqlite3
-import pandas as pd  # Import pandas for CSV handling
-import uuid
-from ingenious.models.message import Message
+import threading
+from datetime import datetime
 import ingenious.config.config as Config
 
+# Records which source file each sample table was loaded from, so unchanged files are not loaded again
+SOURCES_TABLE = "_sample_data_sources"
+
+
 class sqlite_sample_db():
+    """
+    Local sqlite copy of the sample dataset used by the SQL tools.
+
+    Creating the object has no side effects. The dataset is loaded on the first query, and only if the source file
+    differs from the one recorded in the database: the size and mtime are compared first and the SHA-256 checksum
+    only when they changed, so restarts and extra workers reuse the existing table. CSV files are read in chunks of
+    sample_chunk_size rows and Parquet files are streamed through DuckDB, so memory does not grow with the file. A
+    reload is written to a staging table and swapped in one transaction, so concurrent readers never see a partial
+    table.
+    """
+
     def __init__(self):
         self._config = Config.get_config()
 
-        self.db_path =  self._config.local_sql_db.database_path
-        db_dir_check = os.path.dirname(self.db_path)
-        if not os.path.exists(db_dir_check):
-            os.makedirs(db_dir_check)
-        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-        self._create_table()
-        self._load_csv_data()
+        self.db_path = self._config.local_sql_db.database_path
+        self.source_path = self._config.local_sql_db.sample_csv_path
+        self.table_name = self._config.local_sql_db.sample_database_name
+        self.chunk_size = self._config.local_sql_db.sample_chunk_size
+        self._loaded = False
+        self._lock = threading.Lock()
 
     def execute_sql(self, sql, params=[], expect_results=True):
+        self.ensure_loaded()
         connection = None
         try:
             connection = sqlite3.connect(self.db_path)
@@ -42,10 +56,27 @@ class sqlite_sample_db():
             if connection:
                 connection.close()
 
-    def _create_table(self):
-        with self.connection:
+    def ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            db_dir_check = os.path.dirname(self.db_path)
+            if db_dir_check and not os.path.exists(db_dir_check):
+                os.makedirs(db_dir_check)
+            connection = sqlite3.connect(self.db_path, timeout=60)
+            try:
+                self._create_table(connection)
+                self._load_data(connection)
+            finally:
+                connection.close()
+            self._loaded = True
+
+    def _create_table(self, connection):
+        with connection:
             # Create table for the CSV data
-            self.connection.execute('''
+            connection.execute('''
                 CREATE TABLE IF NOT EXISTS students_performance (
                     gender TEXT,
                     race_ethnicity TEXT,
@@ -57,16 +88,107 @@ class sqlite_sample_db():
                     writing_score INTEGER
                 );
             ''')
+            connection.execute(f'''
+                CREATE TABLE IF NOT EXISTS {SOURCES_TABLE} (
+                    table_name TEXT PRIMARY KEY,
+                    source_path TEXT,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    sha256 TEXT,
+                    row_count INTEGER,
+                    loaded_at TEXT
+                );
+            ''')
 
+    def _get_source(self, connection):
+        return connection.execute(f'''
+            SELECT source_path, size, mtime_ns, sha256
+            FROM {SOURCES_TABLE}
+            WHERE table_name = ?
+        ''', (self.table_name,)).fetchone()
+
+    @staticmethod
+    def _checksum(path: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def _table_exists(self, connection) -> bool:
+        return connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table_name,)
+        ).fetchone() is not None
+
+    def _load_data(self, connection):
+        # Load the source file into the sample table unless it is already loaded
+        source_path = os.path.abspath(self.source_path) if self.source_path else ""
+        if not source_path or not os.path.exists(source_path):
+            print(f"CSV file not found at {self.source_path}.")
+            return
+
+        stat = os.stat(source_path)
+        recorded = self._get_source(connection)
+        table_exists = self._table_exists(connection)
+        if table_exists and recorded and recorded[0] == source_path \
+                and recorded[1] == stat.st_size and recorded[2] == stat.st_mtime_ns:
+            return
+
+        checksum = self._checksum(source_path)
+        if table_exists and recorded and recorded[0] == source_path and recorded[3] == checksum:
+            # Touched but unchanged
+            with connection:
+                connection.execute(
+                    f"UPDATE {SOURCES_TABLE} SET size = ?, mtime_ns = ? WHERE table_name = ?",
+                    (stat.st_size, stat.st_mtime_ns, self.table_name)
+                )
+            return
+
+        staging_table = f"{self.table_name}__loading_{os.getpid()}"
+        row_count = 0
+        try:
+            for i, df in enumerate(self._read_chunks(source_path)):
+                with connection:
+                    df.to_sql(staging_table, connection, if_exists='replace' if i == 0 else 'append', index=False)
+                row_count += len(df)
+
+            connection.execute("BEGIN IMMEDIATE")
+            # Another worker may have loaded the same file while this one was reading it
+            recorded = self._get_source(connection)
+            if self._table_exists(connection) and recorded and recorded[0] == source_path and recorded[3] == checksum:
+                connection.execute(f'DROP TABLE IF EXISTS "{staging_table}"')
+            else:
+                connection.execute(f'DROP TABLE IF EXISTS "{self.table_name}"')
+                connection.execute(f'ALTER TABLE "{staging_table}" RENAME TO "{self.table_name}"')
+                connection.execute(f'''
+                    INSERT OR REPLACE INTO {SOURCES_TABLE} (
+                        table_name, source_path, size, mtime_ns, sha256, row_count, loaded_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    self.table_name, source_path, stat.st_size, stat.st_mtime_ns, checksum, row_count,
+                    datetime.now().isoformat()
+                ))
+                print(f"CSV data loaded into {self.table_name} table ({row_count} rows).")
+            connection.commit()
+        except BaseException:
+            if connection.in_transaction:
+                connection.rollback()
+            with connection:
+                connection.execute(f'DROP TABLE IF EXISTS "{staging_table}"')
+            raise
 
-    def _load_csv_data(self):
-        # Load CSV file into a DataFrame
-        csv_path =  self._config.local_sql_db.sample_csv_path
-        if os.path.exists(csv_path):
-            df = pd.read_csv(csv_path)
-            # Load data into the students_performance table
-            with self.connection:
-                df.to_sql('sample_data', self.connection, if_exists='replace', index=False)
-            print("CSV data loaded into sample_data table.")
+    def _read_chunks(self, source_path: str):
+        if source_path.lower().endswith(".parquet"):
+            import duckdb
+            with duckdb.connect() as duckdb_connection:
+                result = duckdb_connection.execute("SELECT * FROM read_parquet(?)", [source_path])
+                # A DuckDB vector holds 2048 rows
+                vectors_per_chunk = max(1, self.chunk_size // 2048)
+                while True:
+                    df = result.fetch_df_chunk(vectors_per_chunk)
+                    if df.empty:
+                        return
+                    yield df
         else:
-            print(f"CSV file not found at {csv_path}.")
+            import pandas as pd
+            yield from pd.read_csv(source_path, chunksize=self.chunk_size)
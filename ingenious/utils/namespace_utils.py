@@ -15,6 +15,36 @@ def print_namespace_modules(namespace):
         print(f"{namespace} is not a package. Importing now...")
 
 
+def discover_namespace_modules(module_name):
+    """
+    This function lists the sub packages of a module across the Ingenious Extensions and Ingenious namespaces. A sub package
+    is reported when its folder contains a module of the same name (e.g. conversation_flows/bike_insights/bike_insights.py).
+
+    Args:
+        module_name (str): The name of the parent module (excluding the top level of ingenious or ingenious_extensions).
+
+    Returns:
+        list: The sub package names in fallback order without duplicates.
+    """
+    working_dir = Path(os.getcwd())
+    if str(working_dir) not in sys.path:
+        sys.path.append(str(working_dir))
+
+    names = []
+    for n in get_namespaces():
+        try:
+            spec = importlib.util.find_spec(f"{n}.{module_name}")
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for location in spec.submodule_search_locations:
+            for child in sorted(Path(location).iterdir()):
+                if child.is_dir() and (child / f"{child.name}.py").is_file() and child.name not in names:
+                    names.append(child.name)
+    return names
+
+
 def import_module_safely(module_name, class_name):
     if not sys.modules.get(module_name):
         try:
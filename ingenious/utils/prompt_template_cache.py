@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from jinja2 import Environment, Template
+
+from ingenious.files.files_repository import FileStorage
+
+
+@dataclass
+class _CachedTemplate:
+    content_hash: str
+    template: Template
+    validated_at: float
+
+
+class PromptTemplateCache:
+    """
+    Process level cache of compiled Jinja prompt templates keyed by (storage, revision_id, file_name), where storage
+    is the container and base path of the file storage, so storages configured with different locations never share
+    an entry.
+
+    Within the ttl a cached template is returned without touching file storage. Once the ttl has passed the source is
+    re-read and its content hash compared, so the template is only recompiled when the prompt has actually changed.
+    Writers that update prompts in process should call invalidate() so the change is picked up immediately.
+    """
+
+    def __init__(self):
+        self._env = Environment()
+        self._entries: Dict[Tuple[str, str, str], _CachedTemplate] = {}
+        self._lock = threading.Lock()
+
+    async def get_template(
+            self,
+            fs: FileStorage,
+            file_name: str,
+            revision_id: Optional[str] = None,
+            ttl: float = 300
+    ) -> Optional[Template]:
+        """
+        Returns the compiled template for the prompt, or None if the prompt file could not be read.
+
+        :param fs: File storage holding the prompt templates.
+        :param file_name: Name of the prompt template file.
+        :param revision_id: Prompt revision. None for the default prompt folder.
+        :param ttl: Seconds a cached template is served before its source is revalidated. 0 always revalidates.
+        """
+        storage = f"{fs.repository.fs_config.container_name}:{await fs.get_base_path()}"
+        key = (storage, revision_id or "", file_name)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry.validated_at < ttl:
+            return entry.template
+
+        template_path = await fs.get_prompt_template_path(revision_id)
+        content = await fs.read_file(file_name=file_name, file_path=template_path)
+        if not content:
+            return None
+
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if entry is not None and entry.content_hash == content_hash:
+            template = entry.template
+        else:
+            template = self._env.from_string(content)
+
+        with self._lock:
+            self._entries[key] = _CachedTemplate(content_hash=content_hash, template=template, validated_at=now)
+        return template
+
+    def invalidate(self, revision_id: Optional[str] = None, file_name: Optional[str] = None) -> None:
+        """
+        Drops cached templates. With no arguments the whole cache is cleared, otherwise only entries matching the
+        given revision and/or file name.
+        """
+        with self._lock:
+            keys = [
+                k for k in self._entries
+                if (revision_id is None or k[1] == revision_id) and (file_name is None or k[2] == file_name)
+            ]
+            for key in keys:
+                del self._entries[key]
+
+
+prompt_template_cache = PromptTemplateCache()
@@ -1,67 +1,132 @@
 import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
 from openai.types.chat import ChatCompletionMessageParam
 import tiktoken
 
+from ingenious.models.config_ns import DEFAULT_MODEL_MAX_TOKENS
+
 logger = logging.getLogger(__name__)
 
+# Tokens added per message and per name field, by model. Other model names are counted as the model they resolve to.
+MESSAGE_OVERHEADS: Dict[str, Tuple[int, int]] = {
+    "gpt-3.5-turbo-0301": (4, -1),
+    "gpt-3.5-turbo-0613": (3, 1),
+    "gpt-3.5-turbo-16k-0125": (3, 1),
+    "gpt-4-0314": (3, 1),
+    "gpt-4-32k-0314": (3, 1),
+    "gpt-4-0613": (3, 1),
+    "gpt-4-32k-0613": (3, 1),
+}
 
-def get_max_tokens(model: str = "gpt-3.5-turbo-0125") -> int:
-    # Return the maximum number of tokens for a given model
-    ## TODO: Move this to a configuration file
-    max_tokens = {
-        "gpt-3.5-turbo": 4096,
-        "gpt-3.5-turbo-0613": 4096,
-        "gpt-3.5-turbo-16k": 16384,
-        "gpt-3.5-turbo-0125": 16384,
-        "gpt-4": 8192,
-        "gpt-4-0314": 8192,
-        "gpt-4-32k": 32768,
-        "gpt-4-32k-0314": 32768,
-        "gpt-4-0613": 8192,
-        "gpt-4-32k-0613": 32768,
-    }
-    return max_tokens.get(model, 4096)
-
-
-def num_tokens_from_messages(messages: list[ChatCompletionMessageParam], model: str = "gpt-3.5-turbo-0613") -> int:
-    # Return the number of tokens used by a list of messages
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        logger.warning("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-    
-    ## TODO: Move this to a configuration file
-    if model in {
-        "gpt-3.5-turbo-0613",
-        "gpt-3.5-turbo-16k-0125",
-        "gpt-4-0314",
-        "gpt-4-32k-0314",
-        "gpt-4-0613",
-        "gpt-4-32k-0613",
-    }:
-        tokens_per_message = 3
-        tokens_per_name = 1
-    elif model == "gpt-3.5-turbo-0301":
-        tokens_per_message = 4
-        tokens_per_name = -1
-    elif "gpt-3.5-turbo" in model:
+# Below this many strings, encoding inline is cheaper than handing the batch to tiktoken's thread pool
+BATCH_THRESHOLD = 32
+
+_encodings: Dict[str, tiktoken.Encoding] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_max_tokens(model: str = "gpt-3.5-turbo-0125", config=None) -> int:
+    # Return the maximum number of tokens for a given model. The token_counter section of the config is checked first,
+    # then the built-in DEFAULT_MODEL_MAX_TOKENS, so a config listing only some models keeps the limits of the others
+    if config is None:
+        import ingenious.config.config as ig_config
+        config = ig_config.get_config()
+    token_counter = config.token_counter
+    max_tokens = token_counter.model_max_tokens.get(model)
+    if max_tokens is None:
+        max_tokens = DEFAULT_MODEL_MAX_TOKENS.get(model, token_counter.default_max_tokens)
+    return max_tokens
+
+
+def get_encoding(model: str) -> tiktoken.Encoding:
+    # Return the encoding of a model. Encodings are loaded once per model and shared by every thread
+    encoding = _encodings.get(model)
+    if encoding is None:
+        with _encodings_lock:
+            encoding = _encodings.get(model)
+            if encoding is None:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    logger.warning(f"Warning: model {model} not found. Using cl100k_base encoding.")
+                    encoding = tiktoken.get_encoding("cl100k_base")
+                _encodings[model] = encoding
+    return encoding
+
+
+@lru_cache(maxsize=None)
+def _resolve_model(model: str) -> str:
+    if model in MESSAGE_OVERHEADS:
+        return model
+    if "gpt-3.5-turbo" in model:
         logger.warning("Warning: gpt-3.5-turbo may update over time. Returning num tokens assuming gpt-3.5-turbo-0613.")
-        return num_tokens_from_messages(messages, model="gpt-3.5-turbo-0613")
-    elif "gpt-4" in model:
+        return "gpt-3.5-turbo-0613"
+    if "gpt-4" in model:
         logger.warning("Warning: gpt-4 may update over time. Returning num tokens assuming gpt-4-0613.")
-        return num_tokens_from_messages(messages, model="gpt-4-0613")
-    else:
-        raise NotImplementedError(f"""num_tokens_from_messages() is not implemented for model {
-            model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information
-            on how messages are converted to tokens.""")
-    num_tokens = 0
-    for message in messages:
-        num_tokens += tokens_per_message
-        for key, value in message.items():
-            if isinstance(value, str):
-                num_tokens += len(encoding.encode(value))
-            if key == "name":
-                num_tokens += tokens_per_name
-    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-    return num_tokens
+        return "gpt-4-0613"
+    raise NotImplementedError(f"""num_tokens_from_messages() is not implemented for model {
+        model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information
+        on how messages are converted to tokens.""")
+
+
+def get_token_count_model(model: str) -> str:
+    # Return the model whose encoding and message overheads are used to count tokens for model
+    try:
+        return _resolve_model(model)
+    except NotImplementedError:
+        return "gpt-4-0613"
+
+
+def _encode_lengths(encoding: tiktoken.Encoding, texts: Sequence[str], num_threads: int) -> List[int]:
+    if len(texts) < BATCH_THRESHOLD:
+        return [len(encoding.encode_ordinary(text)) for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(list(texts), num_threads=num_threads)]
+
+
+def num_tokens_from_string(text: str, model: str = "gpt-3.5-turbo-0613") -> int:
+    # Return the number of tokens in a string, without any message overhead
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def num_tokens_from_strings(texts: Sequence[str], model: str = "gpt-3.5-turbo-0613", num_threads: int = 8) -> List[int]:
+    # Return the number of tokens in each string. Large batches are encoded across num_threads threads
+    return _encode_lengths(get_encoding(model), texts, num_threads)
+
+
+def num_tokens_from_message_lists(
+        message_lists: Sequence[Sequence[ChatCompletionMessageParam]],
+        model: str = "gpt-3.5-turbo-0613",
+        num_threads: int = 8,
+        reply_priming: bool = True
+) -> List[int]:
+    # Return the number of tokens used by each list of messages. Every string value of every message is encoded in
+    # a single batch. Set reply_priming to False to count stored messages rather than prompts
+    resolved = _resolve_model(model)
+    tokens_per_message, tokens_per_name = MESSAGE_OVERHEADS[resolved]
+
+    texts: List[str] = []
+    counts: List[int] = []
+    owners: List[int] = []
+    for index, messages in enumerate(message_lists):
+        num_tokens = 3 if reply_priming else 0  # every reply is primed with <|start|>assistant<|message|>
+        for message in messages:
+            num_tokens += tokens_per_message
+            for key, value in message.items():
+                if isinstance(value, str):
+                    texts.append(value)
+                    owners.append(index)
+                if key == "name":
+                    num_tokens += tokens_per_name
+        counts.append(num_tokens)
+
+    for index, length in zip(owners, _encode_lengths(get_encoding(resolved), texts, num_threads)):
+        counts[index] += length
+    return counts
+
+
+def num_tokens_from_messages(messages: List[ChatCompletionMessageParam], model: str = "gpt-3.5-turbo-0613") -> int:
+    # Return the number of tokens used by a list of messages
+    return num_tokens_from_message_lists([messages], model)[0]
@@ -5,7 +5,7 @@ from typing import List
 import jsonpickle
 from ingenious.models.chat import ChatRequest
 from ingenious.models.config import Config
-from ingenious.files.files_repository import FileStorage
+from ingenious.files.files_repository import get_file_storage
 from ingenious.models.test_data import Events
 from ingenious.services.chat_service import ChatService
 from ingenious_prompt_tuner.utilities import utils_class
@@ -25,8 +25,8 @@ class functional_tests:
         make_llm_calls: bool,
     ):
         self.config = config
-        self.fs = FileStorage(self.config, Category="revisions")
-        self.fs_data = FileStorage(self.config, Category="data")
+        self.fs = get_file_storage(self.config, Category="revisions")
+        self.fs_data = get_file_storage(self.config, Category="data")
         self.revision_prompt_folder = revision_prompt_folder
         self.revision_id = revision_id
         self.make_llm_calls = make_llm_calls
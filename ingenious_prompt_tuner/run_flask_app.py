@@ -17,7 +17,7 @@ parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
 sys.path.append(parent_dir)
 
 import ingenious.dependencies as ig_deps
-from ingenious.files.files_repository import FileStorage
+from ingenious.files.files_repository import get_file_storage
 import rich.progress as rp
 import ingenious_extensions.tests.flask_app_render_payload as rp1
 import ingenious_extensions.tests.run_tests as rt
@@ -37,7 +37,7 @@ PASSWORD = ig_deps.config.web_configuration.authentication.password
 PORT = ig_deps.config.web_configuration.port
 HOST = ig_deps.config.web_configuration.ip_address
 
-fs = FileStorage(config=ig_deps.config)
+fs = get_file_storage(ig_deps.config)
 REVISIONS_FOLDER = Path("revisions")
 
 
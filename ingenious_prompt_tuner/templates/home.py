@@ -28,6 +28,11 @@ from ingenious_prompt_tuner.utilities import (
 bp = Blueprint("index", __name__)
 
 
+async def copy_files(fs, file_names, source_path, target_path):
+    contents = await fs.read_files(file_names=file_names, file_path=source_path)
+    await fs.write_files(contents, target_path)
+
+
 # Routes
 
 
@@ -124,10 +129,7 @@ def save_revision():
             if file_path_old == file_path_old_prompts:
                 asyncio.run(utils.get_prompt_template_folder(revision_id=new_guid, force_copy_from_source=True))
         else:
-            for file in old_files:
-                file_name = Path(file).name
-                content = asyncio.run(utils.fs.read_file(file_name=file_name, file_path=file_path_old))
-                asyncio.run(utils.fs.write_file(contents=content, file_name=file_name, file_path=file_path_new))
+            asyncio.run(copy_files(utils.fs, [Path(file).name for file in old_files], file_path_old, file_path_new))
 
     return redirect(url_for('index.home'))
 
@@ -4,6 +4,7 @@ from flask import (
 import asyncio
 from pathlib import Path
 from ingenious_prompt_tuner.utilities import requires_auth, utils_class, requires_selected_revision, get_selected_revision_direct_call
+from ingenious.utils.prompt_template_cache import prompt_template_cache
 
 # Authentication Helpers
 
@@ -26,6 +27,7 @@ def edit(filename):
             file_path=prompt_template_folder
             )
         )
+        prompt_template_cache.invalidate(revision_id=get_selected_revision_direct_call(), file_name=filename)
         return redirect(url_for('prompts.list'))
     else:
         content = asyncio.run(utils.fs.read_file(            
@@ -61,11 +61,8 @@ def get_test_data_files():
     files_all = asyncio.run(utils.fs.list_files(file_path=output_path))
     if files_all:
         files = [f for f in files_all if f.endswith(".json") and f.startswith("data_")]
-        files.sort(
-            key=lambda x: json.loads(
-                asyncio.run(utils.fs.read_file(file_name=x, file_path=output_path))
-            )["identifier"]
-        )
+        contents = asyncio.run(utils.fs.read_files(file_names=files, file_path=output_path))
+        files.sort(key=lambda x: json.loads(contents[x])["identifier"])
     else:
         files = []
 
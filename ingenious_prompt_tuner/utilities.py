@@ -3,7 +3,7 @@ import json
 import os
 from flask import Flask, render_template, request, redirect, url_for, session, send_file, Response, stream_with_context
 from functools import wraps
-from ingenious.files.files_repository import FileStorage
+from ingenious.files.files_repository import FileStorage, get_file_storage
 from ingenious.models.test_data import Events
 from ingenious.utils.namespace_utils import get_path_from_namespace_with_fallback
 
@@ -45,8 +45,8 @@ def set_selected_revision_direct_call(revision_id):
 class utils_class:
     def __init__(self, config):
         self.config = config
-        self.fs: FileStorage = FileStorage(config, Category="revisions")
-        self.fs_data: FileStorage = FileStorage(config, Category="data")
+        self.fs: FileStorage = get_file_storage(config, Category="revisions")
+        self.fs_data: FileStorage = get_file_storage(config, Category="data")
         self.events: Events = Events(fs=self.fs)
         self.prompt_template_folder: str = None
         self.functional_tests_folder: str = None
@@ -86,12 +86,13 @@ class utils_class:
         if self.prompt_template_folder is None or force_copy_from_source or no_existing_prompts:
             if no_existing_prompts or force_copy_from_source:
                 print("Copying prompts from the template folder to the prompts folder")
+                prompt_files = {}
                 for file in os.listdir(source_prompt_folder):
                     if ".jinja" in file:
                         # read the file and write it to the local_files
                         with open(f"{source_prompt_folder}/{file}", "r") as f:
-                            content = f.read()
-                            await self.fs.write_file(content, file, target_prompt_folder)
+                            prompt_files[file] = f.read()
+                await self.fs.write_files(prompt_files, target_prompt_folder)
             self.prompt_template_folder = target_prompt_folder
 
         return self.prompt_template_folder
@@ -122,6 +123,8 @@ class utils_class:
             if (len(source_files_filtered) == 0) or force_copy_from_source:
                 print("No data found in the revision prompts folder")
                 print("Copying data from the sample_data folder in source")
+                event_files = {}
+                data_files = {}
                 for file in source_files_filtered:
                     if ".md" in file or ".yml" or '.json' in file:
                         # read the file and write it to the local_files
@@ -129,10 +132,14 @@ class utils_class:
                             content = f.read()
                             if file == "events.yml":
                                 # write the event file to the same location as the prompts
-                                await self.fs.write_file(content, file, target_folder)
+                                event_files[file] = content
                             else:
                                 # write any data files to the data folder
-                                await self.fs_data.write_file(content, file, target_folder)
+                                data_files[file] = content
+                await asyncio.gather(
+                    self.fs.write_files(event_files, target_folder),
+                    self.fs_data.write_files(data_files, target_folder)
+                )
             self.functional_tests_folder = target_folder
 
         return self.functional_tests_folder
@@ -156,12 +163,13 @@ class utils_class:
             source_folder = get_path_from_namespace_with_fallback("sample_data")
             target_folder = f"functional_test_outputs/{revision_id}"
             if (await self.fs_data.list_files(target_folder) is None) or force_copy_from_source:
+                data_files = {}
                 for file in os.listdir(source_folder):
                     if ".json" in file:
                         # read the file and write it to the local_files
                         with open(f"{source_folder}/{file}", "r") as f:
-                            content = f.read()
-                            await self.fs_data.write_file(content, file, target_folder)
+                            data_files[file] = f.read()
+                await self.fs_data.write_files(data_files, target_folder)
             self.data_folder = target_folder
 
         return self.data_folder
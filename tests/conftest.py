@@ -0,0 +1,18 @@
+import pytest
+
+import ingenious.utils.token_counter as token_counter
+
+
+class _WhitespaceEncoding:
+    """Counts one token per word, so tests need neither network access nor tiktoken's downloaded encodings."""
+
+    def encode_ordinary(self, text):
+        return text.split()
+
+    def encode_ordinary_batch(self, texts, num_threads=8):
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def whitespace_tokens(monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoding", lambda model: _WhitespaceEncoding())
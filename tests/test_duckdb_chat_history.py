@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+
+import duckdb
+import pytest
+
+from ingenious.db.duckdb import duckdb_ChatHistoryRepository
+from ingenious.models.message import Message
+
+
+@pytest.fixture
+def repository(tmp_path):
+    config = SimpleNamespace(chat_history=SimpleNamespace(
+        database_path=str(tmp_path / "chat_history.db"),
+        duckdb_parquet_path=str(tmp_path / "parquet")
+    ))
+    repository = duckdb_ChatHistoryRepository(config)
+    yield repository
+    repository.connection.close()
+
+
+def test_update_thread_replaces_tags_of_existing_thread(repository):
+    async def run():
+        user = await repository.add_user("alice")
+        await repository.update_thread("t1", name="first", user_id=str(user.id), tags=["a"])
+        await repository.update_thread("t1", tags=["b", "c"])
+        return await repository.get_threads_for_user("alice", "t1", projection="metadata")
+
+    threads = asyncio.run(run())
+    assert len(threads) == 1
+    assert threads[0]["tags"] == ["b", "c"]
+    assert threads[0]["name"] == "first"
+
+
+def test_threads_page_round_trip(repository):
+    async def run():
+        user = await repository.add_user("alice")
+        for i in range(3):
+            await repository.update_thread(f"t{i}", name=f"thread {i}", user_id=str(user.id), tags=[str(i)])
+        first_page, has_more = await repository.get_threads_page("alice", first=2)
+        second_page, more_after = await repository.get_threads_page("alice", first=2, cursor=first_page[-1]["id"])
+        return first_page, has_more, second_page, more_after
+
+    first_page, has_more, second_page, more_after = asyncio.run(run())
+    assert has_more and not more_after
+    ids = [thread["id"] for thread in first_page + second_page]
+    assert sorted(ids) == ["t0", "t1", "t2"]
+    assert all(thread["tags"] == [thread["id"][1:]] for thread in first_page + second_page)
+
+
+def test_add_messages_round_trip_and_replay(repository):
+    async def run():
+        messages = [Message(user_id="u", thread_id="t1", role="user", content=str(i)) for i in range(3)]
+        ids = await repository.add_messages(messages)
+        # Replaying the same batch with its ids kept must not duplicate it
+        await repository.add_messages(messages, assign_ids=False)
+        return ids, await repository.get_thread_messages("t1")
+
+    ids, stored = asyncio.run(run())
+    assert len(set(ids)) == 3
+    assert [message.content for message in stored] == ["0", "1", "2"]
+
+
+def test_add_steps_skips_repeated_ids(repository):
+    async def run():
+        step = {"id": "s1", "name": "n", "type": "run", "threadId": "t1", "createdAt": "2024-01-01T00:00:00"}
+        await repository.add_steps([step, dict(step)])
+        await repository.add_step(step)
+        return await repository._fetch_all('SELECT "id" FROM steps')
+
+    assert asyncio.run(run()) == [{"id": "s1"}]
+
+
+def test_list_tags_of_existing_database_are_converted(tmp_path):
+    database_path = str(tmp_path / "chat_history.db")
+    connection = duckdb.connect(database_path)
+    connection.execute('''
+        CREATE TABLE threads (
+            "id" VARCHAR PRIMARY KEY, "createdAt" VARCHAR, "name" VARCHAR, "userId" VARCHAR,
+            "userIdentifier" VARCHAR, "tags" VARCHAR[], "metadata" JSON
+        )
+    ''')
+    connection.execute("INSERT INTO threads VALUES ('t1', '2024-01-01', 'old', 'u', 'alice', ['a'], NULL)")
+    connection.close()
+
+    repository = duckdb_ChatHistoryRepository(SimpleNamespace(chat_history=SimpleNamespace(
+        database_path=database_path, duckdb_parquet_path=str(tmp_path / "parquet")
+    )))
+    try:
+        async def run():
+            await repository.update_thread("t1", tags=["b"])
+            return await repository.get_threads_for_user("alice", "t1", projection="metadata")
+
+        assert asyncio.run(run())[0]["tags"] == ["b"]
+    finally:
+        repository.connection.close()
+
+
+def test_duplicate_message_ids_of_existing_database_are_renamed(tmp_path):
+    database_path = str(tmp_path / "chat_history.db")
+    connection = duckdb.connect(database_path)
+    connection.execute('CREATE TABLE chat_history (user_id VARCHAR, thread_id VARCHAR, message_id VARCHAR, content VARCHAR)')
+    connection.execute("INSERT INTO chat_history VALUES ('u', 't1', 'm1', 'first'), ('u', 't1', 'm1', 'replayed')")
+    connection.close()
+
+    repository = duckdb_ChatHistoryRepository(SimpleNamespace(chat_history=SimpleNamespace(
+        database_path=database_path, duckdb_parquet_path=str(tmp_path / "parquet")
+    )))
+    try:
+        rows = repository.connection.execute(
+            "SELECT message_id, content FROM chat_history ORDER BY rowid"
+        ).fetchall()
+    finally:
+        repository.connection.close()
+    assert [content for _, content in rows] == ["first", "replayed"]
+    assert rows[0][0] == "m1" and rows[1][0].startswith("m1-")
@@ -0,0 +1,83 @@
+import pytest
+
+from ingenious.services.chat_services.multi_agent.sql_cache import (
+    QueryResultCache,
+    SchemaCatalogue,
+    is_cacheable_sql,
+    normalise_sql
+)
+from ingenious.services.chat_services.multi_agent.sql_query_engine import QueryResult
+
+
+def _result(size=10, **kwargs):
+    return QueryResult(rows=[{"n": 1}], size=size, **kwargs)
+
+
+def test_normalise_sql_keeps_literals_as_written():
+    assert normalise_sql("SELECT  a -- note\n FROM T WHERE x = 'A  b';;  ") == "select a from t where x = 'A  b'"
+
+
+@pytest.mark.parametrize("sql", [
+    "select * from t",
+    "with c as (select 1 as x) select x from c",
+    "select replace(name, 'a', 'b') from t",
+    "select ';' from t",
+    "select 'delete' from t",
+])
+def test_reads_are_cacheable(sql):
+    assert is_cacheable_sql(normalise_sql(sql))
+
+
+@pytest.mark.parametrize("sql", [
+    "delete from t",
+    "select 1; delete from t",
+    "with d as (delete from t returning *) select * from d",
+    "select * into backup from t",
+    "insert into t select * from t",
+    "pragma table_info(t)",
+    "select * from t; replace into t values (1)",
+    "exec sp_who",
+])
+def test_writes_are_not_cacheable(sql):
+    assert not is_cacheable_sql(normalise_sql(sql))
+
+
+def test_results_are_shared_across_layouts_and_dropped_on_version_change():
+    cache = QueryResultCache(ttl=60)
+    result = _result()
+    cache.put("local", "SELECT n FROM t", result, version=1)
+    assert cache.get("local", "select n\n  from t;", version=1) is result
+    assert cache.get("local", "select n from t", version=2) is None
+    assert cache.get("local", "select n from t", version=1) is None
+
+
+def test_results_of_writes_errors_and_timeouts_are_not_cached():
+    cache = QueryResultCache(ttl=60)
+    cache.put("local", "select n from t", _result(read_only=False))
+    cache.put("local", "select m from t", _result(error="boom"))
+    cache.put("local", "select o from t", _result(timed_out=True))
+    cache.put("local", "delete from t", _result())
+    assert cache.size == 0
+
+
+def test_least_recently_used_results_are_evicted_past_max_bytes():
+    cache = QueryResultCache(ttl=60, max_bytes=25)
+    for name in "abc":
+        cache.put("local", f"select {name} from t", _result())
+    assert cache.get("local", "select a from t") is None
+    assert cache.get("local", "select c from t") is not None
+    assert cache.size == 20
+
+
+def test_schema_catalogue_reloads_on_new_version():
+    catalogue = SchemaCatalogue(ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return ["a", "b"]
+
+    assert catalogue.get_columns("local", "t", loader, version=1) == ["a", "b"]
+    catalogue.get_columns("local", "t", loader, version=1)
+    catalogue.get_columns("local", "t", loader, version=2)
+    assert len(loads) == 2
@@ -0,0 +1,57 @@
+import sqlite3
+import time
+
+import pytest
+
+from ingenious.services.chat_services.multi_agent.sql_query_engine import SqliteQueryEngine
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "sample.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+    connection.executemany("INSERT INTO t VALUES (?, ?)", [(i, "x" * 50) for i in range(5000)])
+    connection.commit()
+    connection.close()
+    return path
+
+
+def test_rows_are_capped_by_count_and_size(db_path):
+    engine = SqliteQueryEngine(db_path, pool_size=2, max_rows=100, fetch_size=20)
+    by_bytes = SqliteQueryEngine(db_path, pool_size=2, max_rows=100, max_bytes=3000, fetch_size=20)
+    try:
+        result = engine.execute("SELECT * FROM t")
+        assert len(result.rows) == 100 and result.truncated
+        result = by_bytes.execute("SELECT * FROM t")
+        assert 0 < len(result.rows) < 100 and result.truncated and result.size <= 3000
+        result = engine.execute("SELECT count(*) AS n FROM t WHERE a >= ?", (10,))
+        assert result.rows == [{"n": 4990}] and not result.truncated
+    finally:
+        engine.close()
+        by_bytes.close()
+
+
+def test_long_query_is_cancelled_at_the_timeout(db_path):
+    engine = SqliteQueryEngine(db_path, pool_size=1)
+    try:
+        started = time.monotonic()
+        result = engine.execute(
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c", timeout=0.5
+        )
+        assert result.timed_out and result.error
+        assert time.monotonic() - started < 5
+        # The connection is usable again once the query is interrupted
+        assert engine.execute("SELECT 1 AS x").rows == [{"x": 1}]
+    finally:
+        engine.close()
+
+
+def test_errors_and_writes_are_reported(db_path):
+    engine = SqliteQueryEngine(db_path, pool_size=1)
+    try:
+        assert engine.execute("SELECT nope FROM t").error
+        assert engine.execute("SELECT a FROM t LIMIT 1").read_only is True
+        assert engine.execute("CREATE TABLE u (a)").read_only is False
+    finally:
+        engine.close()
@@ -0,0 +1,67 @@
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from ingenious.db.sqlite import sqlite_ChatHistoryRepository
+from ingenious.models.message import Message
+
+
+@pytest.fixture
+def repository(tmp_path):
+    config = SimpleNamespace(chat_history=SimpleNamespace(
+        database_path=str(tmp_path / "chat_history.db"),
+        sqlite_pool_size=2,
+        sqlite_journal_mode="wal",
+        sqlite_busy_timeout=5.0
+    ))
+    repository = sqlite_ChatHistoryRepository(config)
+    yield repository
+    asyncio.run(repository.close())
+
+
+def test_add_messages_round_trip_and_replay(repository):
+    async def run():
+        messages = [Message(user_id="u", thread_id="t1", role="user", content=str(i)) for i in range(3)]
+        ids = await repository.add_messages(messages)
+        await repository.add_messages(messages, assign_ids=False)
+        return ids, await repository.get_thread_messages("t1")
+
+    ids, stored = asyncio.run(run())
+    assert len(set(ids)) == 3
+    assert [message.content for message in stored] == ["0", "1", "2"]
+    assert [message.message_id for message in stored] == ids
+
+
+def test_add_steps_skips_repeated_ids_and_raises_on_failure(repository):
+    step = {
+        "id": "s1", "name": "n", "type": "run", "threadId": "t1", "streaming": False, "createdAt": "2024-01-01T00:00:00"
+    }
+
+    async def run():
+        await repository.add_steps([step, dict(step), {**step, "id": "s2", "metadata": {"a": 1}}])
+        await repository.add_steps([step])
+        return await repository.pool.fetch_all('SELECT "id" FROM steps ORDER BY "id"')
+
+    assert [row["id"] for row in asyncio.run(run())] == ["s1", "s2"]
+    # A step missing a required column must fail the batch rather than be dropped
+    with pytest.raises(sqlite3.IntegrityError):
+        asyncio.run(repository.add_steps([{"id": "s3", "threadId": "t1"}]))
+
+
+def test_update_thread_and_page_round_trip(repository):
+    async def run():
+        user = await repository.add_user("alice")
+        for i in range(3):
+            await repository.update_thread(f"t{i}", name=f"thread {i}", user_id=str(user.id))
+        await repository.update_thread("t0", name="renamed")
+        first_page, has_more = await repository.get_threads_page("alice", first=2)
+        second_page, more_after = await repository.get_threads_page("alice", first=2, cursor=first_page[-1]["id"])
+        searched, _ = await repository.get_threads_page("alice", search="renamed")
+        return first_page + second_page, has_more, more_after, searched
+
+    threads, has_more, more_after, searched = asyncio.run(run())
+    assert has_more and not more_after
+    assert sorted(thread["id"] for thread in threads) == ["t0", "t1", "t2"]
+    assert [thread["id"] for thread in searched] == ["t0"]
@@ -0,0 +1,46 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from ingenious.db.sqlite.connection_pool import SqliteConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SqliteConnectionPool(str(tmp_path / "pool.db"), pool_size=3)
+    yield pool
+    pool.close()
+
+
+def test_connections_use_wal_and_are_reused(pool):
+    async def run():
+        await pool.execute("CREATE TABLE t (n INTEGER)")
+        await asyncio.gather(*[pool.execute("INSERT INTO t VALUES (?)", (i,)) for i in range(20)])
+        mode = await pool.fetch_one("PRAGMA journal_mode")
+        return mode[0], (await pool.fetch_one("SELECT count(*) FROM t"))[0]
+
+    assert asyncio.run(run()) == ("wal", 20)
+    assert pool._created <= pool.pool_size
+
+
+def test_failed_transaction_is_rolled_back_before_reuse(pool):
+    def fail(connection):
+        connection.execute("BEGIN")
+        connection.execute("INSERT INTO t VALUES (1)")
+        raise RuntimeError("stop")
+
+    async def run():
+        await pool.execute("CREATE TABLE t (n INTEGER)")
+        with pytest.raises(RuntimeError):
+            await pool.run(fail)
+        return (await pool.fetch_one("SELECT count(*) FROM t"))[0]
+
+    assert asyncio.run(run()) == 0
+
+
+def test_closed_pool_refuses_work(pool):
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.connection():
+            pass
@@ -0,0 +1,39 @@
+import logging
+import sqlite3
+
+from ingenious.db.sqlite.migrations import MIGRATIONS, apply_migrations, get_schema_version
+
+
+def _connect(tmp_path) -> sqlite3.Connection:
+    return sqlite3.connect(str(tmp_path / "chat_history.db"), isolation_level=None)
+
+
+def test_migrations_bring_a_new_database_to_the_latest_version(tmp_path):
+    connection = _connect(tmp_path)
+    assert apply_migrations(connection) == MIGRATIONS[-1].version
+    assert get_schema_version(connection) == MIGRATIONS[-1].version
+    # Running them again is a no-op
+    assert apply_migrations(connection) == MIGRATIONS[-1].version
+    connection.close()
+
+
+def test_duplicate_message_ids_are_renamed_not_deleted(tmp_path, caplog):
+    connection = _connect(tmp_path)
+    apply_migrations(connection, [migration for migration in MIGRATIONS if migration.version < 4])
+    rows = [("u", "t1", "m1", "first"), ("u", "t1", "m1", "replayed"), ("u", "t1", "m2", "other"), ("u", "t1", None, "x")]
+    connection.executemany(
+        "INSERT INTO chat_history (user_id, thread_id, message_id, content) VALUES (?, ?, ?, ?)", rows
+    )
+
+    with caplog.at_level(logging.WARNING):
+        apply_migrations(connection)
+
+    stored = connection.execute("SELECT message_id, content FROM chat_history ORDER BY rowid").fetchall()
+    assert [content for _, content in stored] == ["first", "replayed", "other", "x"]
+    assert stored[0][0] == "m1"
+    assert stored[1][0].startswith("m1-")
+    assert "Renamed 1 chat_history rows" in caplog.text
+
+    connection.execute("INSERT INTO chat_history (thread_id, message_id) VALUES ('t1', 'm2') ON CONFLICT DO NOTHING")
+    assert connection.execute("SELECT count(*) FROM chat_history WHERE message_id = 'm2'").fetchone()[0] == 1
+    connection.close()
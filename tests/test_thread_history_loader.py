@@ -0,0 +1,70 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from ingenious.models.message import Message
+from ingenious.services.thread_history_loader import SUMMARY_ROLE, ThreadHistoryLoader
+
+
+class MemoryHistory:
+    def __init__(self):
+        self.messages = []
+        self.memories = []
+        self.clock = datetime(2024, 1, 1)
+
+    def add(self, content):
+        self.clock += timedelta(seconds=1)
+        self.messages.append(Message(user_id="u", thread_id="t1", role="user", content=content, timestamp=self.clock))
+
+    async def get_thread_messages_before(self, thread_id, before, limit):
+        messages = [m for m in self.messages if before is None or m.timestamp < before]
+        return sorted(messages, key=lambda m: m.timestamp, reverse=True)[:limit]
+
+    async def get_thread_memory(self, thread_id):
+        return self.memories[-1:]
+
+    async def add_memory(self, memory):
+        # Stored after every message, like the backends stamping the row with the current time
+        memory.timestamp = datetime.now()
+        self.memories.append(memory)
+        return "id"
+
+
+def _loader(history):
+    # Each message counts 3 tokens of overhead plus one per word of its role and content, 6 in all, so a budget of
+    # 24 keeps four messages
+    return ThreadHistoryLoader(history, "gpt-4", token_budget=24, summary_token_budget=1000, page_size=5)
+
+
+def test_turns_past_the_budget_are_folded_once(whitespace_tokens):
+    history = MemoryHistory()
+    for i in range(10):
+        history.add(f"turn {i}")
+
+    first = asyncio.run(_loader(history).load("t1", "u"))
+    assert [m.content for m in first.messages] == ["turn 6", "turn 7", "turn 8", "turn 9"]
+    assert first.tokens == 24
+
+    for i in range(10, 12):
+        history.add(f"turn {i}")
+    second = asyncio.run(_loader(history).load("t1", "u"))
+    assert [m.content for m in second.messages] == ["turn 8", "turn 9", "turn 10", "turn 11"]
+
+    # Turns kept by the first load and dropped by the second are folded in, each exactly once
+    folded = [line.split(": ", 1)[1] for line in second.summary.splitlines()]
+    assert folded[-2:] == ["turn 6", "turn 7"]
+    assert len(folded) == len(set(folded))
+
+    row = history.memories[-1]
+    assert row.role == SUMMARY_ROLE and row.tool_call_id is None
+    assert json.loads(row.content)["folded_until"] == history.messages[7].timestamp.isoformat()
+
+
+def test_thread_within_budget_writes_no_summary(whitespace_tokens):
+    history = MemoryHistory()
+    for i in range(3):
+        history.add(f"turn {i}")
+
+    loaded = asyncio.run(_loader(history).load("t1", "u"))
+    assert len(loaded.messages) == 3 and loaded.summary is None
+    assert history.memories == []
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+from ingenious.models.config_ns import DEFAULT_MODEL_MAX_TOKENS, TokenCounterConfig
+from ingenious.utils.token_counter import get_max_tokens, num_tokens_from_message_lists, num_tokens_from_strings
+
+
+def _config(**token_counter):
+    return SimpleNamespace(token_counter=TokenCounterConfig(**token_counter))
+
+
+def test_configured_limits_extend_the_built_in_table():
+    config = _config(model_max_tokens={"gpt-4o": 128000, "gpt-4": 10000}, default_max_tokens=2048)
+    assert get_max_tokens("gpt-4o", config) == 128000
+    assert get_max_tokens("gpt-4", config) == 10000
+    assert get_max_tokens("gpt-4-32k-0613", config) == DEFAULT_MODEL_MAX_TOKENS["gpt-4-32k-0613"]
+    assert get_max_tokens("unknown-model", config) == 2048
+
+
+def test_batched_counts_match_single_counts(whitespace_tokens):
+    texts = [f"word {i} " * (i % 5) for i in range(40)]
+    assert num_tokens_from_strings(texts, "gpt-4-0613") == [len(text.split()) for text in texts]
+
+    message_lists = [[{"role": "user", "content": "a b"}], [{"role": "user", "content": "c", "name": "n"}]]
+    # 3 tokens of reply priming, 3 per message, 1 per name field, and one per word
+    assert num_tokens_from_message_lists(message_lists, "gpt-4-0613") == [3 + 3 + 3, 3 + 3 + 1 + 3]
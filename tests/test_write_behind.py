@@ -0,0 +1,156 @@
+import asyncio
+import glob
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from ingenious.db.chat_history_repository import IChatHistoryRepository
+from ingenious.db.write_behind import WriteBehindQueue
+from ingenious.models.message import Message
+
+
+class MemoryRepository:
+    """Stores rows by id like the real backends, and fails on messages whose content is in fail_on."""
+
+    def __init__(self, fail_on=()):
+        self.messages = {}
+        self.steps = {}
+        self.fail_on = set(fail_on)
+
+    async def add_messages(self, messages, assign_ids=True):
+        assert not assign_ids
+        if any(message.content in self.fail_on for message in messages):
+            raise ValueError("rejected row")
+        for message in messages:
+            self.messages.setdefault(message.message_id, message)
+        return [message.message_id for message in messages]
+
+    async def add_steps(self, step_dicts):
+        for step_dict in step_dicts:
+            self.steps.setdefault(step_dict["id"], step_dict)
+
+
+def _crash(queue: WriteBehindQueue) -> None:
+    # Stops the queue the way a killed process would: the log stays behind with its rows unacknowledged
+    queue._closed = True
+    if queue._task is not None:
+        queue._task.cancel()
+    queue._log.close()
+    queue._log = None
+
+
+def test_replayed_rows_are_not_duplicated(tmp_path):
+    repository = MemoryRepository()
+    log_path = str(tmp_path / "write_behind.log")
+
+    async def run():
+        queue = WriteBehindQueue(repository, batch_size=100, flush_interval=60, log_path=log_path)
+        for i in range(3):
+            await queue.add_message(Message(user_id="u", thread_id="t1", role="user", content=str(i)))
+        await queue.add_step({"name": "s", "type": "run", "threadId": "t1"})
+        # The batch is committed but the process dies before acknowledging it
+        await queue._write(list(queue._pending))
+        _crash(queue)
+
+        replay = WriteBehindQueue(repository, batch_size=100, flush_interval=60, log_path=log_path)
+        replayed = len(replay)
+        await replay.close()
+        return replayed
+
+    assert asyncio.run(run()) == 4
+    assert len(repository.messages) == 3
+    assert len(repository.steps) == 1
+    assert glob.glob(str(tmp_path / "write_behind.*")) == []
+
+
+def test_log_of_a_live_queue_is_not_taken_over(tmp_path):
+    repository = MemoryRepository()
+    log_path = str(tmp_path / "write_behind.log")
+
+    async def run():
+        live = WriteBehindQueue(repository, flush_interval=60, log_path=log_path)
+        await live.add_message(Message(user_id="u", thread_id="t1", role="user", content="x"))
+        other = WriteBehindQueue(repository, flush_interval=60, log_path=log_path)
+        counts = len(live), len(other)
+        await other.close()
+        await live.close()
+        return counts
+
+    assert asyncio.run(run()) == (1, 0)
+    assert len(repository.messages) == 1
+
+
+def test_row_that_keeps_failing_is_moved_to_the_failed_file(tmp_path):
+    repository = MemoryRepository(fail_on={"bad"})
+    log_path = str(tmp_path / "write_behind.log")
+
+    async def run():
+        queue = WriteBehindQueue(repository, batch_size=10, flush_interval=60, log_path=log_path, max_attempts=3)
+        for content in ["a", "bad", "b"]:
+            await queue.add_message(Message(user_id="u", thread_id="t1", role="user", content=content))
+        for _ in range(5):
+            try:
+                await queue.flush()
+            except ValueError:
+                pass
+        pending = len(queue)
+        await queue.close()
+        return queue.failed_path, pending
+
+    failed_path, pending = asyncio.run(run())
+    assert pending == 0
+    assert sorted(message.content for message in repository.messages.values()) == ["a", "b"]
+    with open(failed_path, encoding="utf-8") as f:
+        failed = [json.loads(line) for line in f]
+    assert [row["data"]["content"] for row in failed] == ["bad"]
+    assert failed[0]["error"] == "rejected row"
+    assert not os.path.exists(log_path)
+
+
+def test_rows_stay_in_the_log_while_the_database_is_down(tmp_path):
+    repository = MemoryRepository(fail_on={"x"})
+    log_path = str(tmp_path / "write_behind.log")
+
+    async def run():
+        queue = WriteBehindQueue(repository, flush_interval=60, log_path=log_path)
+        await queue.add_message(Message(user_id="u", thread_id="t1", role="user", content="x"))
+        await queue.close()
+        repository.fail_on.clear()
+        replay = WriteBehindQueue(repository, flush_interval=60, log_path=log_path)
+        replayed = len(replay)
+        await replay.close()
+        return replayed
+
+    assert asyncio.run(run()) == 1
+    assert [message.content for message in repository.messages.values()] == ["x"]
+
+
+def test_default_add_messages_refuses_to_keep_ids():
+    class OneAtATime(IChatHistoryRepository):
+        async def add_message(self, message):
+            return message.message_id
+
+    # Only the abstract methods used here need to exist
+    OneAtATime.__abstractmethods__ = frozenset()
+    repository = OneAtATime()
+    message = Message(user_id="u", thread_id="t1", role="user", content="x")
+    with pytest.raises(NotImplementedError):
+        asyncio.run(repository.add_messages([message], assign_ids=False))
+
+
+def test_write_behind_needs_a_backend_that_keeps_ids(monkeypatch):
+    import ingenious.db.chat_history_repository as chat_history_repository
+
+    class OneAtATime(IChatHistoryRepository):
+        def __init__(self, config):
+            pass
+
+    OneAtATime.__abstractmethods__ = frozenset()
+    monkeypatch.setattr(chat_history_repository.importlib, "import_module", lambda name: SimpleNamespace(
+        memory_ChatHistoryRepository=OneAtATime
+    ))
+    config = SimpleNamespace(chat_history=SimpleNamespace(write_behind=True))
+    with pytest.raises(ValueError):
+        chat_history_repository.ChatHistoryRepository(SimpleNamespace(value="memory"), config)